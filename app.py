@@ -6,31 +6,92 @@ Deploy this to a cloud platform (Railway, Render, Fly.io, etc.)
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import hmac
 import hashlib
 import json
 import os
 import asyncio
-from typing import Set, Dict
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 from datetime import datetime
 from pathlib import Path
 
-app = FastAPI(title="GitHub Webhook Relay")
+from relay.batch import batch_status, order_batch
+from relay.broadcast import BroadcastResult, broadcast
+from relay.bus import create_event_bus
+from relay.connections import ClientConnection, OVERFLOW_POLICIES
+from relay.delivery_log import create_delivery_log
+from relay.dispatch import RemoteWorker, TaskDispatcher
+from relay.encoding import encode_message
+from relay.results import PENDING, TaskResultStore
+from relay.subscriptions import SubscriptionIndex, routing_keys
 
-# Store connected WebSocket clients
-connected_clients: Set[WebSocket] = set()
 
-# Store pending synchronous task requests
-# Format: {task_id: asyncio.Future}
-pending_sync_tasks: Dict[str, asyncio.Future] = {}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Join the event bus for the lifetime of the server"""
+    await start_event_bus()
+    yield
+    await stop_event_bus()
+
+
+app = FastAPI(title="GitHub Webhook Relay", lifespan=lifespan)
+
+# Store connected WebSocket clients (each with its own bounded send queue)
+# Format: {client_id: ClientConnection}
+connected_clients: Dict[int, ClientConnection] = {}
+
+# Route webhooks only to clients subscribed to them
+subscriptions = SubscriptionIndex()
+
+# Task results keyed by task_id, for sync requests and GET /tasks/{task_id}/result
+task_results = TaskResultStore(
+    ttl=float(os.getenv("TASK_RESULT_TTL", "3600")),
+    max_output_bytes=int(os.getenv("TASK_STREAM_BUFFER", str(1024 * 1024)))  # Per running task
+)
+STREAM_KEEPALIVE = 15  # Seconds between SSE keepalive comments on quiet streams
 
 # Security configuration
 # Note: .strip() prevents trailing whitespace issues when copy/pasting secrets
 WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "").strip()  # GitHub webhook signature verification
 API_KEY = os.getenv("API_KEY", "").strip()  # Optional API key for custom webhooks
 
+# Delivery configuration
+BROADCAST_SEND_TIMEOUT = float(os.getenv("BROADCAST_SEND_TIMEOUT", "5"))  # Seconds per client send
+CLIENT_QUEUE_SIZE = int(os.getenv("CLIENT_QUEUE_SIZE", "100"))  # Frames buffered per client
+CLIENT_OVERFLOW_POLICY = os.getenv("CLIENT_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest, drop_newest, disconnect
+
+if CLIENT_OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+    raise ValueError(f"CLIENT_OVERFLOW_POLICY must be one of {OVERFLOW_POLICIES}, got {CLIENT_OVERFLOW_POLICY!r}")
+
+# How long a sync request waits for its result before answering 202 with a status URL
+# (per request: "wait" in the payload, capped at SYNC_MAX_WAIT)
+SYNC_DEFAULT_WAIT = float(os.getenv("SYNC_DEFAULT_WAIT", "30"))
+SYNC_MAX_WAIT = float(os.getenv("SYNC_MAX_WAIT", "300"))
+
+# Most tasks accepted in one POST /tasks/batch
+TASK_BATCH_MAX_SIZE = int(os.getenv("TASK_BATCH_MAX_SIZE", "100"))
+
+# Send each task_command to one registered worker (least_loaded or round_robin)
+dispatcher = TaskDispatcher(os.getenv("TASK_DISPATCH_STRATEGY", "least_loaded"))
+
+# Event bus linking relay processes (memory://, unix:///path, postgresql://...)
+bus = create_event_bus(os.getenv("RELAY_BUS_URL"), os.getenv("RELAY_NODE_ID"))
+PRESENCE_INTERVAL = float(os.getenv("RELAY_PRESENCE_INTERVAL", "5"))  # Seconds between worker announcements
+remote_nodes: Dict[str, float] = {}  # node_id -> last presence (monotonic)
+presence_task: Optional[asyncio.Task] = None
+
+# Recent broadcasts, replayed to clients that reconnect with their last sequence
+# (in memory by default; DELIVERY_LOG_PATH keeps it in SQLite, shared by workers on the host)
+delivery_log = create_delivery_log(
+    os.getenv("DELIVERY_LOG_PATH"),
+    max_entries=int(os.getenv("DELIVERY_LOG_SIZE", "1000"))
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -90,13 +151,246 @@ def verify_api_key(request: Request) -> bool:
     return is_valid
 
 
+def deliver_local(envelope: dict, routing: dict, target_client: int = None):
+    """
+    Queue a webhook envelope for this node's clients.
+
+    Args:
+        envelope: Webhook data package
+        routing: Routing keys (see relay.subscriptions.routing_keys)
+        target_client: Deliver only to this client (dispatched tasks)
+
+    Returns:
+        BroadcastResult: Delivery outcome for this node
+    """
+    if target_client is not None:
+        connection = connected_clients.get(target_client)
+        targets = {connection} if connection else set()
+    else:
+        targets = subscriptions.match(**routing)
+        if routing.get("payload_type") == "task_command":
+            # No registered worker was eligible: only clients that never
+            # registered (older versions) get the task by broadcast
+            targets = {c for c in targets if dispatcher.get(c) is None}
+
+    # Sequence and record broadcasts for replay (already done by the
+    # originating node when the log is shared)
+    message = envelope
+    if target_client is None and "seq" not in envelope and is_replayable(routing):
+        message = delivery_log.append(envelope, routing)
+
+    delivery = broadcast(targets, message)
+
+    # Drop clients closed by the disconnect overflow policy
+    for connection in delivery.dropped:
+        if connection.closed:
+            forget_client(connection)
+
+    return delivery
+
+
+def is_replayable(routing: dict) -> bool:
+    """Task commands are never replayed; running them late would repeat work"""
+    return routing.get("payload_type") != "task_command"
+
+
+async def replay_missed(connection: ClientConnection, epoch: str, last_seq: int):
+    """Send a reconnecting client the logged deliveries it has not seen"""
+    status, entries = delivery_log.replay_plan(epoch, last_seq)
+    entries = [entry for entry in entries if subscriptions.accepts(connection, **entry[2])]
+
+    connection.enqueue(encode_message({
+        "type": "replay",
+        "status": status,
+        "epoch": delivery_log.epoch,
+        "count": len(entries),
+        "timestamp": datetime.utcnow().isoformat()
+    }))
+    for seq, frame, routing in entries:
+        if not await connection.put(frame):
+            return
+    connection.enqueue(encode_message({
+        "type": "replay_complete",
+        "epoch": delivery_log.epoch,
+        "latest_seq": delivery_log.latest_seq,
+        "timestamp": datetime.utcnow().isoformat()
+    }))
+    print(f"Client {connection.client_id} resumed from {last_seq}: replayed {len(entries)} ({status})")
+
+
+def forget_client(connection: ClientConnection):
+    """Remove a client from every index; returns task IDs it still owed"""
+    connected_clients.pop(connection.client_id, None)
+    subscriptions.unsubscribe(connection)
+    return dispatcher.unregister(connection)
+
+
+async def handle_task_result(message: dict):
+    """Release the task's dispatch slot and store the result for anyone polling"""
+    task_id = message.get("task_id")
+    if not task_id:
+        return
+    dispatcher.complete(task_id)
+    task_results.set_result(message)
+    print(f"✅ Received result for task: {task_id}")
+
+
+async def handle_task_output(message: dict):
+    """Pass a chunk of a running task's output to anyone streaming it"""
+    if message.get("task_id"):
+        task_results.append_output(message)
+
+
+async def on_bus_task_pending(message: dict):
+    """Another node accepted a task; polls for it may arrive here"""
+    task_results.create(message["task_id"])
+
+
+async def on_bus_batch_pending(message: dict):
+    """Another node accepted a batch"""
+    task_results.create_batch(message["batch_id"], message["task_ids"])
+
+
+def envelope_task_ids(envelope: dict) -> list:
+    """IDs of the tasks a task_command or task_batch envelope carries"""
+    payload = envelope.get("payload", {})
+    data = payload.get("data", {})
+    if payload.get("type") == "task_batch":
+        return [task["task_id"] for task in data.get("tasks", [])]
+    return [data["task_id"]] if data.get("task_id") else []
+
+
+def task_urls(task_id: str) -> dict:
+    """Where callers fetch a task's result and follow its output"""
+    return {
+        "status_url": f"/tasks/{task_id}/result",
+        "stream_url": f"/tasks/{task_id}/stream"
+    }
+
+
+def clamp_wait(value, default: float) -> float:
+    """Parse a wait in seconds, capped at SYNC_MAX_WAIT (raises ValueError)"""
+    wait = default if value is None else float(value)
+    return max(0.0, min(wait, SYNC_MAX_WAIT))
+
+
+async def fail_orphaned_tasks(task_ids):
+    """Report tasks whose worker disconnected before answering"""
+    for task_id in task_ids:
+        result = {
+            "type": "task_result",
+            "task_id": task_id,
+            "status": "failed",
+            "error": "Worker disconnected before returning a result"
+        }
+        await handle_task_result(result)
+        await bus.publish("task_result", result)
+
+
+def presence_message() -> dict:
+    """Describe this node's workers for the other nodes' dispatchers"""
+    task_subscribers = subscriptions.match(payload_type="task_command")
+    return {
+        "node_id": bus.node_id,
+        "workers": [
+            {
+                "client_id": connection.client_id,
+                "capacity": worker.capacity,
+                "action_types": worker.action_types,
+                "in_flight": sorted(worker.in_flight),
+            }
+            for connection, worker in dispatcher.local_workers().items()
+            if connection in task_subscribers and not connection.closed
+        ]
+    }
+
+
+async def announce_presence():
+    await bus.publish("presence", presence_message())
+
+
+async def on_bus_deliver(message: dict):
+    """Another node received a webhook"""
+    target = message.get("target")
+    if target is None:
+        deliver_local(message["envelope"], message["routing"])
+        return
+    if target["node_id"] != bus.node_id:
+        return
+
+    # A task (or batch) dispatched to one of our workers
+    task_ids = envelope_task_ids(message["envelope"])
+    connection = connected_clients.get(target["client_id"])
+    if connection is None:
+        await fail_orphaned_tasks(task_ids)
+        return
+    for task_id in task_ids:
+        dispatcher.assign(task_id, connection)
+    delivery = deliver_local(message["envelope"], message["routing"], target_client=connection.client_id)
+    if not delivery.queued:
+        await fail_orphaned_tasks(task_ids)
+
+
+async def on_bus_presence(message: dict):
+    """Another node announced its workers"""
+    node_id = message["node_id"]
+    if node_id not in remote_nodes:
+        print(f"🔀 Relay node {node_id} joined")
+        remote_nodes[node_id] = time.monotonic()
+        await announce_presence()  # Let the newcomer learn about us
+    remote_nodes[node_id] = time.monotonic()
+    dispatcher.sync_remote(node_id, message["workers"])
+
+
+async def presence_loop():
+    """Announce our workers and expire nodes that went quiet"""
+    while True:
+        await announce_presence()
+        await asyncio.sleep(PRESENCE_INTERVAL)
+        cutoff = time.monotonic() - PRESENCE_INTERVAL * 3
+        for node_id, last_seen in list(remote_nodes.items()):
+            if last_seen < cutoff:
+                print(f"🔀 Relay node {node_id} went quiet, dropping its workers")
+                del remote_nodes[node_id]
+                dispatcher.drop_node(node_id)
+
+
+async def start_event_bus():
+    global presence_task
+    bus.subscribe("deliver", on_bus_deliver)
+    bus.subscribe("task_result", handle_task_result)
+    bus.subscribe("task_pending", on_bus_task_pending)
+    bus.subscribe("batch_pending", on_bus_batch_pending)
+    bus.subscribe("task_output", handle_task_output)
+    bus.subscribe("presence", on_bus_presence)
+    await bus.start()
+    presence_task = asyncio.create_task(presence_loop())
+
+
+async def stop_event_bus():
+    if presence_task:
+        presence_task.cancel()
+    await bus.stop()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {
         "status": "running",
         "service": "github-webhook-relay",
+        "node_id": bus.node_id,
+        "relay_nodes": 1 + len(remote_nodes),
+        "delivery_log": delivery_log.stats(),
         "connected_clients": len(connected_clients),
+        "clients": [
+            {
+                **connection.stats(),
+                "subscription": subscriptions.get(connection),
+                "worker": dispatcher.get(connection).to_dict() if dispatcher.get(connection) else None
+            }
+            for connection in connected_clients.values()
+        ],
         "timestamp": datetime.utcnow().isoformat()
     }
 
@@ -127,18 +421,28 @@ Expected path: docs/LLM_INSTRUCTIONS.md
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for clients to connect and receive webhook events"""
     await websocket.accept()
-    connected_clients.add(websocket)
-    client_id = id(websocket)
+    connection = ClientConnection(
+        websocket,
+        max_queue=CLIENT_QUEUE_SIZE,
+        overflow_policy=CLIENT_OVERFLOW_POLICY,
+        send_timeout=BROADCAST_SEND_TIMEOUT
+    )
+    connection.start()
+    connected_clients[connection.client_id] = connection
+    subscriptions.subscribe(connection)  # Everything until the client narrows it
+    client_id = connection.client_id
     
     print(f"Client {client_id} connected. Total clients: {len(connected_clients)}")
     
     try:
         # Send welcome message
-        await websocket.send_json({
+        connection.enqueue(encode_message({
             "type": "connection",
             "message": "Connected to GitHub webhook relay",
+            "epoch": delivery_log.epoch,
+            "latest_seq": delivery_log.latest_seq,
             "timestamp": datetime.utcnow().isoformat()
-        })
+        }))
         
         # Keep connection alive and receive messages from client
         while True:
@@ -147,31 +451,72 @@ async def websocket_endpoint(websocket: WebSocket):
 
             # Handle different message types
             if message.get("type") == "task_result":
-                # Client sending back task results for synchronous mode
-                task_id = message.get("task_id")
-                if task_id in pending_sync_tasks:
-                    # Resolve the pending future with the result
-                    pending_sync_tasks[task_id].set_result(message)
-                    print(f"✅ Received sync result for task: {task_id}")
+                # Client sending back task results (frees its dispatch slot);
+                # the waiting request may be on another relay node
+                await handle_task_result(message)
+                await bus.publish("task_result", message)
+            elif message.get("type") == "task_output":
+                # Output from a running task, for callers following its stream
+                await handle_task_output(message)
+                await bus.publish("task_output", message)
+            elif message.get("type") == "register":
+                # Client advertising itself as a task worker
+                worker = dispatcher.register(
+                    connection,
+                    capacity=message.get("capacity", 1),
+                    action_types=message.get("action_types"),
+                    capabilities=message.get("capabilities")
+                )
+                print(f"Client {client_id} registered as worker: {worker.to_dict()}")
+                await announce_presence()
+            elif message.get("type") == "subscribe":
+                # Client narrowing which webhooks it receives
+                subscription = subscriptions.subscribe(
+                    connection,
+                    events=message.get("events"),
+                    payload_types=message.get("payload_types"),
+                    repositories=message.get("repositories")
+                )
+                print(f"Client {client_id} subscribed: {subscription}")
+                if dispatcher.get(connection):
+                    await announce_presence()
+                connection.enqueue(encode_message({
+                    "type": "subscribed",
+                    "subscription": subscription,
+                    "timestamp": datetime.utcnow().isoformat()
+                }))
+            elif message.get("type") == "resume":
+                # Reconnecting client asking for what it missed
+                await replay_missed(connection, message.get("epoch"), message.get("last_seq"))
             elif message.get("type") == "ping":
-                # Heartbeat - echo back
-                await websocket.send_json({
+                # Heartbeat - echo back (workers include their cache counters)
+                worker = dispatcher.get(connection)
+                if worker and "metrics" in message:
+                    worker.metrics = message["metrics"] or {}
+                connection.enqueue(encode_message({
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }))
             else:
                 # Unknown message type - echo back for compatibility
-                await websocket.send_json({
+                connection.enqueue(encode_message({
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }))
             
     except WebSocketDisconnect:
         print(f"Client {client_id} disconnected")
     except Exception as e:
         print(f"Client {client_id} error: {e}")
     finally:
-        connected_clients.discard(websocket)
+        was_worker = dispatcher.get(connection) is not None
+        orphaned = forget_client(connection)
+        connection.close("disconnected")
+
+        # Fail sync requests that were waiting on this worker
+        await fail_orphaned_tasks(orphaned)
+        if was_worker:
+            await announce_presence()
         print(f"Client {client_id} removed. Total clients: {len(connected_clients)}")
 
 
@@ -221,16 +566,22 @@ async def github_webhook(request: Request):
 
     # Check if this is a synchronous request
     sync_mode = payload.get("sync", False)
-    task_id = None
+    is_task = sync_mode or payload.get("type") == "task_command"
+    task_id = payload.get("data", {}).get("task_id") if is_task else None
 
     if sync_mode:
-        # Extract task ID for synchronous mode
-        task_id = payload.get("data", {}).get("task_id")
         if not task_id:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Synchronous mode requires task_id in data"}
             )
+        try:
+            wait = clamp_wait(payload.get("wait"), SYNC_DEFAULT_WAIT)
+        except (TypeError, ValueError):
+            return JSONResponse(
+                status_code=400,
+                content={"error": "wait must be a number of seconds"}
+            )
 
     # Create webhook data package
     webhook_data = {
@@ -242,73 +593,287 @@ async def github_webhook(request: Request):
         "payload": payload
     }
 
-    print(f"Received {event_type or 'custom'} event (delivery: {delivery_id}, sync: {sync_mode})")
-    print(f"Broadcasting to {len(connected_clients)} clients")
-
-    # If synchronous mode, create a future to wait for result
-    result_future = None
-    if sync_mode:
-        result_future = asyncio.Future()
-        pending_sync_tasks[task_id] = result_future
-        print(f"⏳ Waiting for sync result: {task_id}")
+    routing = routing_keys(event_type, payload)
 
-    # Broadcast to all connected clients
-    disconnected = set()
-    for client in connected_clients:
-        try:
-            await client.send_json(webhook_data)
-        except Exception as e:
-            print(f"Failed to send to client: {e}")
-            disconnected.add(client)
+    # Task commands go to a single registered worker, which may be connected
+    # to another relay node; if none is eligible, clients that never
+    # registered (older versions) still get them by broadcast
+    worker = None
+    if payload.get("type") == "task_command":
+        task_data = payload.get("data", {})
+        candidates = subscriptions.match(**routing) | set(dispatcher.remote_workers())
+        worker = dispatcher.select(task_data.get("action_type"), candidates=candidates)
+        if worker is not None and task_id:
+            dispatcher.assign(task_id, worker)
 
-    # Remove disconnected clients
-    connected_clients.difference_update(disconnected)
-
-    # If synchronous mode, wait for result
-    if sync_mode and result_future:
-        try:
-            # Wait up to 30 seconds for task completion
-            start_time = datetime.utcnow()
-            result = await asyncio.wait_for(result_future, timeout=30.0)
-            end_time = datetime.utcnow()
-            execution_time_ms = int((end_time - start_time).total_seconds() * 1000)
+    print(f"Received {event_type or 'custom'} event (delivery: {delivery_id}, sync: {sync_mode})")
 
-            # Clean up
-            if task_id in pending_sync_tasks:
-                del pending_sync_tasks[task_id]
+    # Track the task's result so it can be awaited or polled on any relay node
+    if task_id:
+        task_results.create(task_id)
+        await bus.publish("task_pending", {"task_id": task_id})
+
+    # Queue for subscribed clients; each client's writer task does the sending
+    if worker is None:
+        # A shared log sequences once, here, so every node sends the same seq
+        if delivery_log.shared and is_replayable(routing):
+            delivery_log.append(webhook_data, routing)
+
+        # Every relay node delivers to its own subscribed clients
+        await bus.publish("deliver", {"envelope": webhook_data, "routing": routing})
+        delivery = deliver_local(webhook_data, routing)
+        print(f"Broadcasting to {len(delivery.queued)} of {len(connected_clients)} local clients")
+    elif isinstance(worker, RemoteWorker):
+        await bus.publish("deliver", {
+            "envelope": webhook_data,
+            "routing": routing,
+            "target": {"node_id": worker.node_id, "client_id": worker.client_id}
+        })
+        delivery = BroadcastResult(queued=[worker])
+        print(f"Dispatching to worker {worker.client_id} on relay node {worker.node_id}")
+    else:
+        delivery = deliver_local(webhook_data, routing, target_client=worker.client_id)
+        if not delivery.queued and task_id:
+            dispatcher.complete(task_id)  # Never reached the worker
+        print(f"Dispatching to worker {worker.client_id}")
 
-            # Return the actual task result
+    # If synchronous mode, wait (briefly) for the result
+    if sync_mode:
+        record = await task_results.wait(task_id, wait)
+        if record is not None and record.status != PENDING:
             return JSONResponse({
-                "status": result.get("status", "completed"),
-                "task_id": task_id,
-                "output": result.get("output"),
-                "execution_time_ms": execution_time_ms,
-                "clients_notified": len(connected_clients)
+                **record.to_dict(),
+                "clients_notified": len(delivery.queued),
+                "dispatched_to": worker.client_id if worker else None,
+                "delivery": delivery.to_dict()
             })
 
-        except asyncio.TimeoutError:
-            # Task didn't complete in time
-            if task_id in pending_sync_tasks:
-                del pending_sync_tasks[task_id]
-
-            print(f"⏱️  Timeout waiting for task: {task_id}")
-            return JSONResponse(
-                status_code=504,
-                content={
-                    "status": "timeout",
-                    "task_id": task_id,
-                    "error": "Task execution exceeded 30 second timeout",
-                    "message": "Task may still be running locally. Check results viewer."
-                }
-            )
+        # Still running - the caller polls for the result instead of holding this request
+        print(f"⏳ Task {task_id} still running after {wait:g}s, returning status URL")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": PENDING,
+                "task_id": task_id,
+                **task_urls(task_id),
+                "message": f"Task still running after {wait:g}s. Poll status_url (with ?wait=N) or follow stream_url.",
+                "clients_notified": len(delivery.queued),
+                "dispatched_to": worker.client_id if worker else None,
+                "delivery": delivery.to_dict()
+            }
+        )
 
     # Asynchronous mode - return immediately
-    return JSONResponse({
+    response = {
         "status": "received",
         "event": event_type,
         "delivery_id": delivery_id,
-        "clients_notified": len(connected_clients)
-    })
+        "clients_notified": len(delivery.queued),
+        "dispatched_to": worker.client_id if worker else None,
+        "delivery": delivery.to_dict()
+    }
+    if task_id:
+        response["task_id"] = task_id
+        response.update(task_urls(task_id))
+    return JSONResponse(response)
+
+
+def batch_body(batch_id: str, task_ids: list, records: list) -> dict:
+    """Aggregated state of a batch's tasks"""
+    tasks = [
+        record.to_dict() if record else {"status": "expired", "task_id": task_id}
+        for task_id, record in zip(task_ids, records)
+    ]
+    status, counts = batch_status([task["status"] for task in tasks])
+    return {
+        "status": status,
+        "batch_id": batch_id,
+        "counts": counts,
+        "status_url": f"/tasks/batch/{batch_id}",
+        "tasks": tasks
+    }
+
+
+@app.post("/tasks/batch")
+async def submit_task_batch(request: Request):
+    """
+    Submit several task commands in one request.
+
+    Body: {"tasks": [{task_id, action_type, params, depends_on?, priority?}],
+    "batch_id"?, "session_id"?, "sync"?, "wait"?}. The batch goes to one
+    worker in a single frame; tasks with depends_on start once those tasks
+    succeeded (see relay/batch.py). Sync requests wait for every task and
+    answer with all results (202 with a status URL if the wait runs out).
+    """
+    if not verify_api_key(request):
+        return JSONResponse(
+            status_code=401,
+            content={"error": "Invalid or missing API key"}
+        )
+    try:
+        body = json.loads(await request.body())
+    except json.JSONDecodeError:
+        return JSONResponse(status_code=400, content={"error": "Invalid JSON payload"})
+    if not isinstance(body, dict):
+        return JSONResponse(status_code=400, content={"error": "Batch must be a JSON object"})
+
+    try:
+        tasks = order_batch(body.get("tasks"), max_size=TASK_BATCH_MAX_SIZE)
+        wait = clamp_wait(body.get("wait"), SYNC_DEFAULT_WAIT)
+    except (TypeError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    sync_mode = bool(body.get("sync", False))
+    batch_id = str(body.get("batch_id") or f"batch_{uuid.uuid4().hex[:12]}")
+    session_id = body.get("session_id")
+    if session_id:
+        tasks = [{"session_id": session_id, **task} for task in tasks]
+    task_ids = [task["task_id"] for task in tasks]
+
+    webhook_data = {
+        "type": "webhook",
+        "sync": sync_mode,
+        "event": None,
+        "delivery_id": batch_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "payload": {"type": "task_batch", "data": {"batch_id": batch_id, "tasks": tasks}}
+    }
+    # Routed like task commands: workers subscribed to those get batches too
+    routing = routing_keys(None, {"type": "task_command"})
+
+    # One worker that supports every action type in the batch
+    candidates = subscriptions.match(**routing) | set(dispatcher.remote_workers())
+    worker = dispatcher.select(candidates=candidates, action_types={task["action_type"] for task in tasks})
+    if worker is not None:
+        for task_id in task_ids:
+            dispatcher.assign(task_id, worker)
+
+    print(f"Received batch {batch_id} with {len(tasks)} tasks (sync: {sync_mode})")
+
+    task_results.create_batch(batch_id, task_ids)
+    await bus.publish("batch_pending", {"batch_id": batch_id, "task_ids": task_ids})
+
+    if worker is None:
+        await bus.publish("deliver", {"envelope": webhook_data, "routing": routing})
+        delivery = deliver_local(webhook_data, routing)
+        print(f"Broadcasting batch to {len(delivery.queued)} of {len(connected_clients)} local clients")
+    elif isinstance(worker, RemoteWorker):
+        await bus.publish("deliver", {
+            "envelope": webhook_data,
+            "routing": routing,
+            "target": {"node_id": worker.node_id, "client_id": worker.client_id}
+        })
+        delivery = BroadcastResult(queued=[worker])
+        print(f"Dispatching batch to worker {worker.client_id} on relay node {worker.node_id}")
+    else:
+        delivery = deliver_local(webhook_data, routing, target_client=worker.client_id)
+        if not delivery.queued:
+            for task_id in task_ids:
+                dispatcher.complete(task_id)  # Never reached the worker
+        print(f"Dispatching batch to worker {worker.client_id}")
+
+    dispatch_info = {
+        "clients_notified": len(delivery.queued),
+        "dispatched_to": worker.client_id if worker else None,
+        "delivery": delivery.to_dict()
+    }
+    records = await task_results.wait_all(task_ids, wait if sync_mode else 0)
+    response = {**batch_body(batch_id, task_ids, records), **dispatch_info}
+    if not sync_mode:
+        return JSONResponse({**response, "status": "received"})
+    if response["status"] == "pending":
+        print(f"⏳ Batch {batch_id} still running after {wait:g}s, returning status URL")
+        return JSONResponse(status_code=202, content=response)
+    return JSONResponse(response)
+
+
+@app.get("/tasks/batch/{batch_id}")
+async def get_task_batch(batch_id: str, request: Request, wait: float = 0):
+    """
+    Fetch every result of a batch, long-polling up to `wait` seconds for
+    the tasks still running.
+
+    Returns 200 once all tasks finished, 202 while any is pending, 404 for
+    unknown batches.
+    """
+    if not verify_api_key(request):
+        return JSONResponse(
+            status_code=401,
+            content={"error": "Invalid or missing API key"}
+        )
+
+    task_ids = task_results.get_batch(batch_id)
+    if task_ids is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Unknown batch (never submitted, or it expired)", "batch_id": batch_id}
+        )
+    records = await task_results.wait_all(task_ids, clamp_wait(wait, 0))
+    body = batch_body(batch_id, task_ids, records)
+    return JSONResponse(status_code=202 if body["status"] == "pending" else 200, content=body)
+
+
+@app.get("/tasks/{task_id}/result")
+async def get_task_result(task_id: str, request: Request, wait: float = 0):
+    """
+    Fetch a task's result, long-polling up to `wait` seconds (capped at
+    SYNC_MAX_WAIT) while it is still running.
+
+    Returns 200 with the result, 202 while pending, 404 for unknown tasks.
+    """
+    if not verify_api_key(request):
+        return JSONResponse(
+            status_code=401,
+            content={"error": "Invalid or missing API key"}
+        )
+
+    record = await task_results.wait(task_id, clamp_wait(wait, 0))
+    if record is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Unknown task (never submitted, or its result expired)", "task_id": task_id}
+        )
+    if record.status == PENDING:
+        return JSONResponse(
+            status_code=202,
+            content={"status": PENDING, "task_id": task_id, **task_urls(task_id)}
+        )
+    return JSONResponse(record.to_dict())
+
+
+@app.get("/tasks/{task_id}/stream")
+async def stream_task_output(task_id: str, request: Request):
+    """
+    Follow a task's stdout/stderr as Server-Sent Events.
+
+    Events: "output" ({"stream", "data"}) as the worker produces it, then a
+    final "result" (same body as /tasks/{task_id}/result) before the stream
+    closes. Output produced before connecting is replayed from a bounded
+    buffer ("truncated" says how much was lost).
+    """
+    if not verify_api_key(request):
+        return JSONResponse(
+            status_code=401,
+            content={"error": "Invalid or missing API key"}
+        )
+    if task_results.get(task_id) is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Unknown task (never submitted, or its result expired)", "task_id": task_id}
+        )
+
+    async def events():
+        async for event, data in task_results.follow(task_id, idle_timeout=STREAM_KEEPALIVE):
+            if event == "idle":
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event}\ndata: {encode_message(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+"""
+Broadcast CPU Benchmark
+
+Measures CPU time per broadcast of a large GitHub push payload for 1, 10 and
+100 clients, comparing per-client encoding (the old send_json loop) with
+encoding the envelope once.
+
+Usage:
+    python benchmarks/bench_broadcast.py
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path (benchmarks/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relay.broadcast import broadcast
+from relay.connections import ClientConnection
+from relay.encoding import encode_message, ORJSON_AVAILABLE
+
+ROUNDS = 20
+CLIENT_COUNTS = (1, 10, 100)
+
+
+class NullClient:
+    """Accepts frames without doing any I/O, like an idle local socket"""
+
+    async def send_json(self, message):
+        # Mirrors Starlette's WebSocket.send_json encoding
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, frame):
+        pass
+
+    async def close(self):
+        pass
+
+
+def make_push_payload(commit_count: int = 400) -> dict:
+    """Build a push payload of a few hundred KB"""
+    commits = [{
+        "id": f"{i:040x}",
+        "message": f"Commit {i}: " + "refactor module internals " * 8,
+        "author": {"name": "Dev", "email": "dev@example.com"},
+        "added": [f"src/module_{i}_{j}.py" for j in range(5)],
+        "modified": [f"src/existing_{i}_{j}.py" for j in range(5)],
+        "removed": [],
+    } for i in range(commit_count)]
+    return {
+        "type": "webhook",
+        "sync": False,
+        "event": "push",
+        "delivery_id": "bench",
+        "timestamp": "2025-01-01T00:00:00",
+        "payload": {"ref": "refs/heads/main", "commits": commits},
+    }
+
+
+async def per_client_encoding(clients, message):
+    """The original relay behaviour: send_json once per client"""
+    for client in clients:
+        await client.send_json(message)
+
+
+async def encode_once(clients, message):
+    """Current behaviour: encode once, enqueue, let writer tasks send"""
+    connections = [ClientConnection(client, max_queue=ROUNDS) for client in clients]
+    for connection in connections:
+        connection.start()
+    broadcast(connections, message)
+    await asyncio.gather(*(connection.queue.join() for connection in connections))
+    for connection in connections:
+        connection.close()
+
+
+def measure(clients, message, fn) -> float:
+    """CPU milliseconds per broadcast"""
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        asyncio.run(fn(clients, message))
+    return (time.process_time() - start) * 1000 / ROUNDS
+
+
+def main():
+    message = make_push_payload()
+    size_kb = len(encode_message(message)) / 1024
+    encoder = "orjson" if ORJSON_AVAILABLE else "json"
+
+    print(f"Payload: {size_kb:.0f} KB, encoder: {encoder}, rounds: {ROUNDS}")
+    print(f"{'clients':>8} {'per-client ms':>14} {'encode-once ms':>15} {'speedup':>8}")
+    for count in CLIENT_COUNTS:
+        clients = [NullClient() for _ in range(count)]
+        before = measure(clients, message, per_client_encoding)
+        after = measure(clients, message, encode_once)
+        print(f"{count:>8} {before:>14.2f} {after:>15.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
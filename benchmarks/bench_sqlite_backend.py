@@ -0,0 +1,86 @@
+"""
+SQLite Task Storage Benchmark
+
+Measures tasks/sec through SimpleSQLiteBackend when several task threads
+each create a task, mark it running and store its result (the three writes
+TaskExecutor makes per task), comparing:
+
+- the old settings: rollback journal, synchronous=FULL, a commit per write
+- WAL with synchronous=NORMAL (the new default)
+- WAL with synchronous=NORMAL and group commit every 5 ms
+
+Commit cost depends on the disk, so run it on the filesystem the client's
+database lives on (a tmpfs /tmp hides most of the difference).
+
+Usage:
+    python benchmarks/bench_sqlite_backend.py [directory]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path (benchmarks/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.storage.sqlite_backend import SimpleSQLiteBackend
+
+TASKS = 1000
+THREADS = (1, 8)
+CONFIGS = (
+    ("DELETE/FULL, commit each", dict(journal_mode="DELETE", synchronous="FULL", group_commit_ms=0)),
+    ("WAL/NORMAL, commit each", dict(journal_mode="WAL", synchronous="NORMAL", group_commit_ms=0)),
+    ("WAL/NORMAL, group 5 ms", dict(journal_mode="WAL", synchronous="NORMAL", group_commit_ms=5)),
+)
+OUTPUT = json.dumps({"success": True, "stdout": "x" * 1024, "stderr": "", "returncode": 0})
+
+
+def run_tasks(db: SimpleSQLiteBackend, thread_count: int) -> float:
+    """Tasks per second over TASKS tasks split across thread_count threads"""
+    def worker(offset: int):
+        for n in range(offset, TASKS, thread_count):
+            task_id = f"bench_{n}"
+            db.create_task(task_id, "shell", '{"params": {"command": "true"}}')
+            db.update_task(task_id, "running")
+            db.update_task(task_id, "completed", output_data=OUTPUT)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.flush()
+    return TASKS / (time.perf_counter() - start)
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else tempfile.gettempdir()
+    print(f"Directory: {directory}, tasks per run: {TASKS}")
+    print(f"{'settings':<26}" + "".join(f"{f'{count} thread(s)':>14}" for count in THREADS))
+
+    baseline = {}
+    for name, settings in CONFIGS:
+        row = []
+        for count in THREADS:
+            fd, path = tempfile.mkstemp(suffix=".db", dir=directory)
+            os.close(fd)
+            db = SimpleSQLiteBackend(path, **settings)
+            try:
+                rate = run_tasks(db, count)
+            finally:
+                db.close()
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+            baseline.setdefault(count, rate)
+            row.append(f"{rate:>7.0f} ({rate / baseline[count]:.1f}x)")
+        print(f"{name:<26}" + "".join(f"{cell:>14}" for cell in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Async Task Executor
+
+TaskExecutor on asyncio subprocesses: tasks are coroutines rather than
+threads, so one client can run hundreds at once. Output is read from the
+pipes as it arrives, a timeout or cancellation kills the command's whole
+process group (shell pipelines and their children included), and results
+have the same shape as TaskExecutor's.
+
+Database bookkeeping runs on the storage thread of an AsyncSQLiteBackend,
+so the event loop never waits on SQLite, and the writes of tasks finishing
+together are committed together.
+"""
+
+import asyncio
+import codecs
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.output_capture import OutputCapture
+from client.storage.async_sqlite_backend import AsyncSQLiteBackend
+from client.task_batch import TaskBatch
+from client.task_dag import dag_result, parse_steps
+from client.task_executor import TaskExecutor
+
+
+class AsyncTaskExecutor(TaskExecutor):
+    """
+    TaskExecutor whose handle_task is a coroutine.
+
+    Validation, database bookkeeping and result dicts are shared with
+    TaskExecutor; only process execution differs, and the bookkeeping runs
+    on the storage thread (self.store).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = AsyncSQLiteBackend(self.db)
+
+    async def handle_task(self, task_data: dict, on_output=None) -> dict:
+        """
+        Execute a task (see TaskExecutor.handle_task).
+
+        Cancelling the coroutine kills the running command and records the
+        task as failed before CancelledError propagates.
+        """
+        task_id, action_type, params, error = await self.store.run(self._begin, task_data)
+        if error:
+            return error
+
+        try:
+            result = await self._execute_async(action_type, params, on_output, task_id)
+        except asyncio.CancelledError:
+            await asyncio.shield(self.store.run(self._fail_task, task_id, 'Task cancelled'))
+            raise
+        except Exception as e:
+            return await self.store.run(self._fail_task, task_id, f'Execution error: {str(e)}')
+        return await self.store.run(self._finish_task, task_id, result)
+
+    async def _execute_async(self, action_type: str, params: dict, on_output=None,
+                             task_id: str = None) -> dict:
+        if action_type == 'dag':
+            return await self._execute_dag_async(params, on_output, task_id)
+        spec, error = self._prepare(action_type, params)
+        if error:
+            return error
+        if action_type == 'claude_code':
+            error = await asyncio.to_thread(self._check_claude_cli)  # May re-probe
+            if error:
+                return error
+
+        cached = self._from_cache(action_type, spec, params, on_output)
+        if cached:
+            return cached
+        key = self._flight_key(action_type, spec, params)
+        if key is None:
+            result = await self._execute_spec_async(action_type, spec, on_output, task_id)
+        else:
+            result = await self.single_flight.run_async(
+                key, lambda output: self._execute_spec_async(action_type, spec, output, task_id),
+                task_id, on_output
+            )
+        self._to_cache(action_type, spec, params, result)
+        return result
+
+    async def _execute_dag_async(self, params: dict, on_output=None, task_id: str = None) -> dict:
+        """TaskExecutor._execute_dag with steps as coroutines"""
+        steps, error = parse_steps(params)
+        if error:
+            return {'success': False, 'error': error}
+        order = TaskBatch(task_id, steps)
+        results, skipped = {}, {}
+        slots = asyncio.Semaphore(int(params.get('max_parallel') or len(steps)))
+
+        async def run_step(step):
+            async with slots:
+                step_params, started = await self.store.run(self._step_started, task_id, step, results)
+                try:
+                    result = await self._execute_async(
+                        step['action_type'], step_params, self._step_output(step, on_output),
+                        f"{task_id}.{step['id']}")
+                except Exception as e:
+                    result = {'success': False, 'error': f'Execution error: {str(e)}'}
+                return await self.store.run(self._step_finished, task_id, step, result, started)
+
+        running = {}
+
+        def start(ready):
+            for step in ready:
+                running[asyncio.ensure_future(run_step(step))] = step
+
+        start(order.ready())
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    results[step['id']] = future.result()
+                    start(await self.store.run(self._step_done, task_id, order, step, results, skipped))
+        finally:
+            for future in running:
+                future.cancel()  # Cancelled DAG: kill the steps still running
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return dag_result(steps, results, skipped)
+
+    def metrics(self) -> dict:
+        """TaskExecutor.metrics plus storage thread request and batch counts"""
+        return {**super().metrics(), 'storage': self.store.stats()}
+
+    def close(self):
+        self.store.close()
+        super().close()
+
+    async def _execute_spec_async(self, action_type: str, spec: dict, on_output=None,
+                                  task_id: str = None) -> dict:
+        captures = self._captures(task_id)
+        if action_type == 'git' and self.git_engine is not None:
+            output = await asyncio.to_thread(self.git_engine.run, spec['command'], spec['cwd'])
+            if output is not None:
+                return self._completed(self._answered(spec['command'], output, captures, on_output))
+
+        try:
+            result = await self._run_async(
+                spec['command'],
+                cwd=spec['cwd'],
+                timeout=spec['timeout'],
+                shell=spec['shell'],
+                on_output=on_output,
+                captures=captures
+            )
+        except subprocess.TimeoutExpired:
+            return self._timed_out(spec)
+        except Exception as e:
+            return self._execution_error(spec, e)
+        return self._completed(result)
+
+    async def _run_async(self, command, cwd: str, timeout: float, shell: bool = False,
+                         on_output=None, captures: dict = None) -> subprocess.CompletedProcess:
+        """
+        Run a command in its own process group and capture its output.
+
+        Output goes into bounded captures as in TaskExecutor._run, and
+        chunks are passed to on_output(stream, text) as they are read, if
+        given. Like subprocess.run, the timeout covers the command and its
+        output pipes.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command runs past timeout
+        """
+        pipes = dict(cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                     start_new_session=True)  # New process group, killed as a unit
+        if shell:
+            process = await asyncio.create_subprocess_shell(command, **pipes)
+        else:
+            process = await asyncio.create_subprocess_exec(*command, **pipes)
+
+        if captures is None:
+            captures = {stream: OutputCapture() for stream in ('stdout', 'stderr')}
+        readers = [
+            asyncio.ensure_future(self._pump_async(getattr(process, stream), stream, captures[stream], on_output))
+            for stream in captures
+        ]
+        try:
+            await asyncio.wait_for(asyncio.gather(process.wait(), *readers), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self._kill(process, readers)
+            raise subprocess.TimeoutExpired(command, timeout)
+        except asyncio.CancelledError:
+            await self._kill(process, readers)
+            raise
+        finally:
+            for capture in captures.values():
+                capture.close()  # Flush any spill file
+
+        return self._captured(command, process.returncode, captures)
+
+    @staticmethod
+    async def _kill(process, readers):
+        """Kill the command's process group and stop reading its pipes"""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        for reader in readers:
+            reader.cancel()
+        await process.wait()
+
+    @classmethod
+    async def _pump_async(cls, stream, name: str, capture: OutputCapture, on_output):
+        """Read one pipe until EOF, capturing and forwarding decoded chunks"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            data = await stream.read(65536)
+            text = decoder.decode(data, final=not data)
+            if text:
+                cls._forward(capture, name, text, on_output)
+            if not data:
+                break
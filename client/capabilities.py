@@ -0,0 +1,132 @@
+"""
+Tool Capabilities
+
+Finds the command-line tools tasks depend on (git, claude, ...) once and
+caches their path and version, instead of spawning `tool --version` before
+every task. A cached entry is re-probed when:
+
+- its TTL expires,
+- the binary on disk changes (path disappears or its mtime moves),
+- a missing tool shows up on PATH, or
+- running it fails (invalidate()).
+
+The report is sent to the relay with the worker registration, so the relay
+only dispatches action types this client can actually run.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Tool each action type needs (None: always available)
+ACTION_TOOLS = {
+    "git": "git",
+    "shell": None,
+    "claude_code": "claude",
+    "dag": None,  # Each step is checked when it runs
+}
+
+
+@dataclass
+class ToolInfo:
+    """Result of probing one tool"""
+    name: str
+    path: Optional[str] = None
+    version: Optional[str] = None
+    error: Optional[str] = None
+    mtime: Optional[float] = None
+    checked_at: float = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None and self.error is None
+
+    def to_dict(self):
+        return {
+            "available": self.available,
+            "path": self.path,
+            "version": self.version,
+            "error": self.error,
+        }
+
+
+class ToolCapabilities:
+    """Cached availability, path and version of task tools"""
+
+    def __init__(self, tools=None, ttl: float = 300, probe_timeout: float = 5):
+        """
+        Args:
+            tools: Tool names to track (defaults to those ACTION_TOOLS needs)
+            ttl: Seconds before a tool is probed again regardless
+            probe_timeout: Seconds allowed for `tool --version`
+        """
+        self.tools = list(tools or [t for t in ACTION_TOOLS.values() if t])
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self._cache: Dict[str, ToolInfo] = {}
+        self._lock = threading.Lock()
+
+    def probe_all(self) -> Dict[str, ToolInfo]:
+        """Probe every tracked tool now (at startup)"""
+        return {name: self.get(name, refresh=True) for name in self.tools}
+
+    def get(self, name: str, refresh: bool = False) -> ToolInfo:
+        """Cached info for a tool, re-probing it if stale"""
+        with self._lock:
+            info = self._cache.get(name)
+            if refresh or info is None or self._stale(info):
+                info = self._cache[name] = self._probe(name)
+            return info
+
+    def invalidate(self, name: str):
+        """Forget a tool (e.g. after running it failed) so the next get() probes it"""
+        with self._lock:
+            self._cache.pop(name, None)
+
+    def available(self, name: str) -> bool:
+        return self.get(name).available
+
+    def action_types(self):
+        """Action types whose tools are available"""
+        return [
+            action_type for action_type, tool in ACTION_TOOLS.items()
+            if tool is None or self.available(tool)
+        ]
+
+    def report(self) -> Dict[str, dict]:
+        """Capability report for the relay registration"""
+        return {name: self.get(name).to_dict() for name in self.tools}
+
+    def _stale(self, info: ToolInfo) -> bool:
+        if time.monotonic() - info.checked_at > self.ttl:
+            return True
+        if info.path is None:
+            return shutil.which(info.name) is not None  # Installed since
+        try:
+            return os.stat(info.path).st_mtime != info.mtime  # Upgraded or removed
+        except OSError:
+            return True
+
+    def _probe(self, name: str) -> ToolInfo:
+        info = ToolInfo(name=name, checked_at=time.monotonic())
+        info.path = shutil.which(name)
+        if info.path is None:
+            info.error = "not found on PATH"
+            return info
+        try:
+            info.mtime = os.stat(info.path).st_mtime
+            result = subprocess.run(
+                [info.path, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=self.probe_timeout
+            )
+            output = (result.stdout or result.stderr).strip()
+            info.version = output.splitlines()[0] if output else None
+        except Exception as e:
+            info.error = f"version check failed: {e}"
+        return info
@@ -12,6 +12,7 @@ import websockets
 import json
 import os
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 # Load environment variables from .env file
@@ -40,9 +41,22 @@ except ImportError as e:
     print(f"⚠️  Session manager not available: {e}")
     SESSION_MANAGER_AVAILABLE = False
 
+# "relay" receives tasks over the relay WebSocket; "pg_worker" claims them
+# from the Postgres task queue (see pg_worker.py)
+CLIENT_MODE = os.getenv("CLIENT_MODE", "relay")
+
 # Import task executor for MVP task execution
+# (TASK_EXECUTOR_BACKEND: "thread" runs tasks in pool threads, "async" on asyncio subprocesses)
+TASK_EXECUTOR_BACKEND = os.getenv("TASK_EXECUTOR_BACKEND", "thread")
+if CLIENT_MODE == "pg_worker" and TASK_EXECUTOR_BACKEND == "async":
+    # The Postgres worker runs tasks on its own threads, which need the sync executor
+    print("⚠️  TASK_EXECUTOR_BACKEND=async is not supported with CLIENT_MODE=pg_worker; using thread")
+    TASK_EXECUTOR_BACKEND = "thread"
 try:
-    from task_executor import TaskExecutor
+    if TASK_EXECUTOR_BACKEND == "async":
+        from async_task_executor import AsyncTaskExecutor as TaskExecutor
+    else:
+        from task_executor import TaskExecutor
     task_executor = TaskExecutor()
     TASK_EXECUTOR_AVAILABLE = True
 except ImportError as e:
@@ -51,9 +65,41 @@ except ImportError as e:
 
 # Configuration
 SERVER_URL = os.getenv("RELAY_SERVER_URL", "ws://localhost:8000/ws")
+
+# Optional subscription filters (comma-separated); unset means receive everything
+SUBSCRIBE_EVENTS = [e.strip() for e in os.getenv("RELAY_SUBSCRIBE_EVENTS", "").split(",") if e.strip()]
+SUBSCRIBE_PAYLOAD_TYPES = [t.strip() for t in os.getenv("RELAY_SUBSCRIBE_PAYLOAD_TYPES", "").split(",") if t.strip()]
+SUBSCRIBE_REPOSITORIES = [r.strip() for r in os.getenv("RELAY_SUBSCRIBE_REPOSITORIES", "").split(",") if r.strip()]
+
+# Tasks this client advertises it can run at once when registering as a worker
+TASK_CAPACITY = int(os.getenv("TASK_CAPACITY", "1"))
+
+# Send task stdout/stderr to the relay as it is produced (followers of /tasks/{id}/stream)
+STREAM_TASK_OUTPUT = os.getenv("STREAM_TASK_OUTPUT", "true").lower() == "true"
+
+# Tasks run in a thread pool off the WebSocket loop; TASK_CONCURRENCY optionally
+# caps individual action types, e.g. "claude_code=1,shell=4". Unless capped,
+# claude_code may use all but one slot, so quick git/shell tasks never wait
+# behind long claude_code runs
+from task_batch import TaskBatch
+from worker_pool import TaskWorkerPool, parse_limits
+TASK_POOL_SIZE = int(os.getenv("TASK_POOL_SIZE", str(TASK_CAPACITY)))
+TASK_LIMITS = parse_limits(os.getenv("TASK_CONCURRENCY", ""))
+if TASK_POOL_SIZE > 1:
+    TASK_LIMITS.setdefault("claude_code", TASK_POOL_SIZE - 1)
+task_pool = TaskWorkerPool(
+    max_workers=TASK_POOL_SIZE,
+    limits=TASK_LIMITS,
+    aging=float(os.getenv("TASK_PRIORITY_AGING", "30"))
+)
+
 LOG_DIR = Path("webhook_logs")
 LOG_DIR.mkdir(exist_ok=True)
 
+# Last relay delivery we handled, so reconnects can replay what we missed
+from relay_cursor import RelayCursor
+relay_cursor = RelayCursor(LOG_DIR / "relay_cursor.json")
+
 
 def log_webhook(event_type: str, payload: dict):
     """Save webhook data to a log file"""
@@ -66,23 +112,143 @@ def log_webhook(event_type: str, payload: dict):
     print(f"📝 Saved to {filename}")
 
 
-def handle_webhook(data: dict, sync_mode: bool = False):
+def build_subscription() -> dict:
+    """Build the subscribe message from environment filters, or None to receive everything"""
+    if not (SUBSCRIBE_EVENTS or SUBSCRIBE_PAYLOAD_TYPES or SUBSCRIBE_REPOSITORIES):
+        return None
+    return {
+        "type": "subscribe",
+        "events": SUBSCRIBE_EVENTS,
+        "payload_types": SUBSCRIBE_PAYLOAD_TYPES,
+        "repositories": SUBSCRIBE_REPOSITORIES
+    }
+
+
+def build_registration() -> dict:
+    """Build the worker registration message, or None if this client cannot run tasks"""
+    if not TASK_EXECUTOR_AVAILABLE:
+        return None
+    capabilities = task_executor.capabilities
+    return {
+        "type": "register",
+        "capacity": TASK_CAPACITY,
+        "action_types": capabilities.action_types(),  # Only what our installed tools can run
+        "capabilities": capabilities.report()
+    }
+
+
+def task_priority(task_data: dict) -> int:
+    """The task's priority (higher runs sooner), 0 if missing or invalid"""
+    try:
+        return int(task_data.get("priority", 0))
+    except (TypeError, ValueError):
+        print(f"⚠️  Ignoring invalid task priority: {task_data.get('priority')!r}")
+        return 0
+
+
+def unwrap_task_command(data: dict):
+    """Return the task_command inside a relay message, or None for anything else"""
+    if data.get("type") == "webhook":
+        data = data.get("payload", {})
+    return data if data.get("type") == "task_command" else None
+
+
+def unwrap_task_batch(data: dict):
+    """Return the task_batch inside a relay message (POST /tasks/batch), or None"""
+    if data.get("type") == "webhook":
+        data = data.get("payload", {})
+    return data if data.get("type") == "task_batch" else None
+
+
+def task_output_sender(task_id: str, send):
+    """Build the executor's on_output callback, or None if not streaming"""
+    if send is None or not STREAM_TASK_OUTPUT:
+        return None
+    return lambda stream, text: send({
+        "type": "task_output",
+        "task_id": task_id,
+        "stream": stream,
+        "data": text
+    })
+
+
+def task_result_message(task_id: str, result: dict, sync_mode: bool = False) -> dict:
+    """Report an executor result and build the task_result message for the relay"""
+    # Display result
+    if result.get("status") == "success":
+        print(f"✅ Task completed: {task_id}")
+        output = result.get("result", {})
+        if output.get("stdout"):
+            print(f"   Output: {output['stdout'][:100]}...")  # Show first 100 chars
+    elif result.get("status") == "failed":
+        print(f"❌ Task failed: {task_id}")
+        print(f"   Error: {result.get('error')}")
+    else:
+        print(f"⚠️  Task error: {result.get('error')}")
+
+    # Send the result back so the relay can release this worker's slot
+    # (and answer the caller in sync mode)
+    if sync_mode:
+        print(f"↩️  Sending result back to relay server")
+    return {
+        "type": "task_result",
+        "task_id": task_id,
+        "status": "completed" if result.get("status") == "success" else "failed",
+        "output": result.get("result"),
+        "error": result.get("error")
+    }
+
+
+async def handle_task_command_async(data: dict, sync_mode: bool = False, send=None) -> dict:
+    """Run a task command on the AsyncTaskExecutor (TASK_EXECUTOR_BACKEND=async)"""
+    sync_mode = data.get("sync", sync_mode)
+    task_data = unwrap_task_command(data).get("data", {})
+    task_id = task_data.get("task_id", "unknown")
+    print(f"\n📬 Received task command{' (sync)' if sync_mode else ''}")
+    print(f"   Task ID: {task_id}")
+    print(f"   Action: {task_data.get('action_type', 'unknown')}")
+    result = await task_executor.handle_task(task_data, on_output=task_output_sender(task_id, send))
+    return task_result_message(task_id, result, sync_mode)
+
+
+def handle_webhook(data: dict, sync_mode: bool = False, send=None):
     """Process incoming webhook data
 
     Args:
         data: The webhook data
         sync_mode: If True, returns result for synchronous response
+        send: Optional callback taking a message for the relay, used to
+              stream task_output while a task runs (may be called from
+              this thread while handle_webhook is still running)
 
     Returns:
-        dict or None: Task result if sync_mode=True and task was executed, None otherwise
+        dict or None: Task result for task commands (the relay uses it to free
+                      this worker's dispatch slot and answer sync requests),
+                      None otherwise
     """
     if data.get("type") == "connection":
         print(f"✅ {data['message']}")
+        if data.get("epoch"):
+            # Ask for anything we missed while disconnected
+            return relay_cursor.resume_message(data["epoch"], data.get("latest_seq", 0))
+        return None
+
+    if data.get("type") == "replay":
+        relay_cursor.on_replay(data.get("status"), data.get("epoch"))
+        print(f"⏪ Replaying {data.get('count', 0)} missed deliveries ({data.get('status')})")
+        return None
+
+    if data.get("type") == "replay_complete":
+        print(f"⏩ Replay complete, caught up to {data.get('latest_seq')}")
         return None
 
     if data.get("type") == "pong":
         return None  # Heartbeat response
 
+    if data.get("type") == "subscribed":
+        print(f"📡 Subscription active: {data.get('subscription')}")
+        return None
+
     # Check if this is a wrapped message from relay server
     # If type="webhook", the actual payload is in the "payload" field
     if data.get("type") == "webhook":
@@ -125,43 +291,17 @@ def handle_webhook(data: dict, sync_mode: bool = False):
             print(f"   Task ID: {task_id}")
             print(f"   Action: {action_type}")
 
-            # Execute task
-            result = task_executor.handle_task(task_data)
-
-            # Display result
-            if result.get("status") == "success":
-                print(f"✅ Task completed: {task_id}")
-                output = result.get("result", {})
-                if output.get("stdout"):
-                    print(f"   Output: {output['stdout'][:100]}...")  # Show first 100 chars
-            elif result.get("status") == "failed":
-                print(f"❌ Task failed: {task_id}")
-                print(f"   Error: {result.get('error')}")
-            else:
-                print(f"⚠️  Task error: {result.get('error')}")
-
-            # If sync mode, prepare result to send back
-            if sync_mode:
-                task_result = {
-                    "type": "task_result",
-                    "task_id": task_id,
-                    "status": "completed" if result.get("status") == "success" else "failed",
-                    "output": result.get("result"),
-                    "error": result.get("error")
-                }
-                if sync_mode:
-                    print(f"↩️  Sending result back to relay server")
-                return task_result
+            # Execute task, streaming its output to the relay as it arrives
+            result = task_executor.handle_task(task_data, on_output=task_output_sender(task_id, send))
+            return task_result_message(task_id, result, sync_mode)
         else:
             print("⚠️  Task executor not available")
-            if sync_mode:
-                return {
-                    "type": "task_result",
-                    "task_id": data.get("data", {}).get("task_id", "unknown"),
-                    "status": "failed",
-                    "error": "Task executor not available"
-                }
-        return None
+            return {
+                "type": "task_result",
+                "task_id": data.get("data", {}).get("task_id", "unknown"),
+                "status": "failed",
+                "error": "Task executor not available"
+            }
 
     # Handle LLM conversation insights
     if data.get("type") == "llm_conversation_insight":
@@ -252,6 +392,70 @@ def handle_issue_event(payload: dict):
 async def connect_with_retry(max_retries: int = None, retry_delay: int = 5):
     """Connect to relay server with automatic retry"""
     retry_count = 0
+
+    # Everything we send goes through one queue, so streamed output always
+    # reaches the relay before the task's result; it outlives reconnects so
+    # results of tasks that finish while we are disconnected are still sent
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue()
+
+    def send_threadsafe(message: dict):
+        loop.call_soon_threadsafe(outbox.put_nowait, json.dumps(message))
+
+    def task_done(result, task_id: str):
+        if isinstance(result, Exception):
+            result = {
+                "type": "task_result",
+                "task_id": task_id,
+                "status": "failed",
+                "error": f"Task handler error: {result}"
+            }
+        if result is not None:
+            outbox.put_nowait(json.dumps(result))
+
+    def submit_task(data: dict, on_done):
+        """Queue a task command on the worker pool"""
+        task_data = unwrap_task_command(data).get("data", {})
+        run_task = handle_webhook
+        if TASK_EXECUTOR_AVAILABLE and TASK_EXECUTOR_BACKEND == "async":
+            run_task = handle_task_command_async
+        task_pool.submit(
+            task_data.get("action_type", "unknown"),
+            run_task, data, False, send_threadsafe,
+            on_done=on_done,
+            priority=task_priority(task_data),
+            caller=task_data.get("session_id") or task_data.get("caller"),
+            on_start=task_data.update  # Queue wait and depth, stored with the task
+        )
+
+    def run_batch(batch_data: dict):
+        """Queue a batch's tasks, each once the tasks it depends on succeeded"""
+        batch = TaskBatch(batch_data.get("batch_id", "unknown"), batch_data.get("tasks", []))
+        print(f"\n📦 Received batch {batch.batch_id} ({len(batch.tasks)} tasks)")
+
+        def start(tasks):
+            for task in tasks:
+                submit_task({"type": "task_command", "data": task},
+                            partial(batch_task_done, task_id=task["task_id"]))
+
+        def batch_task_done(result, task_id: str):
+            task_done(result, task_id)
+            succeeded = isinstance(result, dict) and result.get("status") == "completed"
+            ready, skipped = batch.finish(task_id, succeeded)
+            for skipped_id in skipped:
+                print(f"⏭️  Skipping {skipped_id}: dependency {task_id} did not succeed")
+                outbox.put_nowait(json.dumps({
+                    "type": "task_result",
+                    "task_id": skipped_id,
+                    "status": "failed",
+                    "error": f"Skipped: dependency {task_id} did not succeed"
+                }))
+            start(ready)
+            if batch.done:
+                succeeded_count = sum(batch.finished.values())
+                print(f"📦 Batch {batch.batch_id} done: {succeeded_count}/{len(batch.tasks)} succeeded")
+
+        start(batch.ready())
     
     while max_retries is None or retry_count < max_retries:
         try:
@@ -260,33 +464,80 @@ async def connect_with_retry(max_retries: int = None, retry_delay: int = 5):
             async with websockets.connect(SERVER_URL) as websocket:
                 print("✅ Connected! Waiting for webhooks...\n")
                 retry_count = 0  # Reset on successful connection
+
+                # Narrow what the relay sends us, if configured
+                subscription = build_subscription()
+                if subscription:
+                    await websocket.send(json.dumps(subscription))
+
+                # Offer to run tasks so the relay dispatches them to us alone
+                registration = build_registration()
+                if registration:
+                    await websocket.send(json.dumps(registration))
                 
+                async def sender():
+                    while True:
+                        await websocket.send(await outbox.get())
+
                 # Send periodic heartbeat
                 async def heartbeat():
+                    advertised = registration
                     while True:
                         await asyncio.sleep(30)
-                        try:
-                            await websocket.send(json.dumps({"type": "ping"}))
-                        except:
-                            break
+                        ping = {"type": "ping"}
+                        metrics = task_executor.metrics() if TASK_EXECUTOR_AVAILABLE else {}
+                        if metrics:
+                            ping["metrics"] = metrics  # Shown per worker on the relay's /
+                        outbox.put_nowait(json.dumps(ping))
+
+                        # Register again if a tool was installed, upgraded or removed
+                        current = await asyncio.to_thread(build_registration)
+                        if current != advertised:
+                            advertised = current
+                            outbox.put_nowait(json.dumps(current))
                 
+                sender_task = asyncio.create_task(sender())
                 heartbeat_task = asyncio.create_task(heartbeat())
                 
                 try:
                     async for message in websocket:
                         try:
                             data = json.loads(message)
-                            result = handle_webhook(data)
-
-                            # If synchronous mode and we have a result, send it back
+                            seq = data.get("seq")
+                            if seq is not None and relay_cursor.seen(seq):
+                                continue  # Already handled (replay overlap)
+
+                            # Tasks run in the pool and report back when done,
+                            # so we keep receiving while they run
+                            task_command = unwrap_task_command(data)
+                            task_batch = unwrap_task_batch(data)
+                            if task_command is not None or task_batch is not None:
+                                if task_batch is not None:
+                                    run_batch(task_batch.get("data", {}))
+                                else:
+                                    task_id = task_command.get("data", {}).get("task_id", "unknown")
+                                    submit_task(data, partial(task_done, task_id=task_id))
+                                if seq is not None:
+                                    relay_cursor.ack(seq)
+                                continue
+
+                            # Off the event loop, so the connection stays responsive
+                            result = await asyncio.to_thread(
+                                handle_webhook, data, False, send_threadsafe
+                            )
+                            if seq is not None:
+                                relay_cursor.ack(seq)
+
+                            # If we have a result (task result or resume request), send it back
                             if result is not None:
-                                await websocket.send(json.dumps(result))
+                                outbox.put_nowait(json.dumps(result))
                         except json.JSONDecodeError:
                             print(f"⚠️  Invalid JSON received: {message}")
                         except Exception as e:
                             print(f"❌ Error handling webhook: {e}")
                 finally:
                     heartbeat_task.cancel()
+                    sender_task.cancel()
                     
         except websockets.exceptions.ConnectionClosed:
             print("⚠️  Connection closed by server")
@@ -307,6 +558,16 @@ async def main():
     print("=" * 60)
     print("GitHub Webhook Client")
     print("=" * 60)
+    if CLIENT_MODE == "pg_worker":
+        # Pull tasks from the Postgres queue instead of the relay
+        from pg_worker import run_pg_worker
+        print("Mode: Postgres task queue worker")
+        print("=" * 60)
+        if not TASK_EXECUTOR_AVAILABLE:
+            raise RuntimeError("CLIENT_MODE=pg_worker needs the task executor")
+        await asyncio.to_thread(run_pg_worker, task_executor)
+        return
+
     print(f"Server: {SERVER_URL}")
     print(f"Log Directory: {LOG_DIR.absolute()}")
     print("=" * 60)
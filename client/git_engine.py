@@ -0,0 +1,485 @@
+"""
+Warm Git Engine
+
+Answers common read-only git commands without forking git for every task.
+Refs are read straight from the repository files and objects come from one
+long-running `git cat-file --batch` process per repository, so a
+`git rev-parse HEAD` costs a few file reads and a `git log -n 5 --format=%H`
+a few pipe round trips.
+
+Supported (output identical to git's):
+
+- git rev-parse [--verify] <HEAD|branch|tag|full sha>
+- git rev-parse --abbrev-ref HEAD / --show-toplevel
+- git branch --show-current
+- git log [-n N | -N | --max-count=N] --format=<fmt> [<rev>]
+  (also --pretty=format:/tformat:; placeholders %H %T %P %an %ae %at %cn
+  %ce %ct %s %n %%)
+- git cat-file -t|-s|-p <object> (-p for blobs, commits and tags)
+- git show <rev>:<path> (blobs)
+
+Anything else - other commands or options, errors, unusual repository
+layouts - returns None and the caller runs real git instead.
+"""
+
+import heapq
+import os
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+MAX_COUNT_RE = re.compile(r'^-(\d+)$')
+
+# Environment variables that change which repository git looks at
+GIT_ENV_OVERRIDES = ('GIT_DIR', 'GIT_WORK_TREE', 'GIT_COMMON_DIR', 'GIT_OBJECT_DIRECTORY',
+                     'GIT_NAMESPACE', 'GIT_ALTERNATE_OBJECT_DIRECTORIES')
+
+# --format placeholders answered from the commit object
+FORMAT_PLACEHOLDERS = ('H', 'T', 'P', 'an', 'ae', 'at', 'cn', 'ce', 'ct', 's', 'n', '%')
+
+
+class _Unsupported(Exception):
+    """The engine cannot answer this exactly; run real git"""
+
+
+class _Repository:
+    """One repository: its git directories and a warm cat-file process"""
+
+    def __init__(self, toplevel: str, git_dir: str, common_dir: str):
+        self.toplevel = toplevel
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self._process = None
+        self._lock = threading.Lock()
+
+    # Refs
+
+    def head(self) -> str:
+        """Contents of HEAD: 'ref: refs/heads/x' or a sha"""
+        return self._read(os.path.join(self.git_dir, 'HEAD'))
+
+    def resolve(self, name: str) -> str:
+        """Full sha for HEAD, a branch, tag or remote name, or a full sha"""
+        if SHA_RE.match(name):
+            return name
+        if name == 'HEAD':
+            return self._follow('HEAD')
+        if name.startswith('-') or '..' in name or any(c in name for c in '^~:@{}*?[\\ '):
+            raise _Unsupported(name)
+        # git's lookup order (see `git help revisions`)
+        for ref in (name, f'refs/{name}', f'refs/tags/{name}', f'refs/heads/{name}',
+                    f'refs/remotes/{name}', f'refs/remotes/{name}/HEAD'):
+            if ref.startswith('refs/') or ref == name and name.isupper():
+                sha = self._ref(ref)
+                if sha:
+                    return sha
+        raise _Unsupported(name)
+
+    def _follow(self, ref: str) -> str:
+        for _ in range(5):
+            value = self._ref_value(ref)
+            if value is None:
+                raise _Unsupported(ref)  # Unborn branch
+            if not value.startswith('ref: '):
+                return value
+            ref = value[5:]
+        raise _Unsupported(ref)
+
+    def _ref(self, ref: str) -> Optional[str]:
+        value = self._ref_value(ref)
+        if value is None:
+            return None
+        return self._follow(ref) if value.startswith('ref: ') else value
+
+    def _ref_value(self, ref: str) -> Optional[str]:
+        base = self.git_dir if ref == 'HEAD' or '/' not in ref else self.common_dir
+        try:
+            value = self._read(os.path.join(base, ref))
+        except FileNotFoundError:
+            return self._packed_ref(ref)
+        except IsADirectoryError:
+            return None
+        if not (value.startswith('ref: ') or SHA_RE.match(value)):
+            raise _Unsupported(ref)
+        return value
+
+    def _packed_ref(self, ref: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.common_dir, 'packed-refs')) as f:
+                for line in f:
+                    sha, _, name = line.rstrip('\n').partition(' ')
+                    if name == ref and SHA_RE.match(sha):
+                        return sha
+        except FileNotFoundError:
+            pass
+        return None
+
+    @staticmethod
+    def _read(path: str) -> str:
+        with open(path) as f:
+            return f.read().strip()
+
+    # Objects
+
+    def object(self, name: str):
+        """(type, content bytes) of an object via the warm cat-file process"""
+        if '\n' in name:
+            raise _Unsupported(name)
+        with self._lock:
+            process = self._cat_file()
+            try:
+                process.stdin.write(name.encode() + b'\n')
+                process.stdin.flush()
+                line = process.stdout.readline()
+                if not line:
+                    raise OSError('cat-file exited')
+                header = line.decode().split()
+                if len(header) != 3:
+                    raise _Unsupported(name)  # "<name> missing" / "ambiguous"
+                content = process.stdout.read(int(header[2]) + 1)[:-1]
+            except (OSError, ValueError):
+                self.close()
+                raise _Unsupported(name)
+        return header[1], content
+
+    def commit(self, sha: str):
+        """Parsed commit: (sha, headers, message), peeling tags"""
+        for _ in range(5):
+            kind, content = self.object(sha)
+            if kind == 'commit':
+                return (sha,) + self._parse_commit(content)
+            if kind != 'tag':
+                raise _Unsupported(sha)
+            sha = content.split(b'\n', 1)[0].split(b' ')[1].decode()  # "object <sha>"
+        raise _Unsupported(sha)
+
+    @staticmethod
+    def _parse_commit(content: bytes):
+        header, _, message = content.partition(b'\n\n')
+        headers = {'parent': []}
+        for line in header.decode('utf-8').split('\n'):
+            if line.startswith(' '):
+                continue  # Continuation of a multi-line header (gpgsig)
+            key, _, value = line.partition(' ')
+            if key == 'parent':
+                headers['parent'].append(value)
+            else:
+                headers.setdefault(key, value)
+        if headers.get('encoding', 'utf-8').lower() not in ('utf-8', 'utf8'):
+            raise _Unsupported('encoding')
+        return headers, message.decode('utf-8')
+
+    def _cat_file(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ['git', 'cat-file', '--batch'],
+                cwd=self.toplevel,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._process
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=1)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
+
+class GitEngine:
+    """Warm repository handles answering read-only git commands"""
+
+    def __init__(self, max_repositories: int = 16):
+        """
+        Args:
+            max_repositories: Repositories kept warm at once; the least
+                              recently used one's cat-file process is closed
+        """
+        self.max_repositories = max_repositories
+        self._repositories = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, command: list, cwd: str) -> Optional[str]:
+        """
+        Answer a git command run in cwd.
+
+        Returns:
+            str: The command's stdout, or None if real git must run it
+        """
+        try:
+            repository = self._repository(cwd)
+            output = self._dispatch(repository, command[1:], cwd)
+        except (_Unsupported, OSError, UnicodeDecodeError, IndexError, ValueError):
+            output = None
+        if output is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return output
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'repositories': len(self._repositories)}
+
+    def close(self):
+        with self._lock:
+            for repository in self._repositories.values():
+                repository.close()
+            self._repositories.clear()
+
+    # Repository discovery
+
+    def _repository(self, cwd: str) -> _Repository:
+        if any(name in os.environ for name in GIT_ENV_OVERRIDES):
+            raise _Unsupported('environment')
+        found = find_repository(cwd)
+        if found is None:
+            raise _Unsupported('not a repository')
+        toplevel = found[0]
+        with self._lock:
+            repository = self._repositories.get(toplevel)
+            if repository is None:
+                repository = self._open(toplevel)
+                self._repositories[toplevel] = repository
+                if len(self._repositories) > self.max_repositories:
+                    _, oldest = self._repositories.popitem(last=False)
+                    oldest.close()
+            else:
+                self._repositories.move_to_end(toplevel)
+        return repository
+
+    @staticmethod
+    def _open(toplevel: str) -> _Repository:
+        if os.stat(toplevel).st_uid != os.getuid():
+            raise _Unsupported('safe.directory')  # Let git decide whether to trust it
+        found = find_repository(toplevel)
+        if found is None:
+            raise _Unsupported('.git')
+        _, git_dir, common_dir = found
+        for unsupported in ('reftable', 'shallow', 'info/grafts'):
+            if os.path.exists(os.path.join(common_dir, unsupported)):
+                raise _Unsupported(unsupported)
+        return _Repository(toplevel, git_dir, common_dir)
+
+    # Commands
+
+    def _dispatch(self, repository: _Repository, args: list, cwd: str) -> Optional[str]:
+        if not args:
+            return None
+        name, args = args[0], args[1:]
+        if name == 'log':
+            return self._log(repository, args, cwd)
+        handler = {
+            'rev-parse': self._rev_parse,
+            'branch': self._branch,
+            'cat-file': self._cat_file,
+            'show': self._show,
+        }.get(name)
+        return handler(repository, args) if handler else None
+
+    @staticmethod
+    def _rev_parse(repository: _Repository, args: list) -> Optional[str]:
+        if args == ['--show-toplevel']:
+            return repository.toplevel + '\n'
+        if args == ['--abbrev-ref', 'HEAD']:
+            repository.resolve('HEAD')  # Unborn branches are an error
+            head = repository.head()
+            if head.startswith('ref: refs/heads/'):
+                return head[len('ref: refs/heads/'):] + '\n'
+            return 'HEAD\n' if SHA_RE.match(head) else None
+        if args[:1] == ['--verify']:
+            args = args[1:]
+        if len(args) != 1:
+            return None
+        sha = repository.resolve(args[0])
+        repository.object(sha)  # Must exist
+        return sha + '\n'
+
+    @staticmethod
+    def _branch(repository: _Repository, args: list) -> Optional[str]:
+        if args != ['--show-current']:
+            return None
+        head = repository.head()
+        if head.startswith('ref: refs/heads/'):
+            return head[len('ref: refs/heads/'):] + '\n'
+        return '' if SHA_RE.match(head) else None
+
+    @staticmethod
+    def _count(value: str) -> int:
+        """A log count; git itself reports malformed ones"""
+        if not value.isdigit():
+            raise _Unsupported()
+        return int(value)
+
+    def _log(self, repository: _Repository, args: list, cwd: str) -> Optional[str]:
+        count, fmt, terminate, rev = None, None, True, 'HEAD'
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == '-n' and args:
+                count = self._count(args.pop(0))
+            elif arg.startswith('--max-count='):
+                count = self._count(arg[len('--max-count='):])
+            elif arg.startswith('-n') and arg[2:].isdigit():
+                count = int(arg[2:])
+            elif MAX_COUNT_RE.match(arg):
+                count = int(arg[1:])
+            elif arg.startswith('--format='):
+                fmt = arg[len('--format='):]
+            elif arg.startswith('--pretty=tformat:'):
+                fmt = arg[len('--pretty=tformat:'):]
+            elif arg.startswith('--pretty=format:'):
+                fmt, terminate = arg[len('--pretty=format:'):], False
+            elif not arg.startswith('-') and rev == 'HEAD':
+                rev = arg
+            else:
+                return None
+        if count is None or count < 0 or fmt is None or not self._known_placeholders(fmt):
+            return None
+        if rev != 'HEAD' and os.path.lexists(os.path.join(cwd, rev)):
+            return None  # Both a revision and a path: git refuses to guess
+
+        entries = [self._format(fmt, sha, headers, message)
+                   for sha, headers, message in self._walk(repository, repository.resolve(rev), count)]
+        if terminate:
+            return ''.join(entry + '\n' for entry in entries)
+        return '\n'.join(entries)
+
+    @staticmethod
+    def _walk(repository: _Repository, start: str, count: int):
+        """Commits newest first by committer date, like git log's default order"""
+        start, headers, message = repository.commit(start)
+        seen = {start}
+        queue, order = [], 0
+        heapq.heappush(queue, (-int(headers['committer'].split()[-2]), order, start, headers, message))
+        while queue and count > 0:
+            _, _, sha, headers, message = heapq.heappop(queue)
+            yield sha, headers, message
+            count -= 1
+            for parent in headers['parent']:
+                if parent not in seen:
+                    seen.add(parent)
+                    order += 1
+                    _, parent_headers, parent_message = repository.commit(parent)
+                    date = int(parent_headers['committer'].split()[-2])
+                    heapq.heappush(queue, (-date, order, parent, parent_headers, parent_message))
+
+    @staticmethod
+    def _known_placeholders(fmt: str) -> bool:
+        i = 0
+        while i < len(fmt):
+            if fmt[i] == '%':
+                match = next((p for p in FORMAT_PLACEHOLDERS if fmt.startswith(p, i + 1)), None)
+                if match is None:
+                    return False
+                i += len(match)
+            i += 1
+        return True
+
+    @staticmethod
+    def _format(fmt: str, sha: str, headers: dict, message: str) -> str:
+        author = _ident(headers['author'])
+        committer = _ident(headers['committer'])
+        subject = []
+        for line in message.split('\n'):
+            if line.strip():
+                subject.append(line.rstrip())
+            elif subject:
+                break
+        values = {
+            'H': sha,
+            'T': headers['tree'],
+            'P': ' '.join(headers['parent']),
+            'an': author[0], 'ae': author[1], 'at': author[2],
+            'cn': committer[0], 'ce': committer[1], 'ct': committer[2],
+            's': ' '.join(subject),
+            'n': '\n',
+            '%': '%',
+        }
+        out, i = [], 0
+        while i < len(fmt):
+            if fmt[i] == '%':
+                match = next(p for p in FORMAT_PLACEHOLDERS if fmt.startswith(p, i + 1))
+                out.append(values[match])
+                i += len(match) + 1
+            else:
+                out.append(fmt[i])
+                i += 1
+        return ''.join(out)
+
+    @staticmethod
+    def _cat_file(repository: _Repository, args: list) -> Optional[str]:
+        if len(args) != 2 or args[0] not in ('-t', '-s', '-p'):
+            return None
+        kind, content = repository.object(GitEngine._object_name(repository, args[1]))
+        if args[0] == '-t':
+            return kind + '\n'
+        if args[0] == '-s':
+            return f'{len(content)}\n'
+        if kind == 'tree':
+            return None  # -p pretty-prints trees
+        return content.decode('utf-8')
+
+    @staticmethod
+    def _show(repository: _Repository, args: list) -> Optional[str]:
+        if len(args) != 1 or ':' not in args[0] or args[0].startswith('-'):
+            return None
+        kind, content = repository.object(GitEngine._object_name(repository, args[0]))
+        if kind != 'blob':
+            return None
+        return content.decode('utf-8')
+
+    @staticmethod
+    def _object_name(repository: _Repository, name: str) -> str:
+        """Resolve the rev part ourselves so cat-file never sees ref names"""
+        rev, colon, path = name.partition(':')
+        if colon and (not path or path.startswith(('/', './', '../'))):
+            raise _Unsupported(name)  # Relative to cwd; let git handle it
+        return repository.resolve(rev) + colon + path
+
+
+def find_repository(path: str):
+    """
+    Find the repository containing path.
+
+    Returns:
+        tuple: (toplevel, git_dir, common_dir), or None if path is not in a
+               work tree (including inside a .git directory)
+    """
+    path = os.path.realpath(path)
+    while not os.path.lexists(os.path.join(path, '.git')):
+        if os.path.basename(path) == '.git':
+            return None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+    git_dir = os.path.join(path, '.git')
+    if os.path.isfile(git_dir):  # Worktree or submodule: "gitdir: <path>"
+        with open(git_dir) as f:
+            content = f.read().strip()
+        if not content.startswith('gitdir: '):
+            return None
+        git_dir = os.path.normpath(os.path.join(path, content[8:]))
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, 'commondir')
+    if os.path.exists(commondir_file):
+        with open(commondir_file) as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return path, git_dir, common_dir
+
+
+def _ident(value: str):
+    """(name, email, timestamp) from 'Name <email> 1700000000 +0000'"""
+    name, _, rest = value.partition(' <')
+    email, _, rest = rest.partition('> ')
+    return name, email, rest.split()[0]
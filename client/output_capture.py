@@ -0,0 +1,143 @@
+"""
+Bounded Output Capture
+
+Collects one stream (stdout or stderr) of a task without holding all of it
+in memory. Up to `limit` bytes are kept as-is. Past that, only the first and
+last limit/2 bytes stay in memory (the preview stored in the database and
+sent back to the relay), and the full stream is written to a gzip file
+whose path is returned as the output reference.
+
+prune_spill_files() removes old spill files so the directory does not grow
+without bound; the results viewer reports pruned output as gone.
+"""
+
+import gzip
+import os
+import time
+from typing import Optional
+
+TRUNCATION_MARKER = "\n... [{omitted} bytes truncated, full output in {ref}] ...\n"
+
+
+class OutputCapture:
+    """Head/tail capture of one output stream, spilling to gzip once over the limit"""
+
+    def __init__(self, limit: Optional[int] = None, spill_path: Optional[str] = None):
+        """
+        Args:
+            limit: Bytes kept in memory (None or 0 keeps everything)
+            spill_path: gzip file for the full stream once it exceeds the
+                        limit (None keeps only head and tail)
+        """
+        self.limit = limit or None
+        self.spill_path = spill_path
+        self.total_bytes = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spill = None
+        self._closed = False
+        self.truncated = False
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self.total_bytes += len(data)
+
+        if not self.truncated:
+            self._head += data
+            if self.limit is None or len(self._head) <= self.limit:
+                return
+            # First overflow: spill what we have and split it into head and tail
+            self.truncated = True
+            if self.spill_path and not self._closed:
+                os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                self._spill = gzip.open(self.spill_path, "wb")
+                self._spill.write(self._head)
+            self._tail = self._head[-self._tail_size:]
+            del self._head[self._head_size:]
+            return
+
+        if self._spill is not None:
+            self._spill.write(data)
+        self._tail += data
+        if len(self._tail) > self._tail_size:
+            del self._tail[:-self._tail_size]
+
+    @property
+    def _head_size(self) -> int:
+        return self.limit // 2
+
+    @property
+    def _tail_size(self) -> int:
+        return self.limit - self.limit // 2
+
+    @property
+    def ref(self) -> Optional[str]:
+        """Path of the full output, if it was spilled"""
+        return self.spill_path if self.truncated and self.spill_path else None
+
+    def text(self) -> str:
+        """The whole stream, or head + marker + tail when truncated"""
+        if not self.truncated:
+            return self._head.decode("utf-8", errors="replace")
+        marker = TRUNCATION_MARKER.format(
+            omitted=self.total_bytes - len(self._head) - len(self._tail),
+            ref=self.ref or "nowhere (spill disabled)"
+        )
+        # Cuts may split a multi-byte character; drop the partial bytes
+        return (self._head.decode("utf-8", errors="ignore") + marker +
+                self._tail.decode("utf-8", errors="ignore"))
+
+    def close(self):
+        self._closed = True
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+def prune_spill_files(directory: str, max_age: float = 0, max_bytes: int = 0,
+                      min_age: float = 60) -> int:
+    """
+    Delete spill files older than max_age, then the oldest ones until the
+    rest fit in max_bytes.
+
+    Args:
+        directory: Spill directory (*.gz files in it are considered)
+        max_age: Seconds a file is kept (0 keeps files regardless of age)
+        max_bytes: Total size kept (0 for no limit)
+        min_age: Files written to more recently are never deleted, as they
+                 may belong to a running task
+
+    Returns:
+        int: Number of files deleted
+    """
+    try:
+        entries = [entry for entry in os.scandir(directory)
+                   if entry.name.endswith(".gz") and entry.is_file()]
+    except FileNotFoundError:
+        return 0
+
+    now = time.time()
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()  # Oldest first
+
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for mtime, size, path in files:
+        age = now - mtime
+        if age < min_age:
+            break
+        if not (max_age and age > max_age) and not (max_bytes and total > max_bytes):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    return deleted
@@ -0,0 +1,399 @@
+"""
+Postgres Task Queue Worker
+
+Worker mode for the client (CLIENT_MODE=pg_worker): instead of receiving
+tasks over the relay WebSocket, any number of worker processes on any
+number of hosts pull them from the Postgres `tasks` table with
+claim_task() (FOR UPDATE SKIP LOCKED, so each task goes to one worker).
+
+- Wakeups: a trigger NOTIFYs `task_queue` when a task becomes pending, so
+  idle workers block in LISTEN instead of polling (a slow poll remains as
+  a safety net).
+- Leases: a claimed task has `lease_expires`, extended by the worker's
+  heartbeat while it runs. If a worker dies, any worker's reaper puts its
+  expired tasks back to pending (or fails them after max_attempts).
+- Agents: the worker adds `agents` rows for the names it serves if they
+  are missing, and keeps their `current_tasks`, `status` and
+  `last_heartbeat` up to date. It claims from them in turn, so one agent's
+  backlog doesn't hold up the others.
+
+Tasks are rows with agent_name set to an executor action type (git, shell,
+claude_code) and input_data {"params": {...}}; see PgTaskQueue.enqueue().
+"""
+
+import inspect
+import os
+import selectors
+import socket
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+CHANNEL = "task_queue"
+
+# Applied at startup so databases created before leases existed keep working
+# (database/init.sql has the same definitions for new databases)
+SCHEMA = """
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS lease_expires TIMESTAMPTZ;
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks(lease_expires)
+    WHERE status IN ('claimed', 'running');
+
+CREATE OR REPLACE FUNCTION notify_task_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status = 'pending' THEN
+        PERFORM pg_notify('task_queue', NEW.agent_name);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_tasks_notify_queue
+    AFTER INSERT OR UPDATE OF status ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_task_queue();
+"""
+
+
+class PgTaskQueue:
+    """Claims, leases and completes tasks in the Postgres task table"""
+
+    def __init__(self, database_url: str, worker_id: str, lease_seconds: int = 60,
+                 max_attempts: int = 3):
+        """
+        Args:
+            database_url: Postgres connection URL
+            worker_id: Recorded as claimed_by on the tasks this worker runs
+            lease_seconds: How long a claim lasts without a heartbeat
+            max_attempts: Claims before a task whose leases keep expiring fails
+        """
+        import psycopg2  # Optional dependency, only needed for this mode
+        from psycopg2.extras import Json
+
+        self._Json = Json
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = psycopg2.connect(database_url)
+        self._lock = threading.Lock()  # One statement at a time on the shared connection
+
+    def ensure_schema(self):
+        with self._transaction() as cur:
+            cur.execute(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Cursor in a transaction, committed on success and rolled back on error"""
+        with self._lock:
+            try:
+                with self.conn.cursor() as cur:
+                    yield cur
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def enqueue(self, task_id: str, session_id: str, action_type: str, params: dict,
+                priority: int = 0, task_type: str = "command"):
+        """Add a pending task (the insert trigger wakes idle workers)"""
+        with self._transaction() as cur:
+            cur.execute("""
+                INSERT INTO tasks (id, session_id, agent_name, task_type, status, priority, input_data)
+                VALUES (%s, %s, %s, %s, 'pending', %s, %s)
+            """, (task_id, session_id, action_type, task_type, priority,
+                  self._Json({"params": params})))
+
+    def claim(self, agent_name: str) -> Optional[dict]:
+        """
+        Claim the next pending task for an agent name, with a lease.
+
+        Returns:
+            dict: {task_id, action_type, params, agent_name}, or None if the
+                  queue is empty
+        """
+        with self._transaction() as cur:
+            cur.execute("SELECT task_id, input_data FROM claim_task(%s, %s)",
+                        (agent_name, self.worker_id))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            task_id, input_data = row
+            cur.execute("""
+                UPDATE tasks
+                SET status = 'running', started = NOW(), attempts = attempts + 1,
+                    lease_expires = NOW() + make_interval(secs => %s)
+                WHERE id = %s
+            """, (self.lease_seconds, task_id))
+            self._adjust_agents(cur, [agent_name], 1)
+        input_data = input_data or {}
+        return {
+            "task_id": task_id,
+            "action_type": input_data.get("action_type", agent_name),
+            "params": input_data.get("params", {}),
+            "agent_name": agent_name,
+        }
+
+    def complete(self, task_id: str, agent_name: str, result: dict) -> bool:
+        """
+        Record a task's result and release its agent slot.
+
+        Returns:
+            bool: False if the lease had already expired and the task was
+                  handed to another worker (the result is discarded)
+        """
+        succeeded = result.get("status") == "success"
+        with self._transaction() as cur:
+            cur.execute("""
+                UPDATE tasks
+                SET status = %s, output_data = %s, error_message = %s,
+                    completed = NOW(), lease_expires = NULL
+                WHERE id = %s AND claimed_by = %s AND status = 'running'
+            """, (
+                "completed" if succeeded else "failed",
+                self._Json(result.get("result")) if succeeded else None,
+                None if succeeded else result.get("error"),
+                task_id,
+                self.worker_id
+            ))
+            owned = cur.rowcount == 1
+            if owned:
+                self._adjust_agents(cur, [agent_name], -1)
+        return owned
+
+    def heartbeat(self, task_ids: List[str], agent_names: List[str]):
+        """Extend the leases of running tasks and mark our agents alive"""
+        with self._transaction() as cur:
+            if task_ids:
+                cur.execute("""
+                    UPDATE tasks SET lease_expires = NOW() + make_interval(secs => %s)
+                    WHERE id = ANY(%s) AND claimed_by = %s AND status = 'running'
+                """, (self.lease_seconds, list(task_ids), self.worker_id))
+            self._adjust_agents(cur, agent_names, 0)
+
+    def reap(self) -> Dict[str, List[str]]:
+        """
+        Return tasks with expired leases (from any worker) to the queue.
+
+        Returns:
+            dict: {"requeued": [task_ids], "failed": [task_ids]}
+        """
+        with self._transaction() as cur:
+            cur.execute("""
+                UPDATE tasks
+                SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                    error_message = CASE WHEN attempts >= %s
+                        THEN 'Worker lease expired ' || attempts || ' times' END,
+                    completed = CASE WHEN attempts >= %s THEN NOW() END,
+                    claimed_by = NULL, claimed_at = NULL, lease_expires = NULL
+                WHERE id IN (
+                    SELECT id FROM tasks
+                    WHERE status IN ('claimed', 'running') AND lease_expires < NOW()
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, agent_name, status
+            """, (self.max_attempts,) * 3)
+            rows = cur.fetchall()
+            for _, agent_name, _ in rows:
+                self._adjust_agents(cur, [agent_name], -1)
+        return {
+            "requeued": [task_id for task_id, _, status in rows if status == "pending"],
+            "failed": [task_id for task_id, _, status in rows if status == "failed"],
+        }
+
+    @staticmethod
+    def _adjust_agents(cur, agent_names: List[str], delta: int):
+        """Move agents.current_tasks by delta and refresh status and heartbeat"""
+        for agent_name in agent_names:
+            cur.execute("""
+                UPDATE agents
+                SET current_tasks = GREATEST(current_tasks + %s, 0),
+                    status = CASE WHEN GREATEST(current_tasks + %s, 0) >= max_concurrent
+                                  THEN 'busy' ELSE 'available' END,
+                    last_heartbeat = NOW(), updated = NOW()
+                WHERE name = %s
+            """, (delta, delta, agent_name))
+
+    def register_agents(self, agent_names: List[str], max_concurrent: int):
+        """
+        Add agents rows for the names this worker serves, so current_tasks,
+        status and last_heartbeat are tracked for them (database/init.sql
+        only seeds a few agents; existing rows are left as configured)
+        """
+        with self._transaction() as cur:
+            for agent_name in agent_names:
+                cur.execute("""
+                    INSERT INTO agents (name, type, command, max_concurrent)
+                    VALUES (%s, 'code', %s, %s)
+                    ON CONFLICT (name) DO NOTHING
+                """, (agent_name, agent_name, max_concurrent))
+            self._adjust_agents(cur, agent_names, 0)
+
+    def set_offline(self, agent_names: List[str]):
+        with self._transaction() as cur:
+            cur.execute("UPDATE agents SET status = 'offline', updated = NOW() WHERE name = ANY(%s)",
+                        (list(agent_names),))
+
+    def close(self):
+        self.conn.close()
+
+
+class PgTaskWorker:
+    """Runs tasks claimed from Postgres on a TaskExecutor"""
+
+    def __init__(self, database_url: str, executor, agent_names: List[str] = None,
+                 concurrency: int = 1, lease_seconds: int = 60, poll_interval: float = 30,
+                 worker_id: str = None, queue: PgTaskQueue = None):
+        """
+        Args:
+            database_url: Postgres connection URL
+            executor: TaskExecutor that runs the claimed tasks (called from
+                      the worker's threads, so not an AsyncTaskExecutor)
+            agent_names: Agent names to claim tasks for (defaults to the
+                         action types the executor's tools support)
+            concurrency: Tasks run at once
+            lease_seconds: Claim lease; heartbeats renew it every third of it
+            poll_interval: Seconds between queue checks when no NOTIFY arrives
+            worker_id: claimed_by value (defaults to host:pid:random)
+            queue: Task queue to use (defaults to a PgTaskQueue on database_url)
+        """
+        if inspect.iscoroutinefunction(executor.handle_task):
+            raise ValueError("PgTaskWorker needs a synchronous TaskExecutor, not AsyncTaskExecutor")
+        self.database_url = database_url
+        self.executor = executor
+        self.agent_names = agent_names or executor.capabilities.action_types()
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.queue = queue or PgTaskQueue(database_url, self.worker_id, lease_seconds)
+        self._next_agent = 0  # Where the next claim round starts (round robin)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pg-task")
+        self._running: Dict[str, str] = {}  # task_id -> agent_name
+        self._running_lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()  # Slot freed: claim more
+        self._stopping = threading.Event()
+
+    def run(self):
+        """Claim and run tasks until stop() is called"""
+        self.queue.ensure_schema()
+        self.queue.register_agents(self.agent_names, self.concurrency)
+        listen_conn = self._listen()
+
+        selector = selectors.DefaultSelector()
+        selector.register(listen_conn, selectors.EVENT_READ, "notify")
+        selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        print(f"🐘 Postgres worker {self.worker_id} serving {', '.join(self.agent_names)} "
+              f"({self.concurrency} at once)")
+
+        try:
+            while not self._stopping.is_set():
+                self._claim_available()
+                for key, _ in selector.select(timeout=self.poll_interval):
+                    if key.data == "notify":
+                        listen_conn.poll()
+                        listen_conn.notifies.clear()  # Which agent doesn't matter; we try all
+                    else:
+                        self._wake_r.recv(4096)
+        finally:
+            selector.close()
+            listen_conn.close()
+            self._pool.shutdown(wait=True)
+            self.queue.set_offline(self.agent_names)
+            self.queue.close()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake_w.send(b"x")
+
+    def _listen(self):
+        """Connection LISTENing on the task_queue channel"""
+        import psycopg2
+
+        listen_conn = psycopg2.connect(self.database_url)
+        listen_conn.autocommit = True
+        with listen_conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        return listen_conn
+
+    def _claim_available(self):
+        """Claim tasks until every slot is busy or the queue is empty"""
+        while len(self._running) < self.concurrency and not self._stopping.is_set():
+            # Each claim starts after the agent served last, so one agent's
+            # backlog can't starve the others
+            task = None
+            count = len(self.agent_names)
+            for offset in range(count):
+                index = (self._next_agent + offset) % count
+                task = self.queue.claim(self.agent_names[index])
+                if task:
+                    self._next_agent = (index + 1) % count
+                    break
+            if task is None:
+                return
+            with self._running_lock:
+                self._running[task["task_id"]] = task["agent_name"]
+            self._pool.submit(self._run_task, task)
+
+    def _run_task(self, task: dict):
+        task_id = task["task_id"]
+        print(f"\n🐘 Claimed task {task_id} ({task['action_type']})")
+        try:
+            result = self.executor.handle_task({
+                "task_id": task_id,
+                "action_type": task["action_type"],
+                "params": task["params"],
+            })
+        except Exception as e:
+            result = {"status": "failed", "task_id": task_id, "error": f"Execution error: {e}"}
+
+        try:
+            if not self.queue.complete(task_id, task["agent_name"], result):
+                print(f"⚠️  Lease on {task_id} expired before it finished; result discarded")
+            else:
+                print(f"{'✅' if result.get('status') == 'success' else '❌'} Task {task_id} {result.get('status')}")
+        except Exception as e:
+            print(f"❌ Failed to record result of {task_id}: {e}")
+        finally:
+            with self._running_lock:
+                self._running.pop(task_id, None)
+            self._wake_w.send(b"x")
+
+    def _heartbeat_loop(self):
+        """Renew leases of running tasks and requeue those of dead workers"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                with self._running_lock:
+                    running = list(self._running)
+                self.queue.heartbeat(running, self.agent_names)
+                reaped = self.queue.reap()
+                if reaped["requeued"] or reaped["failed"]:
+                    print(f"🐘 Expired leases: requeued {reaped['requeued']}, failed {reaped['failed']}")
+            except Exception as e:
+                print(f"⚠️  Postgres worker heartbeat error: {e}")
+
+
+def run_pg_worker(executor) -> None:
+    """Run the worker configured from the environment (CLIENT_MODE=pg_worker)"""
+    database_url = os.getenv("TASK_QUEUE_URL") or os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("CLIENT_MODE=pg_worker needs TASK_QUEUE_URL or DATABASE_URL")
+    agent_names = [a.strip() for a in os.getenv("PG_WORKER_AGENTS", "").split(",") if a.strip()]
+    worker = PgTaskWorker(
+        database_url,
+        executor,
+        agent_names=agent_names or None,
+        concurrency=int(os.getenv("PG_WORKER_CONCURRENCY", "1")),
+        lease_seconds=int(os.getenv("PG_WORKER_LEASE", "60")),
+        poll_interval=float(os.getenv("PG_WORKER_POLL_INTERVAL", "30")),
+    )
+    worker.run()
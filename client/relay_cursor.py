@@ -0,0 +1,90 @@
+"""
+Relay Cursor
+
+Tracks the sequence number of the last relay delivery this client handled,
+so that after a reconnect (or a restart) it can ask the relay to replay
+what it missed instead of losing those webhooks.
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+
+class RelayCursor:
+    """
+    Last handled delivery sequence, persisted to a small JSON file.
+
+    The relay numbers broadcasts within an epoch (one delivery log). The
+    cursor remembers both, and deduplicates recent sequence numbers in
+    case a replay overlaps with live deliveries.
+    """
+
+    def __init__(self, path=None, window: int = 1000):
+        """
+        Args:
+            path: JSON file to persist the cursor in (optional)
+            window: How many recent sequence numbers to remember for dedup
+        """
+        self.path = Path(path) if path else None
+        self.epoch: Optional[str] = None
+        self.last_seq = 0
+        self._recent = deque(maxlen=window)
+        self._recent_set = set()
+        self._load()
+
+    def _load(self):
+        if self.path and self.path.exists():
+            try:
+                state = json.loads(self.path.read_text())
+                self.epoch = state.get("epoch")
+                self.last_seq = int(state.get("last_seq", 0))
+            except (ValueError, OSError) as e:
+                print(f"⚠️  Ignoring unreadable relay cursor {self.path}: {e}")
+
+    def _save(self):
+        if self.path:
+            self.path.write_text(json.dumps({"epoch": self.epoch, "last_seq": self.last_seq}))
+
+    def resume_message(self, server_epoch: str, latest_seq: int = 0) -> Optional[dict]:
+        """
+        Decide what to tell the relay after connecting.
+
+        Args:
+            server_epoch: Epoch from the relay's welcome message
+            latest_seq: Latest sequence the relay has assigned
+
+        Returns:
+            dict: A resume message, or None when there is nothing to resume
+                  (first run: start from the relay's current position)
+        """
+        if self.epoch is None:
+            self.epoch = server_epoch
+            self.last_seq = latest_seq
+            self._save()
+            return None
+        return {"type": "resume", "epoch": self.epoch, "last_seq": self.last_seq}
+
+    def on_replay(self, status: str, server_epoch: str):
+        """Adopt the relay's epoch when it could not honour our cursor"""
+        if status == "reset":
+            self.epoch = server_epoch
+            self.last_seq = 0
+            self._recent.clear()
+            self._recent_set.clear()
+            self._save()
+
+    def seen(self, seq: int) -> bool:
+        """True if this sequence number was already handled"""
+        return seq in self._recent_set
+
+    def ack(self, seq: int):
+        """Record that a delivery was handled"""
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_set.discard(self._recent[0])
+        self._recent.append(seq)
+        self._recent_set.add(seq)
+        if seq > self.last_seq:
+            self.last_seq = seq
+            self._save()
@@ -0,0 +1,167 @@
+"""
+Task Result Cache
+
+Short-lived cache of results for read-only tasks, so the same `git status`
+or `git log` sent many times a minute against one working_dir is answered
+from memory instead of running git again.
+
+Entries are keyed by (action_type, normalized command, working_dir, repo
+state). Repo state is the modification time of the repository's HEAD,
+current branch ref, packed-refs and index, plus the working directory
+itself, so commits, checkouts, staging and added or removed files all
+miss the cache. Edits to tracked files that are not staged don't change
+any of these, which is what the TTL is for: keep it short.
+
+Only read-only git subcommands are cached by default. A task can opt in
+(shell commands it knows are idempotent) or out with params["cache"].
+"""
+
+import copy
+import os
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from client.git_engine import find_repository
+
+# git subcommands that don't change the repository
+READ_ONLY_GIT = {
+    'status', 'log', 'show', 'diff', 'rev-parse', 'rev-list', 'ls-files', 'ls-tree',
+    'cat-file', 'describe', 'blame', 'shortlog', 'branch',
+}
+
+# The only branch options that list rather than create, rename or delete
+READ_ONLY_BRANCH_ARGS = {'--show-current', '--list', '-a', '--all', '-r', '--remotes', '-v', '-vv'}
+
+
+def normalize_command(command):
+    """Hashable form of a command, ignoring how a string command is spaced"""
+    if isinstance(command, str):
+        try:
+            return tuple(shlex.split(command))
+        except ValueError:
+            return command
+    return tuple(command)
+
+
+class ResultCache:
+    """TTL + LRU cache of task results with a byte budget"""
+
+    def __init__(self, ttl: float = 10, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Args:
+            ttl: Seconds an entry is served for
+            max_entries: Entries kept before the least recently used is evicted
+            max_bytes: Total stdout + stderr kept before evicting
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (stored_at, size, result)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, action_type: str, spec: dict, params: dict) -> Optional[tuple]:
+        """
+        Cache key for a prepared task (see TaskExecutor._prepare), or None
+        if its result must not be cached.
+        """
+        if not self.cacheable(action_type, spec['command'], params.get('cache')):
+            return None
+        cwd = os.path.realpath(spec['cwd'])
+        return (action_type, normalize_command(spec['command']), cwd, self._repo_state(cwd))
+
+    @staticmethod
+    def cacheable(action_type: str, command, requested: Optional[bool] = None) -> bool:
+        if requested is not None:
+            return bool(requested) and action_type in ('git', 'shell')
+        if action_type != 'git' or len(command) < 2 or command[1] not in READ_ONLY_GIT:
+            return False
+        if command[1] == 'branch':
+            return set(command[2:]) <= READ_ONLY_BRANCH_ARGS
+        return not any(arg.startswith('--output') for arg in command[2:])
+
+    @staticmethod
+    def _repo_state(cwd: str) -> tuple:
+        """mtimes of everything whose change should miss the cache"""
+        paths = [cwd]
+        found = find_repository(cwd)
+        if found is not None:
+            _, git_dir, common_dir = found
+            paths += [os.path.join(git_dir, 'HEAD'), os.path.join(git_dir, 'index'),
+                      os.path.join(common_dir, 'packed-refs')]
+            try:
+                with open(os.path.join(git_dir, 'HEAD')) as f:
+                    head = f.read().strip()
+                if head.startswith('ref: '):
+                    paths.append(os.path.join(common_dir, head[5:]))
+            except OSError:
+                pass
+
+        state = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                state.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def get(self, key: tuple) -> Optional[dict]:
+        """A copy of the cached result, marked cached, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            stored_at, _, result = entry
+
+        result = copy.deepcopy(result)
+        result['cached'] = True
+        result['cache_age_ms'] = int((time.monotonic() - stored_at) * 1000)
+        return result
+
+    def put(self, key: tuple, result: dict):
+        """Cache a successful result (failures and truncated output are not cached)"""
+        if not result.get('success') or result.get('returncode') != 0 or result.get('output_truncated'):
+            return
+        size = len(result.get('stdout') or '') + len(result.get('stderr') or '')
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), size, copy.deepcopy(result))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: tuple):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
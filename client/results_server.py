@@ -5,26 +5,30 @@ Simple web interface to view task results at http://localhost:5001
 """
 
 import sys
+import gzip
 from pathlib import Path
 import json
 from datetime import datetime
+from urllib.parse import urlencode
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from dotenv import load_dotenv
 load_dotenv()
 
 from client.storage.sqlite_backend import SimpleSQLiteBackend
 
 app = Flask(__name__)
+# Shared by Flask's request threads: queries run on the backend's pool of
+# read-only connections, concurrently with the client writing tasks
 db = SimpleSQLiteBackend()
 
 
 @app.route('/')
 def index():
-    """Show recent tasks"""
+    """Show recent tasks (output is fetched by the page when expanded)"""
     tasks = db.get_recent_tasks(limit=20)
 
     # Convert tasks to dict for template
@@ -35,11 +39,11 @@ def index():
             'command': task[1],
             'status': task[2],
             'input_data': json.loads(task[3]) if task[3] else {},
-            'output_data': json.loads(task[4]) if task[4] else {},
             'error_message': task[5],
             'created_at': task[6],
             'started_at': task[7],
-            'completed_at': task[8]
+            'completed_at': task[8],
+            'output_size': task[12]
         }
         task_list.append(task_dict)
 
@@ -63,17 +67,72 @@ def get_task(task_id):
         'error_message': task[5],
         'created_at': task[6],
         'started_at': task[7],
-        'completed_at': task[8]
+        'completed_at': task[8],
+        'output_ref': json.loads(task[9]) if task[9] else None,
+        'queue_wait_ms': task[10],
+        'queue_depth': task[11],
+        'output_size': task[12],
+        'steps': [
+            dict(zip(('step_id', 'action_type', 'status', 'returncode', 'error_message',
+                      'started_at', 'completed_at', 'duration_ms'), step))
+            for step in db.get_task_steps(task_id)
+        ]
     }
 
     return jsonify(task_dict)
 
 
+@app.route('/api/task/<task_id>/output/<stream>')
+def get_task_output(task_id, stream):
+    """Get the full stdout/stderr of a task, including output too large to store inline"""
+    if stream not in ('stdout', 'stderr'):
+        return jsonify({'error': 'Stream must be stdout or stderr'}), 404
+
+    task = db.get_task(task_id)
+    if not task:
+        return jsonify({'error': 'Task not found'}), 404
+
+    output_ref = json.loads(task[9]) if task[9] else {}
+    path = output_ref.get(stream)
+    if path:
+        if not Path(path).exists():
+            return jsonify({'error': 'Output file no longer exists'}), 410
+
+        def generate():
+            with gzip.open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(65536)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return Response(generate(), mimetype='text/plain; charset=utf-8')
+
+    output_data = json.loads(task[4]) if task[4] else {}
+    return Response(output_data.get(stream) or '', mimetype='text/plain; charset=utf-8')
+
+
 @app.route('/api/tasks')
 def get_tasks():
-    """Get all recent tasks as JSON"""
-    limit = request.args.get('limit', 20, type=int)
-    tasks = db.get_recent_tasks(limit=limit)
+    """
+    Get recent tasks as JSON, newest first.
+
+    Query: limit (max 500), status, command, since/until (ISO 8601) and
+    cursor. When there are more tasks, the X-Next-Cursor header (and a
+    Link rel="next" header) gives the cursor for the next page.
+    """
+    limit = max(1, min(request.args.get('limit', 20, type=int), 500))
+    try:
+        tasks, next_cursor = db.get_tasks_page(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status'),
+            command=request.args.get('command'),
+            since=request.args.get('since'),
+            until=request.args.get('until')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     task_list = []
     for task in tasks:
@@ -82,11 +141,17 @@ def get_tasks():
             'command': task[1],
             'status': task[2],
             'created_at': task[6],
-            'completed_at': task[8]
+            'completed_at': task[8],
+            'output_size': task[12]
         }
         task_list.append(task_dict)
 
-    return jsonify(task_list)
+    response = jsonify(task_list)
+    if next_cursor:
+        next_args = {**request.args.to_dict(), 'cursor': next_cursor}
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(next_args)}>; rel="next"'
+    return response
 
 
 if __name__ == '__main__':
@@ -0,0 +1,168 @@
+"""
+Single-Flight Task Coalescing
+
+While a task is running, identical tasks (same fingerprint) that arrive do
+not start their own process: they attach to the running one and get its
+result, marked with `coalesced_with` (the task_id that actually ran).
+Output streamed so far is replayed to each new follower, then they all
+receive the chunks as they are produced.
+
+Threads use run(); the asyncio executor uses run_async(), where the shared
+execution is its own asyncio task that is only cancelled once every caller
+waiting on it has been cancelled.
+"""
+
+import asyncio
+import copy
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """One running execution and the callers attached to it"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.chunks = []  # (stream, text) produced so far
+        self.listeners = []
+        self.waiters = 1
+        self.future = None  # asyncio task running the execution (run_async)
+        self.lock = threading.Lock()
+
+    def attach(self, on_output):
+        """Replay output so far to a new caller, then keep it updated"""
+        if on_output is None:
+            return
+        with self.lock:
+            for stream, text in self.chunks:
+                _call(on_output, stream, text)
+            self.listeners.append(on_output)
+
+    def output(self, stream: str, text: str):
+        """on_output for the execution: record and fan out"""
+        with self.lock:
+            self.chunks.append((stream, text))
+            for listener in self.listeners:
+                _call(listener, stream, text)
+
+
+def _call(on_output, stream: str, text: str):
+    try:
+        on_output(stream, text)
+    except Exception as e:
+        print(f"⚠️  Output callback error: {e}")
+
+
+class SingleFlight:
+    """Runs each fingerprint once at a time, sharing the result with duplicates"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def run(self, key: Hashable, fn: Callable, task_id: str, on_output=None) -> dict:
+        """
+        Run fn(on_output) for key, or wait for the run already in progress.
+
+        Args:
+            key: Task fingerprint
+            fn: Executes the task; called with the fan-out output callback
+            task_id: The calling task (reported to followers if it runs)
+            on_output: The caller's output callback (optional)
+        """
+        flight, leader = self._join(key, task_id, on_output)
+        if not leader:
+            flight.done.wait()
+            return self._share(flight)
+
+        try:
+            flight.result = fn(flight.output)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return self._own_copy(flight)
+
+    async def run_async(self, key: Hashable, fn: Callable, task_id: str, on_output=None) -> dict:
+        """
+        run() for coroutines: fn(on_output) returns an awaitable.
+
+        Cancelling a caller detaches it; the execution is cancelled only
+        when no caller is left waiting for it.
+        """
+        flight, leader = self._join(key, task_id, on_output)
+        if leader:
+            flight.future = asyncio.ensure_future(fn(flight.output))
+            flight.future.add_done_callback(lambda future: self._finished(key, flight, future))
+
+        try:
+            await asyncio.shield(flight.future)
+        except asyncio.CancelledError:
+            if not flight.future.done():
+                with self._lock:
+                    flight.waiters -= 1
+                    abandoned = flight.waiters == 0
+                if abandoned:
+                    flight.future.cancel()
+                    try:
+                        await flight.future  # Let the execution clean up (kill the process)
+                    except BaseException:
+                        pass
+            raise
+        return self._own_copy(flight) if leader else self._share(flight)
+
+    def _finished(self, key: Hashable, flight: _Flight, future: asyncio.Future):
+        if future.cancelled():
+            flight.error = asyncio.CancelledError()
+        elif future.exception() is not None:
+            flight.error = future.exception()
+        else:
+            flight.result = future.result()
+        self._land(key, flight)
+
+    def _join(self, key: Hashable, task_id: str, on_output):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(task_id)
+                self.executions += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+                leader = False
+        flight.attach(on_output)
+        return flight, leader
+
+    def _land(self, key: Hashable, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    @staticmethod
+    def _own_copy(flight: _Flight) -> Optional[dict]:
+        """The leader's result, copied so it can change it while followers copy theirs"""
+        return copy.deepcopy(flight.result)
+
+    @staticmethod
+    def _share(flight: _Flight) -> Optional[dict]:
+        if flight.error is not None:
+            raise flight.error
+        result = copy.deepcopy(flight.result)
+        result['coalesced_with'] = flight.task_id
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._flights),
+            }
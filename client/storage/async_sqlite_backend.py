@@ -0,0 +1,123 @@
+"""
+Async SQLite Backend
+
+Coroutine front end for SimpleSQLiteBackend, for code running on the
+client's event loop (AsyncTaskExecutor). Calls are queued to one storage
+thread, so the loop never waits on disk I/O. The thread takes everything
+queued at once as a batch and commits the batch's writes together before
+resolving the callers' awaitables.
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Callable
+
+from client.storage.sqlite_backend import SimpleSQLiteBackend
+
+MAX_BATCH = 256  # Requests run (and committed) together at most
+
+
+class AsyncSQLiteBackend:
+    """Runs SimpleSQLiteBackend calls on a dedicated thread behind a request queue"""
+
+    def __init__(self, backend: SimpleSQLiteBackend = None, db_path=None):
+        """
+        Args:
+            backend: Backend to use (created from db_path if not given)
+            db_path: Path to SQLite database (see SimpleSQLiteBackend)
+        """
+        self.backend = backend or SimpleSQLiteBackend(db_path)
+        self._requests = queue.Queue()
+        self.requests = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._serve, daemon=True, name="sqlite-store")
+        self._thread.start()
+
+    def run(self, fn: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Run fn(*args, **kwargs) on the storage thread.
+
+        fn may make several backend calls (e.g. create a task and mark it
+        running); they are committed with the rest of its batch.
+
+        Returns:
+            asyncio.Future: Resolves to fn's return value (or raises its
+                            exception) once the batch is committed
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._requests.put((fn, args, kwargs, future, loop))
+        return future
+
+    async def create_task(self, task_id: str, command: str, input_data: str,
+                          queue_wait_ms: int = None, queue_depth: int = None):
+        return await self.run(self.backend.create_task, task_id, command, input_data,
+                              queue_wait_ms=queue_wait_ms, queue_depth=queue_depth)
+
+    async def update_task(self, task_id: str, status: str, output_data: str = None,
+                          error: str = None, output_ref: str = None):
+        return await self.run(self.backend.update_task, task_id, status, output_data=output_data,
+                              error=error, output_ref=output_ref)
+
+    async def get_task(self, task_id: str):
+        return await self.run(self.backend.get_task, task_id)
+
+    async def get_task_output(self, task_id: str):
+        return await self.run(self.backend.get_task_output, task_id)
+
+    async def get_recent_tasks(self, limit: int = 10):
+        return await self.run(self.backend.get_recent_tasks, limit)
+
+    async def get_tasks_by_status(self, status: str, limit: int = 10):
+        return await self.run(self.backend.get_tasks_by_status, status, limit)
+
+    async def get_task_steps(self, task_id: str):
+        return await self.run(self.backend.get_task_steps, task_id)
+
+    def _serve(self):
+        while True:
+            batch = [self._requests.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            outcomes = []
+            with self.backend.deferred_commit():
+                for request in batch:
+                    if request is None:
+                        continue
+                    fn, args, kwargs, future, loop = request
+                    try:
+                        outcomes.append((future, loop, fn(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, loop, None, e))
+            self.requests += len(outcomes)
+            self.batches += 1
+
+            for future, loop, result, error in outcomes:
+                try:
+                    loop.call_soon_threadsafe(self._resolve, future, result, error)
+                except RuntimeError:
+                    pass  # The caller's loop is closed
+            if None in batch:
+                return
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result, error):
+        if future.done():
+            return  # Caller cancelled
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'batches': self.batches}
+
+    def close(self):
+        """Finish queued requests and stop the storage thread (the backend stays open)"""
+        self._requests.put(None)
+        self._thread.join()
@@ -3,14 +3,53 @@ SQLite Backend for MVP Task Storage
 
 Simple file-based storage with no configuration needed.
 Replaces PostgreSQL for lightweight MVP deployment.
+
+The database runs in WAL mode with synchronous=NORMAL by default: commits
+append to the write-ahead log without an fsync each, and the results
+viewer can read while tasks write. A crash can lose the last few commits
+but never corrupts the database.
+
+With group commit (SQLITE_GROUP_COMMIT_MS) writes don't commit at all;
+they join an open transaction that a background thread commits every few
+milliseconds, so many concurrent tasks share one commit. This process sees
+its writes immediately, other processes once they are committed.
+
+Writes go through one connection behind a lock. Reads use a small pool of
+read-only connections (SQLITE_READERS), so the results viewer and task
+threads read concurrently instead of queueing behind writes; while group
+commit has writes pending, reads use the writer so they see them.
+
+Task output (output_data) is stored zlib-compressed once it reaches
+COMPRESS_MIN_BYTES, with its uncompressed size in output_size. History
+queries (get_recent_tasks, get_tasks_by_status, get_tasks_page) leave it
+out of the rows they return; get_task and get_task_output load it.
 """
 
+import base64
+import queue
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
 import os
 
+JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Columns of a task row, in the order the get_* methods return them
+TASK_COLUMNS = ('id', 'command', 'status', 'input_data', 'output_data', 'error_message',
+                'created_at', 'started_at', 'completed_at', 'output_ref',
+                'queue_wait_ms', 'queue_depth', 'output_size')
+# History rows: the same columns with output_data left as None (not loaded)
+SUMMARY_COLUMNS = ', '.join('NULL AS output_data' if column == 'output_data' else column
+                            for column in TASK_COLUMNS)
+
+COMPRESS_MIN_BYTES = 512  # Smaller output is stored as plain text
+COMPRESS_LEVEL = 6
+
 
 class SimpleSQLiteBackend:
     """
@@ -20,31 +59,82 @@ class SimpleSQLiteBackend:
     schema creation and simple CRUD operations.
     """
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, journal_mode: str = None, synchronous: str = None,
+                 cache_kb: int = None, group_commit_ms: float = None,
+                 readers: int = None):
         """
         Initialize SQLite connection and create schema.
 
         Args:
             db_path: Path to SQLite database file.
                      If None, uses SQLITE_PATH from environment or './tasks.db'
+            journal_mode: SQLite journal mode (optional, uses env var, default WAL)
+            synchronous: SQLite synchronous setting (optional, uses env var,
+                         default NORMAL)
+            cache_kb: Page cache size in KiB (optional, uses env var)
+            group_commit_ms: Commit writes together every this many
+                             milliseconds instead of one by one (optional,
+                             uses env var; 0 commits every write)
+            readers: Read-only connections kept for queries (optional,
+                     uses env var; 0 reads through the writer)
         """
         if db_path is None:
             db_path = os.getenv('SQLITE_PATH', './tasks.db')
 
         self.db_path = db_path
+        self.journal_mode = (journal_mode or os.getenv('SQLITE_JOURNAL_MODE', 'WAL')).upper()
+        self.synchronous = (synchronous or os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')).upper()
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {', '.join(JOURNAL_MODES)}")
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {', '.join(SYNCHRONOUS_MODES)}")
+        if cache_kb is None:
+            cache_kb = int(os.getenv('SQLITE_CACHE_KB', '16384'))
+        if group_commit_ms is None:
+            group_commit_ms = float(os.getenv('SQLITE_GROUP_COMMIT_MS', '0'))
+        self.group_commit_ms = group_commit_ms
+        if readers is None:
+            readers = int(os.getenv('SQLITE_READERS', '4'))
+        self.max_readers = 0 if db_path == ':memory:' else readers
+        self.cache_kb = cache_kb
 
         # Create parent directory if needed
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
-        # Connect to database (creates file if doesn't exist)
+        # Connect to database (creates file if doesn't exist); this is the
+        # only connection that writes, shared by the client's task threads,
+        # so access is serialized
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        # Read-only connections, opened on demand up to max_readers
+        self._readers = queue.Queue()
+        self._reader_count = 0
+        self._readers_lock = threading.Lock()
 
         # Enable foreign keys
         self.conn.execute("PRAGMA foreign_keys = ON")
 
+        # Journaling and caching (the results viewer reads while tasks write)
+        self.conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        self.conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        self.conn.execute(f"PRAGMA cache_size = {-int(cache_kb)}")
+        self.conn.execute("PRAGMA busy_timeout = 5000")
+
         # Create schema if needed
         self._init_schema()
 
+        # Group commit: writes join an open transaction committed by this thread
+        self._dirty = False
+        self.group_commits = 0
+        self._closing = threading.Event()
+        self._committer = None
+        self._local = threading.local()  # deferred_commit() per thread
+        if self.group_commit_ms > 0:
+            self._committer = threading.Thread(target=self._group_commit_loop, daemon=True,
+                                               name="sqlite-group-commit")
+            self._committer.start()
+
         print(f"📦 SQLite backend initialized: {db_path}")
 
     def _init_schema(self):
@@ -63,20 +153,108 @@ class SimpleSQLiteBackend:
             )
         """)
 
-        # Create indexes for common queries
-        self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tasks_created
-            ON tasks(created_at DESC)
-        """)
-
+        # Columns added after the first release
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+        for column, column_type in (('output_ref', 'TEXT'),
+                                    ('queue_wait_ms', 'INTEGER'),
+                                    ('queue_depth', 'INTEGER'),
+                                    ('output_size', 'INTEGER')):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {column_type}")
+        if 'output_size' not in columns:
+            # Output stored before compression stays plain text
+            self.conn.execute("""
+                UPDATE tasks SET output_size = length(CAST(output_data AS BLOB))
+                WHERE output_data IS NOT NULL
+            """)
+
+        # Indexes for history pages (newest first, keyset on created_at, id),
+        # optionally filtered by status or command; they replace the
+        # single-column indexes of earlier versions
+        self.conn.execute("DROP INDEX IF EXISTS idx_tasks_created")
+        self.conn.execute("DROP INDEX IF EXISTS idx_tasks_status")
+        for name, columns in (('idx_tasks_created_id', 'created_at DESC, id DESC'),
+                              ('idx_tasks_status_created', 'status, created_at DESC, id DESC'),
+                              ('idx_tasks_command_created', 'command, created_at DESC, id DESC')):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON tasks({columns})")
+
+        # Steps of DAG tasks (see client/task_dag.py)
         self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tasks_status
-            ON tasks(status)
+            CREATE TABLE IF NOT EXISTS task_steps (
+                task_id TEXT NOT NULL,
+                step_id TEXT NOT NULL,
+                action_type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                returncode INTEGER,
+                error_message TEXT,
+                started_at TIMESTAMP,
+                completed_at TIMESTAMP,
+                duration_ms INTEGER,
+                PRIMARY KEY (task_id, step_id)
+            )
         """)
 
         self.conn.commit()
 
-    def create_task(self, task_id: str, command: str, input_data: str):
+    def _connect_reader(self):
+        conn = sqlite3.connect(Path(self.db_path).resolve().as_uri() + '?mode=ro',
+                               uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_kb)}")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    @contextmanager
+    def _reading(self):
+        """A connection for queries: a pooled reader, or the writer if it has uncommitted writes"""
+        if self._dirty or not self.max_readers:
+            with self._lock:
+                yield self.conn
+            return
+
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                opening = self._reader_count < self.max_readers
+                if opening:
+                    self._reader_count += 1
+            conn = self._connect_reader() if opening else self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _commit(self):
+        """Commit now, or leave it to the group commit or deferred_commit() (call with _lock held)"""
+        if self._committer is not None or getattr(self._local, 'deferred', False):
+            self._dirty = True
+        else:
+            self.conn.commit()
+
+    def _group_commit_loop(self):
+        while not self._closing.wait(self.group_commit_ms / 1000):
+            self.flush()
+
+    @contextmanager
+    def deferred_commit(self):
+        """Commit the writes this thread makes inside the block once, at the end"""
+        self._local.deferred = True
+        try:
+            yield
+        finally:
+            self._local.deferred = False
+            self.flush()
+
+    def flush(self):
+        """Commit writes still waiting for the group commit"""
+        with self._lock:
+            if self._dirty:
+                self.conn.commit()
+                self._dirty = False
+                self.group_commits += 1
+
+    def create_task(self, task_id: str, command: str, input_data: str,
+                    queue_wait_ms: int = None, queue_depth: int = None):
         """
         Create a new task.
 
@@ -84,6 +262,8 @@ class SimpleSQLiteBackend:
             task_id: Unique identifier for task
             command: Action type (git, shell, claude_code)
             input_data: JSON string of input parameters
+            queue_wait_ms: Time spent in the client's task queue (optional)
+            queue_depth: Tasks queued ahead of it when it arrived (optional)
 
         Returns:
             None
@@ -91,52 +271,67 @@ class SimpleSQLiteBackend:
         Raises:
             sqlite3.IntegrityError: If task_id already exists
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO tasks (id, command, status, input_data, created_at)
-            VALUES (?, ?, 'pending', ?, CURRENT_TIMESTAMP)
-        """, (task_id, command, input_data))
-        self.conn.commit()
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT INTO tasks (id, command, status, input_data, created_at,
+                                   queue_wait_ms, queue_depth)
+                VALUES (?, ?, 'pending', ?, CURRENT_TIMESTAMP, ?, ?)
+            """, (task_id, command, input_data, queue_wait_ms, queue_depth))
+            self._commit()
 
     def update_task(self, task_id: str, status: str,
-                    output_data: str = None, error: str = None):
+                    output_data: str = None, error: str = None,
+                    output_ref: str = None):
         """
         Update task status and results.
 
         Args:
             task_id: Task to update
             status: New status (running, completed, failed)
-            output_data: JSON string of results (optional)
+            output_data: JSON string of results (optional, stored
+                         compressed from COMPRESS_MIN_BYTES)
             error: Error message if failed (optional)
+            output_ref: JSON string of {stream: path} for output too large
+                        to store inline (optional)
 
         Returns:
             None
         """
-        cursor = self.conn.cursor()
+        if output_data is not None:
+            output_size = len(output_data.encode())
+            output_data = self._compress_output(output_data)
 
-        # Build UPDATE query dynamically
-        updates = ["status = ?"]
-        params = [status]
+        with self._lock:
+            cursor = self.conn.cursor()
 
-        if output_data is not None:
-            updates.append("output_data = ?")
-            params.append(output_data)
+            # Build UPDATE query dynamically
+            updates = ["status = ?"]
+            params = [status]
 
-        if error is not None:
-            updates.append("error_message = ?")
-            params.append(error)
+            if output_data is not None:
+                updates.append("output_data = ?, output_size = ?")
+                params.extend((output_data, output_size))
 
-        # Update timestamps
-        if status == 'running':
-            updates.append("started_at = CURRENT_TIMESTAMP")
-        elif status in ('completed', 'failed'):
-            updates.append("completed_at = CURRENT_TIMESTAMP")
+            if error is not None:
+                updates.append("error_message = ?")
+                params.append(error)
 
-        params.append(task_id)
+            if output_ref is not None:
+                updates.append("output_ref = ?")
+                params.append(output_ref)
 
-        query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        self.conn.commit()
+            # Update timestamps
+            if status == 'running':
+                updates.append("started_at = CURRENT_TIMESTAMP")
+            elif status in ('completed', 'failed'):
+                updates.append("completed_at = CURRENT_TIMESTAMP")
+
+            params.append(task_id)
+
+            query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
+            cursor.execute(query, params)
+            self._commit()
 
     def get_task(self, task_id: str):
         """
@@ -148,11 +343,99 @@ class SimpleSQLiteBackend:
         Returns:
             tuple: Task row or None if not found
                    (id, command, status, input_data, output_data,
-                    error_message, created_at, started_at, completed_at)
+                    error_message, created_at, started_at, completed_at,
+                    output_ref, queue_wait_ms, queue_depth, output_size)
+        """
+        with self._reading() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE id = ?", (task_id,))
+            row = cursor.fetchone()
+            cursor.close()  # End the read so the pooled connection sees later commits
+        if row is None:
+            return None
+        return row[:4] + (self._decompress_output(row[4]),) + row[5:]
+
+    def get_task_output(self, task_id: str):
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
-        return cursor.fetchone()
+        Get only a task's output.
+
+        Returns:
+            str: JSON string of results, or None if the task has none
+        """
+        with self._reading() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT output_data FROM tasks WHERE id = ?", (task_id,))
+            row = cursor.fetchone()
+            cursor.close()
+        return self._decompress_output(row[0]) if row else None
+
+    @staticmethod
+    def _compress_output(output_data: str):
+        encoded = output_data.encode()
+        if len(encoded) < COMPRESS_MIN_BYTES:
+            return output_data
+        return zlib.compress(encoded, COMPRESS_LEVEL)
+
+    @staticmethod
+    def _decompress_output(value):
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode()
+        return value
+
+    def start_step(self, task_id: str, step_id: str, action_type: str):
+        """Record a DAG step as running"""
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO task_steps (task_id, step_id, action_type, status, started_at)
+                VALUES (?, ?, ?, 'running', CURRENT_TIMESTAMP)
+            """, (task_id, step_id, action_type))
+            self._commit()
+
+    def finish_step(self, task_id: str, step_id: str, action_type: str, status: str,
+                    duration_ms: int = None, returncode: int = None, error: str = None):
+        """
+        Record a DAG step's outcome.
+
+        Args:
+            task_id: DAG task the step belongs to
+            step_id: Step id within the task
+            action_type: Step action type
+            status: completed, failed or skipped (never started)
+            duration_ms: How long the step ran (None if skipped)
+            returncode: Exit code, if the step ran a process
+            error: Why it failed or was skipped (optional)
+        """
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO task_steps (task_id, step_id, action_type, status, returncode,
+                                        error_message, completed_at, duration_ms)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+                ON CONFLICT (task_id, step_id) DO UPDATE SET
+                    status = excluded.status, returncode = excluded.returncode,
+                    error_message = excluded.error_message,
+                    completed_at = excluded.completed_at, duration_ms = excluded.duration_ms
+            """, (task_id, step_id, action_type, status, returncode, error, duration_ms))
+            self._commit()
+
+    def get_task_steps(self, task_id: str):
+        """
+        Get the steps of a DAG task.
+
+        Returns:
+            list: Step tuples in start order
+                  (step_id, action_type, status, returncode, error_message,
+                   started_at, completed_at, duration_ms)
+        """
+        with self._reading() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT step_id, action_type, status, returncode, error_message,
+                       started_at, completed_at, duration_ms
+                FROM task_steps
+                WHERE task_id = ?
+                ORDER BY started_at IS NULL, started_at, rowid
+            """, (task_id,))
+            return cursor.fetchall()
 
     def get_recent_tasks(self, limit: int = 10):
         """
@@ -162,15 +445,17 @@ class SimpleSQLiteBackend:
             limit: Maximum number of tasks to return
 
         Returns:
-            list: List of task tuples, newest first
+            list: Task tuples as in get_task, newest first, with output_data
+                  not loaded (None; see output_size and get_task_output)
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM tasks
-            ORDER BY created_at DESC
-            LIMIT ?
-        """, (limit,))
-        return cursor.fetchall()
+        with self._reading() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {SUMMARY_COLUMNS} FROM tasks
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (limit,))
+            return cursor.fetchall()
 
     def get_tasks_by_status(self, status: str, limit: int = 10):
         """
@@ -181,19 +466,105 @@ class SimpleSQLiteBackend:
             limit: Maximum number to return
 
         Returns:
-            list: List of task tuples
+            list: Task tuples as in get_recent_tasks (output_data not loaded)
+        """
+        with self._reading() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {SUMMARY_COLUMNS} FROM tasks
+                WHERE status = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (status, limit))
+            return cursor.fetchall()
+
+    def get_tasks_page(self, limit: int = 50, cursor: str = None, status: str = None,
+                       command: str = None, since: str = None, until: str = None):
+        """
+        Get a page of task history, newest first.
+
+        Pages are keyset-paginated on (created_at, id): each page starts
+        right after the previous page's last row, so fetching page 1000
+        costs the same as page 1 (no OFFSET scan).
+
+        Args:
+            limit: Maximum tasks on the page
+            cursor: next_cursor from the previous page (None for the first)
+            status: Only tasks with this status (optional)
+            command: Only tasks of this action type (optional)
+            since: Only tasks created at or after this ISO 8601 time (optional)
+            until: Only tasks created before this ISO 8601 time (optional)
+
+        Returns:
+            tuple: (rows, next_cursor) - task tuples as in get_recent_tasks
+                   (output_data not loaded), and the cursor of the next page or None if this is the last
+
+        Raises:
+            ValueError: If the cursor or a time is malformed
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM tasks
-            WHERE status = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        """, (status, limit))
-        return cursor.fetchall()
+        conditions, params = [], []
+        for column, value in (('status', status), ('command', command)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            conditions.append("created_at >= ?")
+            params.append(self._timestamp(since))
+        if until:
+            conditions.append("created_at < ?")
+            params.append(self._timestamp(until))
+        if cursor:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(self._decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._reading() as conn:
+            rows = conn.execute(f"""
+                SELECT {SUMMARY_COLUMNS} FROM tasks {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (*params, limit + 1)).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1][6], rows[-1][0])
+        return rows, next_cursor
+
+    @staticmethod
+    def _encode_cursor(created_at: str, task_id: str) -> str:
+        return base64.urlsafe_b64encode(json.dumps([created_at, task_id]).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> list:
+        try:
+            created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            return [str(created_at), str(task_id)]
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+
+    @staticmethod
+    def _timestamp(value: str) -> str:
+        """ISO 8601 time as stored by CURRENT_TIMESTAMP (UTC, 'YYYY-MM-DD HH:MM:SS')"""
+        try:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid time: {value!r} (use ISO 8601, e.g. 2025-01-31T12:00:00Z)")
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment.strftime('%Y-%m-%d %H:%M:%S')
 
     def close(self):
         """Close database connection"""
+        if self._committer is not None:
+            self._closing.set()
+            self._committer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
         if self.conn:
+            self.flush()
             self.conn.close()
             print("📦 SQLite connection closed")
@@ -0,0 +1,79 @@
+"""
+Task Batch Scheduling
+
+A task_batch from the relay (POST /tasks/batch) carries several task
+definitions, some of which depend on others. TaskBatch tracks which tasks
+can start: a task is ready once every task in its depends_on succeeded,
+and is skipped (reported as failed without running) as soon as one of
+them failed or was skipped. Ready tasks are submitted to the worker pool
+like single task commands, so independent ones run concurrently.
+
+TaskExecutor also uses it to order the steps of DAG tasks (task_dag.py).
+The client calls it from the event loop and the executor from the thread
+running the DAG, so no locking is needed.
+"""
+
+from typing import Dict, List, Set, Tuple
+
+
+class TaskBatch:
+    """Dependency tracking for the tasks of one batch"""
+
+    def __init__(self, batch_id: str, tasks: List[dict]):
+        """
+        Args:
+            batch_id: Batch the tasks belong to
+            tasks: Task definitions ({task_id, action_type, params,
+                   depends_on, ...}); dependencies outside the batch are
+                   ignored (the relay rejects them)
+        """
+        self.batch_id = batch_id
+        self.tasks: Dict[str, dict] = {task["task_id"]: task for task in tasks}
+        self._waiting_on: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, List[str]] = {task_id: [] for task_id in self.tasks}
+        for task_id, task in self.tasks.items():
+            depends_on = {dep for dep in task.get("depends_on") or [] if dep in self.tasks}
+            self._waiting_on[task_id] = depends_on
+            for dep in depends_on:
+                self._dependents[dep].append(task_id)
+        self._started: Set[str] = set()
+        self.finished: Dict[str, bool] = {}  # task_id -> succeeded
+
+    def ready(self) -> List[dict]:
+        """Tasks whose dependencies have all succeeded, each returned once"""
+        ready = [
+            task for task_id, task in self.tasks.items()
+            if task_id not in self._started and not self._waiting_on[task_id]
+        ]
+        self._started.update(task["task_id"] for task in ready)
+        return ready
+
+    def finish(self, task_id: str, succeeded: bool) -> Tuple[List[dict], List[str]]:
+        """
+        Record a task's outcome.
+
+        Returns:
+            tuple: (tasks that can start now, task_ids skipped because
+                    they depend on a task that did not succeed)
+        """
+        self.finished[task_id] = succeeded
+        if succeeded:
+            for dependent in self._dependents.get(task_id, []):
+                self._waiting_on[dependent].discard(task_id)
+            return self.ready(), []
+
+        skipped = []
+        pending = list(self._dependents.get(task_id, []))
+        while pending:
+            dependent = pending.pop(0)
+            if dependent in self._started:
+                continue
+            self._started.add(dependent)
+            self.finished[dependent] = False
+            skipped.append(dependent)
+            pending.extend(self._dependents[dependent])
+        return [], skipped
+
+    @property
+    def done(self) -> bool:
+        return len(self.finished) == len(self.tasks)
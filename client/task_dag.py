@@ -0,0 +1,155 @@
+"""
+DAG Tasks
+
+A task with action_type "dag" runs several steps inside one task:
+
+    {"action_type": "dag", "params": {
+        "max_parallel": 4,
+        "steps": [
+            {"id": "fetch", "action_type": "git",
+             "params": {"command": ["git", "fetch"], "working_dir": "/repo"}},
+            {"id": "head", "action_type": "git", "depends_on": ["fetch"],
+             "params": {"command": ["git", "rev-parse", "origin/main"], "working_dir": "/repo"}},
+            {"id": "test", "action_type": "shell", "depends_on": ["head"],
+             "params": {"command": "git checkout {{steps.head.stdout}} && pytest -q",
+                        "working_dir": "/repo"}}
+        ]}}
+
+Steps whose dependencies are done run concurrently (up to max_parallel).
+A step fails if it could not run or exited non-zero; the steps that depend
+on it, directly or not, are skipped, while unrelated branches carry on.
+
+String params may reference the output of a step listed in depends_on:
+{{steps.<id>.stdout}}, {{steps.<id>.stderr}} or {{steps.<id>.returncode}}
+(stdout and stderr with surrounding whitespace stripped).
+
+Each step's status and timing is stored in the task_steps table.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+STEP_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+STEP_REF = re.compile(r'\{\{\s*steps\.([A-Za-z0-9_-]+)\.(stdout|stderr|returncode)\s*\}\}')
+
+
+def parse_steps(params: dict) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    Validate a DAG task's steps.
+
+    Returns:
+        tuple: (steps, error) - steps with depends_on normalized to a list
+               and task_id set to the step id (for TaskBatch), or an error
+    """
+    steps = params.get('steps')
+    if not isinstance(steps, list) or not steps:
+        return None, 'DAG task requires a non-empty steps list'
+
+    by_id = {}
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict):
+            return None, f'Step {index} is not an object'
+        step_id = step.get('id')
+        if not isinstance(step_id, str) or not STEP_ID.match(step_id):
+            return None, f'Step {index} needs an id of letters, digits, _ and -'
+        if step_id in by_id:
+            return None, f'Duplicate step id: {step_id}'
+        if not step.get('action_type') or step['action_type'] == 'dag':
+            return None, f'Step {step_id} needs an action_type other than dag'
+        depends_on = step.get('depends_on') or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        by_id[step_id] = {**step, 'task_id': step_id, 'depends_on': depends_on,
+                          'params': step.get('params') or {}}
+
+    for step_id, step in by_id.items():
+        unknown = [dep for dep in step['depends_on'] if dep not in by_id]
+        if unknown:
+            return None, f'Step {step_id} depends on unknown steps: {unknown}'
+        referenced = {ref for ref, _ in STEP_REF.findall(repr(step['params']))}
+        missing = sorted(referenced - set(step['depends_on']))
+        if missing:
+            return None, f'Step {step_id} uses output of {missing} without depending on them'
+
+    # Every step must be reachable in dependency order
+    placed, remaining = set(), list(by_id.values())
+    while remaining:
+        ready = [step for step in remaining if set(step['depends_on']) <= placed]
+        if not ready:
+            return None, f"Dependency cycle between steps {sorted(s['id'] for s in remaining)}"
+        placed.update(step['id'] for step in ready)
+        remaining = [step for step in remaining if step['id'] not in placed]
+
+    return list(by_id.values()), None
+
+
+def resolve_params(value, results: Dict[str, dict]):
+    """Substitute {{steps.<id>.<field>}} in every string of a params structure"""
+    if isinstance(value, str):
+        def output(match):
+            step_id, field = match.groups()
+            result = results.get(step_id, {})
+            if field == 'returncode':
+                return str(result.get('returncode', ''))
+            return (result.get(field) or '').strip()
+        return STEP_REF.sub(output, value)
+    if isinstance(value, list):
+        return [resolve_params(item, results) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_params(item, results) for key, item in value.items()}
+    return value
+
+
+def step_succeeded(result: dict) -> bool:
+    return bool(result.get('success')) and result.get('returncode', 0) == 0
+
+
+def dag_result(steps: List[dict], results: Dict[str, dict], skipped: Dict[str, str]) -> dict:
+    """
+    Combine step results into the DAG task's result.
+
+    Args:
+        steps: Parsed steps, in the order given
+        results: step id -> executor result, for steps that ran
+        skipped: step id -> the failed step that caused it to be skipped
+
+    Returns:
+        dict: success (every step succeeded), steps (per step status,
+              output and duration_ms), stdout/stderr (each step's output
+              under a header) and error naming the failed steps
+    """
+    summary, stdout, stderr, failed = {}, [], [], []
+    for step in steps:
+        step_id = step['id']
+        if step_id in skipped:
+            summary[step_id] = {'status': 'skipped', 'error': f'Dependency {skipped[step_id]} failed'}
+            continue
+        result = results[step_id]
+        ok = step_succeeded(result)
+        summary[step_id] = {
+            'status': 'completed' if ok else 'failed',
+            **{key: value for key, value in result.items() if key != 'success'}
+        }
+        if not ok:
+            failed.append(step_id)
+        if result.get('stdout'):
+            stdout.append(f"=== {step_id} ===\n{result['stdout']}")
+        if result.get('stderr'):
+            stderr.append(f"=== {step_id} ===\n{result['stderr']}")
+
+    combined = {
+        'success': not failed and not skipped,
+        'steps': summary,
+        'stdout': '\n'.join(stdout),
+        'stderr': '\n'.join(stderr),
+        'returncode': 0 if not failed else 1,
+    }
+    if failed:
+        details = '; '.join(
+            f"{step_id}: {results[step_id].get('error') or 'exit code ' + str(results[step_id].get('returncode'))}"
+            for step_id in failed
+        )
+        combined['error'] = f'DAG steps failed ({details})'
+        if skipped:
+            combined['error'] += f"; skipped: {', '.join(skipped)}"
+    return combined
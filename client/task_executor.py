@@ -4,40 +4,99 @@ Task Executor for MVP
 Executes tasks locally (git, shell, claude_code) and stores results in SQLite.
 """
 
+import codecs
 import subprocess
 import json
 import os
+import re
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from client.capabilities import ToolCapabilities
+from client.git_engine import GitEngine
+from client.output_capture import OutputCapture, prune_spill_files
+from client.result_cache import ResultCache, normalize_command
+from client.single_flight import SingleFlight
+from client.task_batch import TaskBatch
+from client.task_dag import dag_result, parse_steps, resolve_params, step_succeeded
 from client.storage.sqlite_backend import SimpleSQLiteBackend
 
+COALESCE_MODES = ('off', 'read_only', 'all')
+
 
 class TaskExecutor:
     """
     Executes tasks locally and manages their lifecycle in the database.
 
-    Supports three action types:
+    Supports four action types:
     - git: Execute git commands
     - shell: Execute shell commands
     - claude_code: Spawn Claude Code CLI
+    - dag: Run steps of the other types in dependency order (task_dag.py)
     """
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, capabilities: ToolCapabilities = None,
+                 output_limit: int = None, output_dir: str = None,
+                 git_engine: GitEngine = None, result_cache: ResultCache = None,
+                 coalesce: str = None):
         """
         Initialize task executor.
 
         Args:
             db_path: Path to SQLite database (optional, uses env var)
+            capabilities: Tool capability cache (probed here if not given)
+            output_limit: Bytes of stdout/stderr kept per stream; the rest
+                          goes to a gzip file (optional, uses env var; 0 keeps all)
+            output_dir: Directory for those files (optional, uses env var,
+                        defaults to task_output/ next to the database);
+                        TASK_OUTPUT_MAX_AGE and TASK_OUTPUT_MAX_BYTES bound
+                        how much of it is kept
+            git_engine: Answers read-only git commands without forking
+                        (optional; GIT_ENGINE=warm creates one)
+            result_cache: Serves repeated read-only tasks from memory
+                          (optional; TASK_CACHE=on creates one)
+            coalesce: Which identical in-flight tasks share one execution:
+                      off, read_only or all (optional, uses env var)
         """
         self.db = SimpleSQLiteBackend(db_path)
+        if output_limit is None:
+            output_limit = int(os.getenv('TASK_OUTPUT_LIMIT', str(256 * 1024)))
+        self.output_limit = output_limit
+        self.output_dir = output_dir or os.getenv('TASK_OUTPUT_DIR') or str(
+            Path(self.db.db_path).parent / 'task_output')
+        self.output_max_age = float(os.getenv('TASK_OUTPUT_MAX_AGE', str(7 * 24 * 3600)))
+        self.output_max_bytes = int(os.getenv('TASK_OUTPUT_MAX_BYTES', str(1024 ** 3)))
+        self._output_pruned_at = 0.0
+        self._prune_lock = threading.Lock()
+        if capabilities is None:
+            capabilities = ToolCapabilities(ttl=float(os.getenv('TOOL_PROBE_TTL', '300')))
+            capabilities.probe_all()
+        self.capabilities = capabilities
+        if git_engine is None and os.getenv('GIT_ENGINE', 'subprocess') == 'warm':
+            git_engine = GitEngine(max_repositories=int(os.getenv('GIT_ENGINE_REPOS', '16')))
+        self.git_engine = git_engine
+        if result_cache is None and os.getenv('TASK_CACHE', 'off') == 'on':
+            result_cache = ResultCache(
+                ttl=float(os.getenv('TASK_CACHE_TTL', '10')),
+                max_entries=int(os.getenv('TASK_CACHE_MAX_ENTRIES', '256')),
+                max_bytes=int(os.getenv('TASK_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+            )
+        self.result_cache = result_cache
+        self.coalesce = coalesce or os.getenv('TASK_COALESCE', 'off')
+        if self.coalesce not in COALESCE_MODES:
+            raise ValueError(f"TASK_COALESCE must be one of {', '.join(COALESCE_MODES)}")
+        self.single_flight = SingleFlight()
         print("⚙️  Task executor initialized")
 
-    def handle_task(self, task_data: dict) -> dict:
+    def handle_task(self, task_data: dict, on_output=None) -> dict:
         """
         Main entry point for task execution.
 
@@ -50,36 +109,68 @@ class TaskExecutor:
                         "command": [...] or "string",
                         "working_dir": "/path/to/dir",
                         "timeout": 30
-                    }
+                    },
+                    "queue_wait_ms": 0,   # Optional, set by the task queue
+                    "queue_depth": 0
                 }
+            on_output: Optional callback(stream, text) called with stdout/stderr
+                       chunks as the command produces them
 
         Returns:
             dict: Result with status, task_id, and result/error
         """
+        task_id, action_type, params, error = self._begin(task_data)
+        if error:
+            return error
+
+        # Execute based on action type
+        try:
+            result = self._execute(action_type, params, on_output, task_id)
+        except Exception as e:
+            return self._fail_task(task_id, f'Execution error: {str(e)}')
+        return self._finish_task(task_id, result)
+
+    def _begin(self, task_data: dict):
+        """
+        Validate a task command and record it as running.
+
+        Returns:
+            tuple: (task_id, action_type, params, error) - error is a
+                   response dict if the task cannot start
+        """
         task_id = task_data.get('task_id')
         action_type = task_data.get('action_type')
         params = task_data.get('params', {})
 
         if not task_id:
-            return {
+            return task_id, action_type, params, {
                 'status': 'error',
                 'error': 'Missing task_id'
             }
 
         if not action_type:
-            return {
+            return task_id, action_type, params, {
                 'status': 'error',
                 'task_id': task_id,
                 'error': 'Missing action_type'
             }
 
+        return task_id, action_type, params, self._start_task(
+            task_id, action_type, params,
+            task_data.get('queue_wait_ms'), task_data.get('queue_depth')
+        )
+
+    def _start_task(self, task_id: str, action_type: str, params: dict,
+                    queue_wait_ms: int = None, queue_depth: int = None):
+        """Record the task as running; returns an error response if that fails"""
         # Create task in database
         try:
             input_data_json = json.dumps({
                 'action_type': action_type,
                 'params': params
             })
-            self.db.create_task(task_id, action_type, input_data_json)
+            self.db.create_task(task_id, action_type, input_data_json,
+                                queue_wait_ms=queue_wait_ms, queue_depth=queue_depth)
         except Exception as e:
             return {
                 'status': 'error',
@@ -89,51 +180,296 @@ class TaskExecutor:
 
         # Update to running
         self.db.update_task(task_id, 'running')
-
-        # Execute based on action type
-        try:
-            if action_type == 'git':
-                result = self._execute_git(params)
-            elif action_type == 'shell':
-                result = self._execute_shell(params)
-            elif action_type == 'claude_code':
-                result = self._execute_claude_code(params)
-            else:
-                result = {
-                    'success': False,
-                    'error': f'Unknown action type: {action_type}'
-                }
-
-            # Update task in database
-            if result.get('success'):
-                output_data_json = json.dumps(result)
-                self.db.update_task(task_id, 'completed', output_data=output_data_json)
-                return {
-                    'status': 'success',
-                    'task_id': task_id,
-                    'result': result
-                }
-            else:
-                error_msg = result.get('error', 'Unknown error')
-                self.db.update_task(task_id, 'failed', error=error_msg)
-                return {
-                    'status': 'failed',
-                    'task_id': task_id,
-                    'error': error_msg
-                }
-
-        except Exception as e:
-            error_msg = f'Execution error: {str(e)}'
-            self.db.update_task(task_id, 'failed', error=error_msg)
+        return None
+
+    def _finish_task(self, task_id: str, result: dict) -> dict:
+        """Store an execution result and build the handle_task response"""
+        if result.get('success'):
+            output_data_json = json.dumps(result)
+            output_ref = result.get('output_ref')
+            self.db.update_task(
+                task_id, 'completed',
+                output_data=output_data_json,
+                output_ref=json.dumps(output_ref) if output_ref else None
+            )
             return {
-                'status': 'failed',
+                'status': 'success',
                 'task_id': task_id,
-                'error': error_msg
+                'result': result
             }
+        return self._fail_task(task_id, result.get('error', 'Unknown error'))
+
+    def _fail_task(self, task_id: str, error_msg: str) -> dict:
+        self.db.update_task(task_id, 'failed', error=error_msg)
+        return {
+            'status': 'failed',
+            'task_id': task_id,
+            'error': error_msg
+        }
+
+    def _execute(self, action_type: str, params: dict, on_output=None,
+                 task_id: str = None) -> dict:
+        """
+        Validate and run one task.
+
+        Returns:
+            dict: {success, stdout, stderr, returncode, error}, plus
+                  output_truncated, output_bytes and output_ref when the
+                  output went over the limit, and cached and cache_age_ms
+                  when served from the result cache (DAG tasks: see
+                  task_dag.dag_result)
+        """
+        if action_type == 'dag':
+            return self._execute_dag(params, on_output, task_id)
+        spec, error = self._prepare(action_type, params)
+        if error:
+            return error
+        if action_type == 'claude_code':
+            error = self._check_claude_cli()
+            if error:
+                return error
+
+        cached = self._from_cache(action_type, spec, params, on_output)
+        if cached:
+            return cached
+        key = self._flight_key(action_type, spec, params)
+        if key is None:
+            result = self._execute_spec(action_type, spec, on_output, task_id)
+        else:
+            result = self.single_flight.run(
+                key, lambda output: self._execute_spec(action_type, spec, output, task_id),
+                task_id, on_output
+            )
+        self._to_cache(action_type, spec, params, result)
+        return result
+
+    def _execute_spec(self, action_type: str, spec: dict, on_output=None,
+                      task_id: str = None) -> dict:
+        """Run a prepared task"""
+        captures = self._captures(task_id)
+        if action_type == 'git' and self.git_engine is not None:
+            output = self.git_engine.run(spec['command'], spec['cwd'])
+            if output is not None:
+                return self._completed(self._answered(spec['command'], output, captures, on_output))
+
+        try:
+            result = self._run(
+                spec['command'],
+                cwd=spec['cwd'],
+                timeout=spec['timeout'],
+                shell=spec['shell'],
+                on_output=on_output,
+                captures=captures
+            )
+        except subprocess.TimeoutExpired:
+            return self._timed_out(spec)
+        except Exception as e:
+            return self._execution_error(spec, e)
+        return self._completed(result)
+
+    def _execute_dag(self, params: dict, on_output=None, task_id: str = None) -> dict:
+        """Run a DAG task's steps, independent ones in parallel threads"""
+        steps, error = parse_steps(params)
+        if error:
+            return {'success': False, 'error': error}
+        order = TaskBatch(task_id, steps)
+        results, skipped = {}, {}
+        max_parallel = int(params.get('max_parallel') or len(steps))
+
+        with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='dag-step') as pool:
+            running = {}
+
+            def start(ready):
+                for step in ready:
+                    running[pool.submit(self._run_step, task_id, step, results, on_output)] = step
+
+            start(order.ready())
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    results[step['id']] = future.result()
+                    start(self._step_done(task_id, order, step, results, skipped))
+        return dag_result(steps, results, skipped)
+
+    def _run_step(self, task_id: str, step: dict, results: dict, on_output=None) -> dict:
+        params, started = self._step_started(task_id, step, results)
+        try:
+            result = self._execute(step['action_type'], params, self._step_output(step, on_output),
+                                   f"{task_id}.{step['id']}")
+        except Exception as e:
+            result = {'success': False, 'error': f'Execution error: {str(e)}'}
+        return self._step_finished(task_id, step, result, started)
+
+    def _step_started(self, task_id: str, step: dict, results: dict):
+        """Record a step as running; returns its params with step outputs filled in"""
+        self.db.start_step(task_id, step['id'], step['action_type'])
+        return resolve_params(step['params'], results), time.monotonic()
+
+    def _step_finished(self, task_id: str, step: dict, result: dict, started: float) -> dict:
+        result = {**result, 'duration_ms': int((time.monotonic() - started) * 1000)}
+        self.db.finish_step(
+            task_id, step['id'], step['action_type'],
+            'completed' if step_succeeded(result) else 'failed',
+            duration_ms=result['duration_ms'],
+            returncode=result.get('returncode'),
+            error=result.get('error')
+        )
+        return result
+
+    def _step_done(self, task_id: str, order: TaskBatch, step: dict, results: dict,
+                   skipped: dict) -> list:
+        """Record the steps a finished step unblocks or skips; returns those that can start"""
+        ready, blocked = order.finish(step['id'], step_succeeded(results[step['id']]))
+        for step_id in blocked:
+            skipped[step_id] = step['id']
+            self.db.finish_step(task_id, step_id, order.tasks[step_id]['action_type'], 'skipped',
+                                error=f"Dependency {step['id']} failed")
+        return ready
+
+    @staticmethod
+    def _step_output(step: dict, on_output):
+        """on_output for one step: chunks are prefixed with the step id"""
+        if on_output is None:
+            return None
+        return lambda stream, text: on_output(stream, f"[{step['id']}] {text}")
+
+    def _from_cache(self, action_type: str, spec: dict, params: dict, on_output=None):
+        """A cached result for the task, replayed to on_output, or None"""
+        if self.result_cache is None:
+            return None
+        key = self.result_cache.key(action_type, spec, params)
+        result = self.result_cache.get(key) if key else None
+        if result and on_output is not None:
+            for stream in ('stdout', 'stderr'):
+                if result.get(stream):
+                    try:
+                        on_output(stream, result[stream])
+                    except Exception as e:
+                        print(f"⚠️  Output callback error: {e}")
+        return result
+
+    def _to_cache(self, action_type: str, spec: dict, params: dict, result: dict):
+        if self.result_cache is None or result.get('coalesced_with'):
+            return  # The task that ran caches it
+        # Keyed on the state after the run: git status may refresh the index
+        key = self.result_cache.key(action_type, spec, params)
+        if key:
+            self.result_cache.put(key, result)
+
+    def _flight_key(self, action_type: str, spec: dict, params: dict):
+        """Fingerprint under which identical running tasks are coalesced, or None"""
+        requested = params.get('coalesce')
+        if requested is None:
+            if self.coalesce == 'off':
+                return None
+            if self.coalesce == 'read_only' and not ResultCache.cacheable(action_type, spec['command']):
+                return None
+        elif not requested:
+            return None
+        return (action_type, normalize_command(spec['command']), os.path.realpath(spec['cwd']),
+                spec['shell'], spec['timeout'])
+
+    def metrics(self) -> dict:
+        """Counters for the result cache, git engine and coalescing, when enabled"""
+        metrics = {}
+        if self.coalesce != 'off':
+            metrics['single_flight'] = self.single_flight.stats()
+        if self.result_cache is not None:
+            metrics['result_cache'] = self.result_cache.stats()
+        if self.git_engine is not None:
+            metrics['git_engine'] = self.git_engine.stats()
+        return metrics
+
+    def _captures(self, task_id: str = None) -> dict:
+        """Bounded stdout/stderr captures, spilling to <output_dir>/<task_id>.<run>.<stream>.gz"""
+        self._prune_output()
+        name = None
+        if task_id:
+            # The run suffix keeps a reused task_id from overwriting older output
+            name = f"{re.sub(r'[^A-Za-z0-9._-]', '_', task_id)}.{uuid.uuid4().hex[:8]}"
+        return {
+            stream: OutputCapture(
+                self.output_limit,
+                os.path.join(self.output_dir, f'{name}.{stream}.gz') if name else None
+            )
+            for stream in ('stdout', 'stderr')
+        }
+
+    def _prune_output(self):
+        """Apply TASK_OUTPUT_MAX_AGE / TASK_OUTPUT_MAX_BYTES, at most once a minute"""
+        if not (self.output_max_age or self.output_max_bytes):
+            return
+        now = time.monotonic()
+        with self._prune_lock:
+            if self._output_pruned_at and now - self._output_pruned_at < 60:
+                return
+            self._output_pruned_at = now
+        deleted = prune_spill_files(self.output_dir, self.output_max_age, self.output_max_bytes)
+        if deleted:
+            print(f"🧹 Deleted {deleted} old task output file(s) from {self.output_dir}")
+
+    def _prepare(self, action_type: str, params: dict):
+        """
+        Validate task parameters and build the command to run.
 
-    def _execute_git(self, params: dict) -> dict:
+        Returns:
+            tuple: (spec, error) - spec is {command, cwd, timeout, shell,
+                   label, timeout_label}; error is a failed result dict
         """
-        Execute git command.
+        if action_type == 'git':
+            return self._prepare_git(params)
+        if action_type == 'shell':
+            return self._prepare_shell(params)
+        if action_type == 'claude_code':
+            return self._prepare_claude_code(params)
+        return None, {
+            'success': False,
+            'error': f'Unknown action type: {action_type}'
+        }
+
+    @staticmethod
+    def _invalid(error: str):
+        return None, {'success': False, 'error': error}
+
+    @staticmethod
+    def _completed(result: subprocess.CompletedProcess) -> dict:
+        completed = {
+            'success': True,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'returncode': result.returncode
+        }
+        captures = getattr(result, 'captures', {})
+        if any(capture.truncated for capture in captures.values()):
+            # stdout/stderr are head + tail previews; the rest is on disk
+            completed['output_truncated'] = True
+            completed['output_bytes'] = {
+                stream: capture.total_bytes for stream, capture in captures.items()
+            }
+            completed['output_ref'] = {
+                stream: capture.ref for stream, capture in captures.items() if capture.ref
+            }
+        return completed
+
+    @staticmethod
+    def _timed_out(spec: dict) -> dict:
+        return {
+            'success': False,
+            'error': f"{spec['timeout_label']} timed out after {spec['timeout']} seconds"
+        }
+
+    def _execution_error(self, spec: dict, e: Exception) -> dict:
+        if isinstance(e, OSError) and not spec['shell']:
+            self.capabilities.invalidate(spec['command'][0])  # Re-probe before trusting it again
+        return {
+            'success': False,
+            'error': f"{spec['label']} execution error: {str(e)}"
+        }
+
+    def _prepare_git(self, params: dict):
+        """
+        Prepare a git command.
 
         Args:
             params: {
@@ -141,26 +477,17 @@ class TaskExecutor:
                 "working_dir": "/path/to/repo",
                 "timeout": 30
             }
-
-        Returns:
-            dict: {success, stdout, stderr, returncode, error}
         """
         command = params.get('command', [])
         working_dir = params.get('working_dir', os.getcwd())
         timeout = params.get('timeout', 30)
 
         if not command:
-            return {
-                'success': False,
-                'error': 'Missing command parameter'
-            }
+            return self._invalid('Missing command parameter')
 
         # Validate working directory
         if not os.path.isdir(working_dir):
-            return {
-                'success': False,
-                'error': f'Working directory does not exist: {working_dir}'
-            }
+            return self._invalid(f'Working directory does not exist: {working_dir}')
 
         # Ensure command is a list
         if isinstance(command, str):
@@ -168,42 +495,20 @@ class TaskExecutor:
 
         # Security: Ensure first element is 'git'
         if not command or command[0] != 'git':
-            return {
-                'success': False,
-                'error': 'Git commands must start with "git"'
-            }
-
-        try:
-            result = subprocess.run(
-                command,
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                shell=False  # Security: no shell injection
-            )
-
-            return {
-                'success': True,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'returncode': result.returncode
-            }
-
-        except subprocess.TimeoutExpired:
-            return {
-                'success': False,
-                'error': f'Command timed out after {timeout} seconds'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Git execution error: {str(e)}'
-            }
-
-    def _execute_shell(self, params: dict) -> dict:
+            return self._invalid('Git commands must start with "git"')
+
+        return {
+            'command': command,
+            'cwd': working_dir,
+            'timeout': timeout,
+            'shell': False,  # Security: no shell injection
+            'label': 'Git',
+            'timeout_label': 'Command'
+        }, None
+
+    def _prepare_shell(self, params: dict):
         """
-        Execute shell command.
+        Prepare a shell command.
 
         Args:
             params: {
@@ -211,69 +516,31 @@ class TaskExecutor:
                 "working_dir": "/path/to/dir",
                 "timeout": 30
             }
-
-        Returns:
-            dict: {success, stdout, stderr, returncode, error}
         """
         command = params.get('command')
         working_dir = params.get('working_dir', os.getcwd())
         timeout = params.get('timeout', 30)
 
         if not command:
-            return {
-                'success': False,
-                'error': 'Missing command parameter'
-            }
+            return self._invalid('Missing command parameter')
 
         # Validate working directory
         if not os.path.isdir(working_dir):
-            return {
-                'success': False,
-                'error': f'Working directory does not exist: {working_dir}'
-            }
-
-        try:
-            # Support both string and list commands
-            if isinstance(command, list):
-                result = subprocess.run(
-                    command,
-                    cwd=working_dir,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout,
-                    shell=False
-                )
-            else:
-                result = subprocess.run(
-                    command,
-                    cwd=working_dir,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout,
-                    shell=True
-                )
-
-            return {
-                'success': True,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'returncode': result.returncode
-            }
-
-        except subprocess.TimeoutExpired:
-            return {
-                'success': False,
-                'error': f'Command timed out after {timeout} seconds'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Shell execution error: {str(e)}'
-            }
-
-    def _execute_claude_code(self, params: dict) -> dict:
+            return self._invalid(f'Working directory does not exist: {working_dir}')
+
+        # Support both string and list commands
+        return {
+            'command': command,
+            'cwd': working_dir,
+            'timeout': timeout,
+            'shell': not isinstance(command, list),
+            'label': 'Shell',
+            'timeout_label': 'Command'
+        }, None
+
+    def _prepare_claude_code(self, params: dict):
         """
-        Execute Claude Code CLI.
+        Prepare a Claude Code CLI run.
 
         Args:
             params: {
@@ -281,74 +548,152 @@ class TaskExecutor:
                 "working_dir": "/path/to/repo",
                 "timeout": 300
             }
-
-        Returns:
-            dict: {success, stdout, stderr, returncode, error}
         """
         prompt = params.get('prompt')
         working_dir = params.get('working_dir', os.getcwd())
         timeout = params.get('timeout', 300)  # 5 min default for Claude Code
 
         if not prompt:
-            return {
-                'success': False,
-                'error': 'Missing prompt parameter'
-            }
+            return self._invalid('Missing prompt parameter')
 
         # Validate working directory
         if not os.path.isdir(working_dir):
-            return {
-                'success': False,
-                'error': f'Working directory does not exist: {working_dir}'
-            }
-
-        # Check if Claude Code CLI is available
-        try:
-            subprocess.run(
-                ['claude', '--version'],
-                capture_output=True,
-                timeout=5
-            )
-        except FileNotFoundError:
+            return self._invalid(f'Working directory does not exist: {working_dir}')
+
+        return {
+            'command': ['claude', prompt],
+            'cwd': working_dir,
+            'timeout': timeout,
+            'shell': False,
+            'label': 'Claude Code',
+            'timeout_label': 'Claude Code'
+        }, None
+
+    def _check_claude_cli(self):
+        """Check that the Claude Code CLI is available; returns an error result if not"""
+        claude = self.capabilities.get('claude')
+        if claude.path is None:
             return {
                 'success': False,
                 'error': 'Claude Code CLI not found. Install from: https://claude.ai/code'
             }
-        except Exception as e:
+        if claude.error:
             return {
                 'success': False,
-                'error': f'Failed to verify Claude Code CLI: {str(e)}'
+                'error': f'Failed to verify Claude Code CLI: {claude.error}'
             }
+        return None
 
-        try:
-            # Execute Claude Code with prompt
-            result = subprocess.run(
-                ['claude', prompt],
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                shell=False
-            )
+    def _run(self, command, cwd: str, timeout: float, shell: bool = False,
+             on_output=None, captures: dict = None) -> subprocess.CompletedProcess:
+        """
+        Run a command and capture its output.
 
-            return {
-                'success': True,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'returncode': result.returncode
-            }
+        stdout and stderr are read as they are produced into bounded
+        captures (see OutputCapture); if on_output is given, each chunk is
+        also passed to on_output(stream, text), so callers see output
+        before the command finishes. Once a stream goes over the limit,
+        forwarding stops after a single notice.
 
-        except subprocess.TimeoutExpired:
-            return {
-                'success': False,
-                'error': f'Claude Code timed out after {timeout} seconds'
-            }
+        Returns:
+            CompletedProcess whose stdout/stderr are the capture previews,
+            with the captures attached as .captures
+
+        Raises:
+            subprocess.TimeoutExpired: If the command runs past timeout
+        """
+        if captures is None:
+            captures = {stream: OutputCapture() for stream in ('stdout', 'stderr')}
+
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=shell
+        )
+        readers = [
+            threading.Thread(
+                target=self._pump,
+                args=(getattr(process, stream), stream, captures[stream], on_output),
+                daemon=True
+            )
+            for stream in captures
+        ]
+        for reader in readers:
+            reader.start()
+
+        try:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                for reader in readers:
+                    reader.join(timeout=1)  # Grandchildren may hold the pipes open
+                raise
+            for reader in readers:
+                reader.join()
+        finally:
+            for capture in captures.values():
+                capture.close()  # Flush any spill file
+
+        return self._captured(command, process.returncode, captures)
+
+    @staticmethod
+    def _captured(command, returncode: int, captures: dict) -> subprocess.CompletedProcess:
+        result = subprocess.CompletedProcess(
+            command,
+            returncode,
+            captures['stdout'].text(),
+            captures['stderr'].text()
+        )
+        result.captures = captures
+        return result
+
+    @classmethod
+    def _answered(cls, command, stdout: str, captures: dict, on_output) -> subprocess.CompletedProcess:
+        """Result for a command answered without running it (see GitEngine)"""
+        if stdout:
+            cls._forward(captures['stdout'], 'stdout', stdout, on_output)
+        for capture in captures.values():
+            capture.close()
+        return cls._captured(command, 0, captures)
+
+    @staticmethod
+    def _forward(capture: OutputCapture, stream: str, text: str, on_output):
+        """Record a chunk and pass it on, until the stream is truncated"""
+        was_truncated = capture.truncated
+        room = (capture.limit or 0) - capture.total_bytes
+        capture.write(text)
+        if on_output is None or was_truncated:
+            return
+        if capture.truncated:
+            # Pass on the part that still fit (whole characters), then the notice
+            fits = text.encode('utf-8')[:max(room, 0)].decode('utf-8', errors='ignore')
+            text = fits + (f"\n... [{stream} over {capture.limit} bytes, no longer streamed; "
+                           f"full output in {capture.ref or 'the task result'}] ...\n")
+        try:
+            on_output(stream, text)
         except Exception as e:
-            return {
-                'success': False,
-                'error': f'Claude Code execution error: {str(e)}'
-            }
+            print(f"⚠️  Output callback error: {e}")
+
+    @classmethod
+    def _pump(cls, pipe, stream: str, capture: OutputCapture, on_output):
+        """Read one pipe until EOF, capturing and forwarding decoded chunks"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        fd = pipe.fileno()
+        while True:
+            data = os.read(fd, 65536)
+            text = decoder.decode(data, final=not data)
+            if text:
+                cls._forward(capture, stream, text, on_output)
+            if not data:
+                break
+        pipe.close()
 
     def close(self):
-        """Close database connection"""
+        """Close database connection and any warm git processes"""
+        if self.git_engine is not None:
+            self.git_engine.close()
         self.db.close()
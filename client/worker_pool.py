@@ -0,0 +1,211 @@
+"""
+Task Worker Pool
+
+Runs task commands off the WebSocket loop, so a long task no longer stops
+the client from receiving messages or sending heartbeats. Tasks run in a
+thread pool (TASK_POOL_SIZE threads) with an optional concurrency limit per
+action_type (TASK_CONCURRENCY, e.g. "claude_code=1,shell=4"). Each result
+is handed back as soon as its task finishes, in completion order.
+
+Coroutine functions (AsyncTaskExecutor.handle_task) run on the event loop
+instead of a thread, under the same limits.
+
+Waiting tasks are started by priority, with aging and fair sharing between
+callers (see TaskWorkerPool), rather than in arrival order.
+"""
+
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """
+    Parse per-action_type limits.
+
+    Args:
+        spec: Comma-separated action_type=limit pairs, e.g. "claude_code=1,git=4"
+
+    Returns:
+        dict: {action_type: limit}
+
+    Raises:
+        ValueError: If an entry is malformed or a limit is below 1
+    """
+    limits = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        action_type, _, limit = entry.partition("=")
+        if not action_type.strip() or int(limit) < 1:
+            raise ValueError(f"Invalid TASK_CONCURRENCY entry: {entry!r}")
+        limits[action_type.strip()] = int(limit)
+    return limits
+
+
+@dataclass
+class _Entry:
+    """A submitted task waiting for (or holding) a slot"""
+    action_type: str
+    priority: int
+    caller: str
+    seq: int
+    enqueued: float
+    depth: int  # Tasks already waiting when this one arrived
+    started: asyncio.Future = None
+
+
+class TaskWorkerPool:
+    """
+    Thread pool for task execution with priorities, per-caller fairness and
+    per-action_type concurrency limits.
+
+    When a slot frees up, the next task is the waiting one with the highest
+    effective priority whose action_type is under its limit (so a full
+    claude_code bucket never holds up a git query behind it). Effective
+    priority is the task's priority plus one per `aging` seconds waited, so
+    low-priority work still runs eventually. Among equal effective
+    priorities, the caller served least recently goes first, then arrival
+    order.
+    """
+
+    def __init__(self, max_workers: int = 1, limits: Dict[str, int] = None, aging: float = 30):
+        """
+        Args:
+            max_workers: Tasks run at once across all action types
+            limits: Optional {action_type: max concurrent} (defaults to max_workers)
+            aging: Seconds of waiting worth one priority level (0 disables aging)
+        """
+        self.max_workers = max_workers
+        self.limits = limits or {}
+        self.aging = aging
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task")
+        self._pending: List[_Entry] = []
+        self._active = 0
+        self._running: Dict[str, int] = {}
+        self._last_served: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._tasks = set()
+
+    def submit(self, action_type: str, fn: Callable, *args,
+               on_done: Optional[Callable] = None, priority: int = 0,
+               caller: str = "default", on_start: Optional[Callable] = None) -> asyncio.Task:
+        """
+        Schedule fn(*args) on the pool without waiting for it.
+
+        Args:
+            action_type: Concurrency bucket for the task
+            fn: Blocking callable to run in a pool thread, or a coroutine
+                function to await on the loop
+            on_done: Called on the event loop with fn's return value
+                     (or the exception it raised)
+            priority: Higher runs sooner
+            caller: Session or caller the task belongs to, for fair sharing
+            on_start: Called with {queue_wait_ms, queue_depth} just before fn
+
+        Returns:
+            asyncio.Task: Completes once fn has run and on_done was called
+        """
+        entry = _Entry(action_type, int(priority), caller or "default", next(self._seq),
+                       time.monotonic(), len(self._pending))
+        entry.started = asyncio.get_running_loop().create_future()
+        self._pending.append(entry)
+        task = asyncio.create_task(self._run(entry, fn, args, on_done, on_start))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._schedule()
+        return task
+
+    def _limit(self, action_type: str) -> int:
+        return min(self.limits.get(action_type, self.max_workers), self.max_workers)
+
+    def _effective_priority(self, entry: _Entry, now: float) -> int:
+        if not self.aging:
+            return entry.priority
+        return entry.priority + int((now - entry.enqueued) / self.aging)
+
+    def _next(self) -> Optional[_Entry]:
+        """The waiting task to start next, or None if none can start"""
+        now = time.monotonic()
+        eligible = [
+            entry for entry in self._pending
+            if self._running.get(entry.action_type, 0) < self._limit(entry.action_type)
+        ]
+        if not eligible:
+            return None
+        return min(eligible, key=lambda entry: (
+            -self._effective_priority(entry, now),
+            self._last_served.get(entry.caller, -1),
+            entry.seq
+        ))
+
+    def _schedule(self):
+        """Start waiting tasks while there are free slots"""
+        while self._active < self.max_workers:
+            entry = self._next()
+            if entry is None:
+                return
+            self._pending.remove(entry)
+            self._active += 1
+            self._running[entry.action_type] = self._running.get(entry.action_type, 0) + 1
+            self._last_served[entry.caller] = next(self._seq)
+            entry.started.set_result(None)
+
+    async def _run(self, entry: _Entry, fn: Callable, args: tuple, on_done, on_start):
+        try:
+            await entry.started
+        except asyncio.CancelledError:
+            if entry in self._pending:  # Cancelled before it started
+                self._pending.remove(entry)
+            else:
+                self._release(entry)
+            raise
+
+        try:
+            if on_start is not None:
+                on_start({
+                    "queue_wait_ms": int((time.monotonic() - entry.enqueued) * 1000),
+                    "queue_depth": entry.depth,
+                })
+            if asyncio.iscoroutinefunction(fn):
+                result = await fn(*args)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, fn, *args)
+        except Exception as e:
+            result = e
+        finally:
+            self._release(entry)
+
+        if on_done is not None:
+            try:
+                on_done(result)
+            except Exception as e:
+                print(f"❌ Task completion handler error: {e}")
+
+    def _release(self, entry: _Entry):
+        self._active -= 1
+        self._running[entry.action_type] -= 1
+        self._schedule()
+
+    def stats(self) -> dict:
+        waiting: Dict[str, int] = {}
+        for entry in self._pending:
+            waiting[entry.action_type] = waiting.get(entry.action_type, 0) + 1
+        return {
+            "max_workers": self.max_workers,
+            "limits": self.limits,
+            "running": {k: v for k, v in self._running.items() if v},
+            "waiting": waiting,
+        }
+
+    async def drain(self):
+        """Wait for every submitted task to finish"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -126,6 +126,8 @@ CREATE TABLE tasks (
     process_id INTEGER,          -- PID of spawned process
     claimed_by TEXT,             -- Which control agent claimed this
     claimed_at TIMESTAMPTZ,
+    lease_expires TIMESTAMPTZ,   -- Claim lapses unless the worker heartbeats
+    attempts INTEGER DEFAULT 0,  -- Times claimed (leases that expired included)
     started TIMESTAMPTZ,
     completed TIMESTAMPTZ,
 
@@ -143,6 +145,7 @@ CREATE INDEX idx_tasks_session ON tasks(session_id, created DESC);
 CREATE INDEX idx_tasks_status ON tasks(status, priority DESC, created ASC);
 CREATE INDEX idx_tasks_agent ON tasks(agent_name, status);
 CREATE INDEX idx_tasks_session_status ON tasks(session_id, status);
+CREATE INDEX idx_tasks_lease ON tasks(lease_expires) WHERE status IN ('claimed', 'running');
 
 COMMENT ON TABLE tasks IS 'Task queue for agent work delegation';
 
@@ -250,6 +253,22 @@ CREATE TRIGGER trg_tasks_updated
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_timestamp();
 
+-- Wake idle queue workers (client/pg_worker.py) when a task becomes pending
+CREATE OR REPLACE FUNCTION notify_task_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status = 'pending' THEN
+        PERFORM pg_notify('task_queue', NEW.agent_name);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_tasks_notify_queue
+    AFTER INSERT OR UPDATE OF status ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_task_queue();
+
 -- ============================================================================
 -- VIEWS
 -- ============================================================================
@@ -0,0 +1,6 @@
+"""
+Relay Server Internals
+
+Supporting modules for the FastAPI relay in app.py. Nothing here imports
+FastAPI, so the delivery logic can be exercised without a running server.
+"""
@@ -0,0 +1,98 @@
+"""
+Task Batches
+
+POST /tasks/batch submits several task commands in one request. The relay
+checks them once, registers every task_id with the result store and sends
+the whole batch to one worker as a single task_batch frame:
+
+    {"type": "task_batch",
+     "data": {"batch_id": "batch_1a2b3c", "tasks": [
+         {"task_id": "fetch", "action_type": "git", "params": {...}},
+         {"task_id": "test", "action_type": "shell", "params": {...},
+          "depends_on": ["fetch"]}
+     ]}}
+
+Tasks are listed in dependency order. The worker starts each task once the
+tasks it depends on have succeeded (independent tasks run concurrently in
+its worker pool) and skips it, reporting it failed, if one of them failed.
+Every task still reports its own task_result, so per-task polling and
+streaming work as for single tasks.
+"""
+
+from typing import List, Tuple
+
+
+def order_batch(tasks, max_size: int = 100) -> List[dict]:
+    """
+    Validate a batch's task definitions and sort them by dependencies.
+
+    Args:
+        tasks: Task definitions, each with task_id and action_type, and
+               optionally params, priority, session_id and depends_on
+        max_size: Most tasks accepted in one batch
+
+    Returns:
+        list: Task definitions in dependency order (otherwise in the order
+              given), with depends_on normalized to a list
+
+    Raises:
+        ValueError: If the batch is empty or too large, a task is malformed,
+                    a task_id repeats, or dependencies are unknown or cyclic
+    """
+    if not isinstance(tasks, list) or not tasks:
+        raise ValueError("tasks must be a non-empty list")
+    if len(tasks) > max_size:
+        raise ValueError(f"Batch has {len(tasks)} tasks, the limit is {max_size}")
+
+    by_id = {}
+    for index, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            raise ValueError(f"Task {index} is not an object")
+        task_id = task.get("task_id")
+        if not task_id or not isinstance(task_id, str):
+            raise ValueError(f"Task {index} has no task_id")
+        if not task.get("action_type"):
+            raise ValueError(f"Task {task_id} has no action_type")
+        if task_id in by_id:
+            raise ValueError(f"Duplicate task_id {task_id}")
+        depends_on = task.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        if not isinstance(depends_on, list):
+            raise ValueError(f"Task {task_id}: depends_on must be a list of task_ids")
+        by_id[task_id] = {**task, "depends_on": depends_on}
+
+    for task_id, task in by_id.items():
+        unknown = [dep for dep in task["depends_on"] if dep not in by_id]
+        if unknown:
+            raise ValueError(f"Task {task_id} depends on tasks not in the batch: {unknown}")
+
+    ordered, placed = [], set()
+    remaining = list(by_id.values())
+    while remaining:
+        ready = [task for task in remaining if set(task["depends_on"]) <= placed]
+        if not ready:
+            raise ValueError(f"Dependency cycle between {sorted(task['task_id'] for task in remaining)}")
+        for task in ready:
+            ordered.append(task)
+            placed.add(task["task_id"])
+        remaining = [task for task in remaining if task["task_id"] not in placed]
+    return ordered
+
+
+def batch_status(statuses: List[str]) -> Tuple[str, dict]:
+    """
+    Overall state of a batch from its tasks' statuses.
+
+    Returns:
+        tuple: ("pending" while any task runs, else "failed" if any task
+               failed, else "completed"), and {status: count}
+    """
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    if counts.get("pending"):
+        return "pending", counts
+    if any(status != "completed" for status in counts):
+        return "failed", counts
+    return "completed", counts
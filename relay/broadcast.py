@@ -0,0 +1,52 @@
+"""
+Broadcast Engine
+
+Fans a message out to connected clients by encoding it once and placing the
+same text frame on each client's outbound queue. Sending happens in each
+client's writer task (see relay.connections), so a broadcast never waits on
+a socket and one slow consumer cannot stall the others.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Union
+
+from relay.encoding import encode_message
+
+
+@dataclass
+class BroadcastResult:
+    """Outcome of a single broadcast"""
+    queued: List[Any] = field(default_factory=list)
+    dropped: List[Any] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "queued": len(self.queued),
+            "dropped": len(self.dropped),
+        }
+
+
+def broadcast(connections: Iterable, message: Union[dict, str]) -> BroadcastResult:
+    """
+    Queue a message for every connection.
+
+    Args:
+        connections: ClientConnection objects (anything with enqueue(frame))
+        message: JSON-serializable message, or an already encoded JSON frame
+
+    Returns:
+        BroadcastResult: Connections the frame was queued for, and those
+                         that dropped it under their overflow policy
+    """
+    result = BroadcastResult()
+
+    # Encode once, not once per client
+    frame = message if isinstance(message, str) else encode_message(message)
+
+    for connection in list(connections):
+        if connection.enqueue(frame):
+            result.queued.append(connection)
+        else:
+            result.dropped.append(connection)
+
+    return result
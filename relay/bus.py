@@ -0,0 +1,373 @@
+"""
+Relay Event Bus
+
+Connects relay processes so the relay can run as several uvicorn workers or
+replicas. A webhook may land on a different process from the client socket
+that should receive it, and a task_result may arrive on a different process
+from the HTTP request waiting for it; the bus carries both across.
+
+Backends (selected with RELAY_BUS_URL):
+- memory://                  Single process (default)
+- unix:///path/to/bus.sock   Processes on one host (e.g. uvicorn --workers N)
+- postgresql://...           Replicas on any host, via LISTEN/NOTIFY
+
+Contract: publish() delivers a message to every *other* node. The
+publishing node handles its own copy directly, which keeps single-process
+behaviour identical to running without a bus.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from relay.encoding import encode_message
+
+Handler = Callable[[dict], Awaitable[None]]
+
+# Wire frames can carry whole GitHub payloads
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# Frames the hub queues for a peer before disconnecting it as stuck
+PEER_QUEUE_FRAMES = 1024
+
+
+class EventBus(ABC):
+    """Base class for relay pub/sub backends"""
+
+    def __init__(self, node_id: str = None):
+        self.node_id = node_id or uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, channel: str, handler: Handler):
+        """Register an async handler for messages published by other nodes"""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    @abstractmethod
+    async def start(self):
+        """Connect the bus"""
+
+    @abstractmethod
+    async def stop(self):
+        """Disconnect the bus"""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict):
+        """Send a message to every other node"""
+
+    async def _dispatch(self, frame: dict):
+        """Run local handlers for a frame received from another node"""
+        if frame.get("origin") == self.node_id:
+            return
+        for handler in self._handlers.get(frame.get("channel"), []):
+            try:
+                await handler(frame.get("message", {}))
+            except Exception as e:
+                print(f"❌ Event bus handler error on {frame.get('channel')}: {e}")
+
+    def _frame(self, channel: str, message: dict) -> dict:
+        return {"channel": channel, "origin": self.node_id, "message": message}
+
+
+class InProcessEventBus(EventBus):
+    """
+    Bus for nodes in a single process.
+
+    Each instance is a node. Instances created with the same hub list see
+    each other's messages, which lets tests run several relay nodes in one
+    event loop; a lone instance (the default) is a single-node relay.
+    """
+
+    def __init__(self, node_id: str = None, hub: List["InProcessEventBus"] = None):
+        super().__init__(node_id)
+        self._hub = hub if hub is not None else []
+        self._hub.append(self)
+
+    async def start(self):
+        pass  # Joined the hub on construction
+
+    async def publish(self, channel: str, message: dict):
+        frame = self._frame(channel, message)
+        for node in list(self._hub):
+            if node is not self:
+                await node._dispatch(frame)
+
+    async def stop(self):
+        if self in self._hub:
+            self._hub.remove(self)
+
+
+class LocalSocketEventBus(EventBus):
+    """
+    Bus for relay processes on one host, over a Unix domain socket.
+
+    The first process to take an exclusive lock on `<path>.lock` becomes the
+    hub and listens on `path`; the others connect to it. The hub forwards each
+    frame to every other peer. If the hub process exits, its lock is released
+    and the remaining processes elect a new hub on reconnect.
+
+    The hub never waits on a peer's socket: a frame goes straight to the
+    socket when nothing is pending for that peer, otherwise into a queue
+    sent by a writer task per peer, so reading carries on (a peer whose
+    handlers publish back can't deadlock with the hub). A peer that falls
+    PEER_QUEUE_FRAMES behind is disconnected; it rejoins like after a hub
+    failover.
+    """
+
+    def __init__(self, path: str, node_id: str = None, reconnect_delay: float = 0.2):
+        super().__init__(node_id)
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+        self.is_hub = False
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[asyncio.StreamWriter, asyncio.Queue] = {}  # Hub only: outgoing frames
+        self._hub_writer: Optional[asyncio.StreamWriter] = None  # Peers only
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._stopping = False
+
+    async def start(self):
+        await self._join()
+
+    async def _join(self):
+        """Become the hub if nobody holds the lock, otherwise connect to it"""
+        while not self._stopping:
+            if self._try_lock():
+                if os.path.exists(self.path):
+                    os.unlink(self.path)  # Stale socket from a dead hub
+                self._server = await asyncio.start_unix_server(
+                    self._serve_peer, self.path, limit=MAX_FRAME_BYTES
+                )
+                self.is_hub = True
+                self._connected.set()
+                print(f"🔀 Event bus hub listening on {self.path} (node {self.node_id})")
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME_BYTES)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(self.reconnect_delay)  # Hub is still starting
+                continue
+            self._hub_writer = writer
+            self._reader_task = asyncio.create_task(self._read_from_hub(reader))
+            self._connected.set()
+            print(f"🔀 Event bus connected to hub at {self.path} (node {self.node_id})")
+            return
+
+    def _try_lock(self) -> bool:
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Hub: relay frames from one peer to all others"""
+        outbox = asyncio.Queue(maxsize=PEER_QUEUE_FRAMES)
+        self._peers[writer] = outbox
+        sender = asyncio.create_task(self._send_to_peer(writer, outbox))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                self._forward(line, exclude=writer)
+                await self._dispatch(frame)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self._peers.pop(writer, None)
+            sender.cancel()
+            writer.close()
+
+    async def _send_to_peer(self, writer: asyncio.StreamWriter, outbox: asyncio.Queue):
+        """Hub: write one peer's queued frames"""
+        try:
+            while True:
+                line = await outbox.get()
+                writer.write(line)
+                await writer.drain()
+        except ConnectionError:
+            self._peers.pop(writer, None)
+            writer.close()
+
+    async def _read_from_hub(self, reader: asyncio.StreamReader):
+        """Peer: dispatch frames from the hub, re-electing if it goes away"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self._dispatch(json.loads(line))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        if not self._stopping:
+            print("⚠️  Event bus hub went away, rejoining")
+            self._connected.clear()
+            self._hub_writer = None
+            await self._join()
+
+    def _forward(self, line: bytes, exclude=None):
+        """Hub: send a frame to every peer except exclude, queueing it behind unsent frames"""
+        for writer, outbox in list(self._peers.items()):
+            if writer is exclude:
+                continue
+            if outbox.empty() and not writer.transport.get_write_buffer_size():
+                # Nothing pending: hand it to the socket now, so the frame is
+                # on its way when publish() returns
+                writer.write(line)
+                continue
+            try:
+                outbox.put_nowait(line)
+            except asyncio.QueueFull:
+                print(f"⚠️  Event bus peer is {PEER_QUEUE_FRAMES} frames behind, disconnecting it")
+                self._peers.pop(writer, None)
+                writer.close()
+
+    async def publish(self, channel: str, message: dict):
+        line = (encode_message(self._frame(channel, message)) + "\n").encode("utf-8")
+        if self.is_hub:
+            self._forward(line)
+            return
+        await self._connected.wait()
+        try:
+            self._hub_writer.write(line)
+            await self._hub_writer.drain()
+        except (ConnectionError, AttributeError) as e:
+            print(f"⚠️  Event bus publish failed: {e}")
+
+    async def stop(self):
+        self._stopping = True
+        if self._reader_task:
+            self._reader_task.cancel()
+        if self._hub_writer:
+            self._hub_writer.close()
+        if self._server:
+            self._server.close()
+            for writer in list(self._peers):
+                writer.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._lock_file:
+            self._lock_file.close()
+
+
+class PostgresEventBus(EventBus):
+    """
+    Bus for relay replicas on any host, using Postgres LISTEN/NOTIFY.
+
+    NOTIFY payloads are limited to 8000 bytes, so larger frames are written
+    to the relay_bus_messages table and the notification carries the row id.
+    """
+
+    CHANNEL = "relay_bus"
+    MAX_NOTIFY_BYTES = 7900
+    RETENTION = "10 minutes"
+
+    def __init__(self, database_url: str, node_id: str = None):
+        super().__init__(node_id)
+        self.database_url = database_url
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        import psycopg2  # Optional dependency, only needed for this backend
+
+        self._loop = asyncio.get_running_loop()
+        self._publish_conn = psycopg2.connect(self.database_url)
+        self._publish_conn.autocommit = True
+        with self._publish_conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS relay_bus_messages (
+                    id BIGSERIAL PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at TIMESTAMPTZ DEFAULT NOW()
+                )
+            """)
+
+        self._listen_conn = psycopg2.connect(self.database_url)
+        self._listen_conn.autocommit = True
+        with self._listen_conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.CHANNEL}")
+        self._loop.add_reader(self._listen_conn.fileno(), self._on_readable)
+        print(f"🔀 Event bus listening on Postgres channel {self.CHANNEL} (node {self.node_id})")
+
+    def _on_readable(self):
+        self._listen_conn.poll()
+        while self._listen_conn.notifies:
+            notify = self._listen_conn.notifies.pop(0)
+            self._loop.create_task(self._receive(notify.payload))
+
+    async def _receive(self, payload: str):
+        envelope = json.loads(payload)
+        if envelope.get("origin") == self.node_id:
+            return
+        if "ref" in envelope:
+            payload = await self._loop.run_in_executor(None, self._fetch, envelope["ref"])
+            if payload is None:
+                return
+            envelope = json.loads(payload)
+        await self._dispatch(envelope)
+
+    def _fetch(self, ref: int) -> Optional[str]:
+        with self._publish_lock, self._publish_conn.cursor() as cur:
+            cur.execute("SELECT payload FROM relay_bus_messages WHERE id = %s", (ref,))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def _notify(self, payload: str):
+        with self._publish_lock, self._publish_conn.cursor() as cur:
+            if len(payload.encode("utf-8")) > self.MAX_NOTIFY_BYTES:
+                cur.execute(
+                    "INSERT INTO relay_bus_messages (payload) VALUES (%s) RETURNING id",
+                    (payload,)
+                )
+                ref = cur.fetchone()[0]
+                cur.execute(
+                    f"DELETE FROM relay_bus_messages WHERE created_at < NOW() - INTERVAL '{self.RETENTION}'"
+                )
+                payload = json.dumps({"origin": self.node_id, "ref": ref})
+            cur.execute("SELECT pg_notify(%s, %s)", (self.CHANNEL, payload))
+
+    async def publish(self, channel: str, message: dict):
+        payload = encode_message(self._frame(channel, message))
+        await self._loop.run_in_executor(None, self._notify, payload)
+
+    async def stop(self):
+        if self._listen_conn:
+            self._loop.remove_reader(self._listen_conn.fileno())
+            self._listen_conn.close()
+        if self._publish_conn:
+            self._publish_conn.close()
+
+
+def create_event_bus(url: str = None, node_id: str = None) -> EventBus:
+    """
+    Build an event bus from a URL.
+
+    Args:
+        url: memory://, unix:///path/to/socket or postgresql://...
+             (defaults to memory://)
+        node_id: Identifier for this relay process (random if omitted)
+
+    Returns:
+        EventBus: An unstarted bus
+    """
+    url = url or "memory://"
+    if url.startswith("memory://"):
+        return InProcessEventBus(node_id)
+    if url.startswith("unix://"):
+        return LocalSocketEventBus(url[len("unix://"):], node_id)
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresEventBus(url, node_id)
+    raise ValueError(f"Unsupported RELAY_BUS_URL: {url}")
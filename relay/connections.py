@@ -0,0 +1,186 @@
+"""
+Client Connections
+
+Wraps each WebSocket with a bounded outbound queue and a dedicated writer
+task. Producers such as /webhook only enqueue, so bursts of events never
+wait on a slow socket. When a queue is full the configured overflow policy
+decides what gives.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+# What to do when a client's send queue is full
+DROP_OLDEST = "drop_oldest"      # Discard the oldest queued frame to make room
+DROP_NEWEST = "drop_newest"      # Discard the frame being enqueued
+DISCONNECT = "disconnect"        # Close the client; it can reconnect and catch up
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+
+async def close_quietly(websocket, timeout: float = 5.0):
+    """Close a WebSocket without letting a stuck socket block the caller"""
+    try:
+        await asyncio.wait_for(websocket.close(), timeout=timeout)
+    except Exception:
+        pass  # Already gone or unresponsive
+
+
+class ClientConnection:
+    """
+    A connected WebSocket client with its own bounded send queue.
+
+    All outbound frames for the socket go through enqueue(), and a single
+    writer task sends them in order, so the socket never sees concurrent
+    sends.
+    """
+
+    def __init__(self, websocket, max_queue: int = 100,
+                 overflow_policy: str = DROP_OLDEST, send_timeout: float = 5.0):
+        """
+        Args:
+            websocket: Accepted WebSocket (anything with async send_text/close)
+            max_queue: Maximum frames buffered for this client
+            overflow_policy: One of OVERFLOW_POLICIES
+            send_timeout: Seconds a single send may take before the client
+                          is disconnected
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.websocket = websocket
+        self.client_id = id(websocket)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self._closed_event = asyncio.Event()
+
+        # Delivery statistics
+        self.sent = 0
+        self.dropped = 0
+        self.last_latency_ms: Optional[float] = None
+        self.max_latency_ms = 0.0
+
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame: str) -> bool:
+        """
+        Queue an encoded frame for delivery without waiting.
+
+        Args:
+            frame: JSON text frame
+
+        Returns:
+            bool: True if the frame was queued, False if it was dropped or
+                  the client is closed
+        """
+        if self.closed:
+            return False
+
+        item = (frame, time.perf_counter())
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == DROP_NEWEST:
+            self.dropped += 1
+            return False
+
+        if self.overflow_policy == DROP_OLDEST:
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+            self.queue.put_nowait(item)
+            return True
+
+        # DISCONNECT
+        self._evict(f"send queue overflow ({self.queue.maxsize} frames)")
+        return False
+
+    async def put(self, frame: str) -> bool:
+        """
+        Queue a frame, waiting for room instead of applying the overflow policy.
+
+        Used for replays, where dropping frames would defeat the purpose.
+
+        Returns:
+            bool: False if the client closed while waiting
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait((frame, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        # Wait for room, but give up if the client closes meanwhile (its
+        # writer has stopped, so the queue would never drain)
+        putting = asyncio.ensure_future(self.queue.put((frame, time.perf_counter())))
+        closing = asyncio.ensure_future(self._closed_event.wait())
+        try:
+            await asyncio.wait((putting, closing), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            putting.cancel()
+            closing.cancel()
+        return putting.done() and not putting.cancelled() and not self.closed
+
+    async def _write_loop(self):
+        """Send queued frames in order until the client closes"""
+        while True:
+            frame, enqueued_at = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(f"send timed out after {self.send_timeout}s")
+                return
+            except Exception as e:
+                self._evict(f"send failed: {e}")
+                return
+            finally:
+                self.queue.task_done()
+
+            # Latency covers time spent queued plus the send itself
+            latency_ms = round((time.perf_counter() - enqueued_at) * 1000, 3)
+            self.last_latency_ms = latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self.sent += 1
+
+    def _evict(self, reason: str):
+        """Close the client because it cannot keep up or has failed"""
+        print(f"Evicting client {self.client_id}: {reason}")
+        self.close(reason)
+
+    def close(self, reason: str = "closed"):
+        """Stop the writer and close the socket in the background"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        self._closed_event.set()
+
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        asyncio.create_task(close_quietly(self.websocket, self.send_timeout))
+
+    def stats(self) -> dict:
+        """Queue depth and delivery statistics for the health endpoint"""
+        return {
+            "client_id": self.client_id,
+            "queue_depth": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "overflow_policy": self.overflow_policy,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "last_latency_ms": self.last_latency_ms,
+            "max_latency_ms": self.max_latency_ms,
+        }
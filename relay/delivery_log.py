@@ -0,0 +1,185 @@
+"""
+Delivery Log
+
+Keeps the most recent broadcasts with increasing sequence numbers, so a
+client that reconnects can ask for what it missed:
+
+    relay -> client   {"type": "connection", "epoch": "...", "latest_seq": 42, ...}
+    client -> relay   {"type": "resume", "epoch": "...", "last_seq": 37}
+    relay -> client   {"type": "replay", "status": "ok", ...}, frames 38..42,
+                      {"type": "replay_complete", ...}
+
+The epoch identifies one log; sequence numbers from a different epoch mean
+nothing, so the client starts over from what the log still holds.
+
+The in-memory log belongs to one relay process. Given a path, the log is
+kept in SQLite instead, which survives restarts and gives every relay
+process on the host one shared sequence.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from typing import List, Optional, Tuple
+
+from relay.encoding import encode_message
+
+# (seq, frame, routing)
+LogEntry = Tuple[int, str, dict]
+
+
+class DeliveryLog:
+    """Bounded ring buffer of encoded broadcast frames"""
+
+    shared = False  # True when the sequence is shared with other relay processes
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.epoch = uuid.uuid4().hex[:12]
+        self._entries = deque(maxlen=max_entries)
+        self._seq = 0
+
+    def append(self, envelope: dict, routing: dict) -> str:
+        """
+        Assign the next sequence number and record the delivery.
+
+        Args:
+            envelope: Webhook data package; its "seq" key is set in place
+            routing: Routing keys used to filter replays by subscription
+
+        Returns:
+            str: The encoded frame (including seq), ready to broadcast
+        """
+        self._seq += 1
+        envelope["seq"] = self._seq
+        frame = encode_message(envelope)
+        self._entries.append((self._seq, frame, routing))
+        return frame
+
+    @property
+    def latest_seq(self) -> int:
+        return self._seq
+
+    @property
+    def oldest_seq(self) -> Optional[int]:
+        return self._entries[0][0] if self._entries else None
+
+    def since(self, last_seq: int) -> List[LogEntry]:
+        """Entries with a sequence number greater than last_seq, oldest first"""
+        return [entry for entry in self._entries if entry[0] > last_seq]
+
+    def replay_plan(self, epoch: str, last_seq: int) -> Tuple[str, List[LogEntry]]:
+        """
+        Work out what a resuming client should receive.
+
+        Returns:
+            tuple: (status, entries) where status is
+                   "ok"      - every missed delivery is still in the log
+                   "partial" - some missed deliveries were already evicted
+                   "reset"   - unknown epoch; everything retained is sent
+        """
+        if epoch != self.epoch or last_seq is None:
+            return "reset", self.since(0)
+
+        entries = self.since(last_seq)
+        oldest = self.oldest_seq
+        if last_seq < self.latest_seq and oldest is not None and oldest > last_seq + 1:
+            return "partial", entries
+        return "ok", entries
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "latest_seq": self.latest_seq,
+            "oldest_seq": self.oldest_seq,
+            "max_entries": self.max_entries,
+            "shared": self.shared,
+        }
+
+
+class SQLiteDeliveryLog(DeliveryLog):
+    """Delivery log persisted to SQLite and shared by relay processes on one host"""
+
+    shared = True
+
+    def __init__(self, path: str, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA busy_timeout = 5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS delivery_log (
+                seq INTEGER PRIMARY KEY,
+                frame TEXT NOT NULL,
+                routing TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS delivery_log_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO delivery_log_meta (key, value) VALUES ('epoch', ?)",
+            (uuid.uuid4().hex[:12],)
+        )
+        self.epoch = self.conn.execute(
+            "SELECT value FROM delivery_log_meta WHERE key = 'epoch'"
+        ).fetchone()[0]
+
+    def append(self, envelope: dict, routing: dict) -> str:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so concurrent relay
+            # processes cannot hand out the same sequence number
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self.conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM delivery_log"
+                ).fetchone()[0]
+                envelope["seq"] = seq
+                frame = encode_message(envelope)
+                self.conn.execute(
+                    "INSERT INTO delivery_log (seq, frame, routing) VALUES (?, ?, ?)",
+                    (seq, frame, json.dumps(routing))
+                )
+                self.conn.execute(
+                    "DELETE FROM delivery_log WHERE seq <= ?", (seq - self.max_entries,)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return frame
+
+    @property
+    def latest_seq(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM delivery_log").fetchone()[0]
+
+    @property
+    def oldest_seq(self) -> Optional[int]:
+        with self._lock:
+            return self.conn.execute("SELECT MIN(seq) FROM delivery_log").fetchone()[0]
+
+    def since(self, last_seq: int) -> List[LogEntry]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT seq, frame, routing FROM delivery_log WHERE seq > ? ORDER BY seq",
+                (last_seq,)
+            ).fetchall()
+        return [(seq, frame, json.loads(routing)) for seq, frame, routing in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def create_delivery_log(path: str = None, max_entries: int = 1000) -> DeliveryLog:
+    """In-memory log, or a SQLite-backed one when a path is given"""
+    if path:
+        return SQLiteDeliveryLog(path, max_entries)
+    return DeliveryLog(max_entries)
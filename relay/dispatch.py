@@ -0,0 +1,197 @@
+"""
+Task Dispatch
+
+Sends each task_command to exactly one worker instead of broadcasting it.
+Workers advertise themselves after connecting:
+
+    {"type": "register", "capacity": 4, "action_types": ["git", "shell"],
+     "capabilities": {"git": {"available": true, "version": "git version 2.43.0", ...}}}
+
+Clients only list action types whose tools they found, and register again
+when that changes.
+
+The dispatcher tracks tasks in flight per worker (released when the
+worker's task_result arrives) and picks a worker by strategy:
+
+- least_loaded: lowest in-flight/capacity ratio
+- round_robin: rotate through eligible workers
+
+Workers with free capacity are preferred; if all are saturated the least
+loaded one is still chosen so the task queues on the client rather than
+being rejected.
+
+When the relay runs as several nodes, workers connected to other nodes are
+tracked as RemoteWorker entries kept current from the nodes' presence
+announcements on the event bus.
+"""
+
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+LEAST_LOADED = "least_loaded"
+ROUND_ROBIN = "round_robin"
+DISPATCH_STRATEGIES = (LEAST_LOADED, ROUND_ROBIN)
+
+
+@dataclass
+class WorkerInfo:
+    """Advertised capacity and current load of a registered worker"""
+    capacity: int = 1
+    action_types: List[str] = field(default_factory=list)  # Empty means any
+    in_flight: Set[str] = field(default_factory=set)
+    capabilities: Dict[str, dict] = field(default_factory=dict)  # Tool report, informational
+    metrics: Dict[str, dict] = field(default_factory=dict)  # Reported with pings, informational
+
+    @property
+    def load(self) -> float:
+        return len(self.in_flight) / max(self.capacity, 1)
+
+    def accepts(self, action_type: Optional[str]) -> bool:
+        return not self.action_types or action_type in self.action_types
+
+    def accepts_all(self, action_types: Iterable[str]) -> bool:
+        return all(self.accepts(action_type) for action_type in action_types)
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "action_types": self.action_types,
+            "in_flight": len(self.in_flight),
+            "capabilities": self.capabilities,
+            "metrics": self.metrics,
+        }
+
+
+@dataclass(frozen=True)
+class RemoteWorker:
+    """A worker connected to another relay node"""
+    node_id: str
+    client_id: int
+    closed = False  # Remote workers are removed, never closed
+
+
+class TaskDispatcher:
+    """Chooses a single worker connection for each task"""
+
+    def __init__(self, strategy: str = LEAST_LOADED):
+        if strategy not in DISPATCH_STRATEGIES:
+            raise ValueError(f"Unknown dispatch strategy: {strategy}")
+        self.strategy = strategy
+        self._workers: Dict[Any, WorkerInfo] = {}
+        self._assignments: Dict[str, Any] = {}  # task_id -> connection
+        self._rotation = itertools.count()
+
+    def register(self, connection, capacity: int = 1, action_types: Iterable[str] = None,
+                 capabilities: Dict[str, dict] = None) -> WorkerInfo:
+        """Register (or update) a worker connection"""
+        worker = self._workers.get(connection)
+        if worker is None:
+            worker = self._workers[connection] = WorkerInfo()
+        worker.capacity = max(int(capacity or 1), 1)
+        worker.action_types = sorted(set(action_types or []))
+        worker.capabilities = capabilities or {}
+        return worker
+
+    def unregister(self, connection) -> List[str]:
+        """
+        Forget a worker.
+
+        Returns:
+            list: IDs of tasks that were still in flight on the worker
+        """
+        worker = self._workers.pop(connection, None)
+        if worker is None:
+            return []
+        for task_id in worker.in_flight:
+            self._assignments.pop(task_id, None)
+        return sorted(worker.in_flight)
+
+    def get(self, connection) -> Optional[WorkerInfo]:
+        return self._workers.get(connection)
+
+    def local_workers(self) -> Dict[Any, WorkerInfo]:
+        """Workers connected to this node"""
+        return {
+            connection: worker for connection, worker in self._workers.items()
+            if not isinstance(connection, RemoteWorker)
+        }
+
+    def remote_workers(self) -> List[RemoteWorker]:
+        """Workers connected to other nodes"""
+        return [c for c in self._workers if isinstance(c, RemoteWorker)]
+
+    def sync_remote(self, node_id: str, workers: List[dict]):
+        """
+        Replace the view of another node's workers with its latest announcement.
+
+        Args:
+            node_id: Announcing node
+            workers: [{client_id, capacity, action_types, in_flight: [task_ids]}]
+        """
+        announced = {w["client_id"]: w for w in workers}
+        for remote in self.remote_workers():
+            if remote.node_id == node_id and remote.client_id not in announced:
+                self.unregister(remote)
+
+        for client_id, announcement in announced.items():
+            remote = RemoteWorker(node_id, client_id)
+            worker = self.register(remote, announcement.get("capacity", 1),
+                                   announcement.get("action_types"))
+            for task_id in worker.in_flight:
+                self._assignments.pop(task_id, None)
+            worker.in_flight = set(announcement.get("in_flight", []))
+            for task_id in worker.in_flight:
+                self._assignments[task_id] = remote
+
+    def drop_node(self, node_id: str):
+        """Forget every worker of a node that stopped announcing itself"""
+        for remote in self.remote_workers():
+            if remote.node_id == node_id:
+                self.unregister(remote)
+
+    def select(self, action_type: str = None, candidates: Set[Any] = None,
+               action_types: Iterable[str] = None):
+        """
+        Pick one worker for a task (or a batch of tasks).
+
+        Args:
+            action_type: Task action type the worker must support
+            candidates: Restrict the choice to these connections (e.g. the
+                        clients subscribed to task commands)
+            action_types: For batches: every action type the worker must support
+
+        Returns:
+            The chosen connection, or None if no registered worker is eligible
+        """
+        eligible = [
+            (connection, worker) for connection, worker in self._workers.items()
+            if worker.accepts_all(action_types or [action_type])
+            and not getattr(connection, "closed", False)
+            and (candidates is None or connection in candidates)
+        ]
+        if not eligible:
+            return None
+
+        available = [item for item in eligible if len(item[1].in_flight) < item[1].capacity]
+        pool = available or eligible
+
+        if self.strategy == ROUND_ROBIN:
+            pool.sort(key=lambda item: id(item[0]))
+            return pool[next(self._rotation) % len(pool)][0]
+
+        return min(pool, key=lambda item: (item[1].load, len(item[1].in_flight)))[0]
+
+    def assign(self, task_id: str, connection):
+        """Record that a task was sent to a worker"""
+        worker = self._workers.get(connection)
+        if worker is not None:
+            worker.in_flight.add(task_id)
+            self._assignments[task_id] = connection
+
+    def complete(self, task_id: str):
+        """Release a task's slot once its result arrives"""
+        connection = self._assignments.pop(task_id, None)
+        worker = self._workers.get(connection)
+        if worker is not None:
+            worker.in_flight.discard(task_id)
@@ -0,0 +1,31 @@
+"""
+Message Encoding
+
+Encodes relay messages to JSON text once so the same frame can be sent to
+every subscriber. Uses orjson when it is installed and falls back to the
+standard library otherwise.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def encode_message(message: Any) -> str:
+    """
+    Encode a message as a compact JSON text frame.
+
+    Args:
+        message: JSON-serializable object
+
+    Returns:
+        str: JSON text, byte-compatible with Starlette's send_json output
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,228 @@
+"""
+Task Result Store
+
+Keeps task results keyed by task_id so callers no longer have to hold an
+HTTP request open until a task finishes. /webhook registers the task and
+either waits briefly or returns 202 with a status URL; the result endpoint
+long-polls the store. Entries expire after a TTL and the store is bounded.
+
+While a task runs, the worker streams task_output chunks; the store keeps
+the most recent ones (for followers that join late) and fans them out to
+every follower of GET /tasks/{task_id}/stream.
+
+Batches (POST /tasks/batch) are kept as the list of their task_ids, with
+the same TTL, and waited on together.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Tuple
+
+PENDING = "pending"
+
+
+@dataclass
+class TaskRecord:
+    """A task's state as seen by the relay"""
+    task_id: str
+    status: str = PENDING
+    result: Optional[dict] = None
+    created: float = field(default_factory=time.monotonic)
+    completed: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    output: list = field(default_factory=list)  # Buffered {"stream", "data"} chunks
+    output_bytes: int = 0
+    dropped_bytes: int = 0  # Output evicted from the buffer
+    followers: set = field(default_factory=set)  # asyncio.Queue per follower
+
+    @property
+    def execution_time_ms(self) -> Optional[int]:
+        if self.completed is None:
+            return None
+        return int((self.completed - self.created) * 1000)
+
+    def to_dict(self):
+        result = self.result or {}
+        return {
+            "status": self.status,
+            "task_id": self.task_id,
+            "output": result.get("output"),
+            "error": result.get("error"),
+            "execution_time_ms": self.execution_time_ms,
+        }
+
+
+class TaskResultStore:
+    """Bounded, expiring map of task_id -> TaskRecord with async waiters"""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 10000,
+                 max_output_bytes: int = 1024 * 1024):
+        """
+        Args:
+            ttl: Seconds a record is kept after it was created
+            max_entries: Maximum records kept; the oldest are evicted first
+            max_output_bytes: Streamed output buffered per task for late followers
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_output_bytes = max_output_bytes
+        self._records: "OrderedDict[str, TaskRecord]" = OrderedDict()
+        self._batches: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+
+    def create(self, task_id: str) -> TaskRecord:
+        """
+        Register a task as pending.
+
+        A pending record is kept (its waiters stay attached); a finished one
+        is replaced, since the task_id is being reused for a new run.
+        """
+        self._expire()
+        record = self._records.get(task_id)
+        if record is None or record.status != PENDING:
+            self._records.pop(task_id, None)
+            record = self._records[task_id] = TaskRecord(task_id)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        return record
+
+    def get(self, task_id: str) -> Optional[TaskRecord]:
+        self._expire()
+        return self._records.get(task_id)
+
+    def create_batch(self, batch_id: str, task_ids: List[str]) -> List[TaskRecord]:
+        """Register a batch and each of its tasks as pending"""
+        records = [self.create(task_id) for task_id in task_ids]
+        self._batches.pop(batch_id, None)
+        self._batches[batch_id] = (time.monotonic(), list(task_ids))
+        while len(self._batches) > self.max_entries:
+            self._batches.popitem(last=False)
+        return records
+
+    def get_batch(self, batch_id: str) -> Optional[List[str]]:
+        """A batch's task_ids, or None if unknown or expired"""
+        self._expire()
+        entry = self._batches.get(batch_id)
+        return entry[1] if entry else None
+
+    async def wait_all(self, task_ids: List[str], timeout: float) -> List[Optional[TaskRecord]]:
+        """
+        Wait up to timeout seconds (in total) for several tasks to finish.
+
+        Returns:
+            list: Each task's record (None if unknown), in the order given
+        """
+        records = [self.get(task_id) for task_id in task_ids]
+        waiting = [record for record in records if record and record.status == PENDING]
+        if waiting and timeout > 0:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(record.done.wait() for record in waiting)), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return records
+
+    def set_result(self, message: dict) -> TaskRecord:
+        """
+        Store a task_result message and wake anyone waiting for it.
+
+        Results for tasks this store has not seen (e.g. created on another
+        relay node) are stored too, so any node can answer a poll.
+        """
+        self._expire()
+        task_id = message["task_id"]
+        record = self._records.get(task_id) or self.create(task_id)
+        if record.status == PENDING:
+            record.status = message.get("status", "completed")
+            record.result = message
+            record.completed = time.monotonic()
+            record.done.set()
+            record.output, record.output_bytes = [], 0  # The result carries the full output
+            for queue in record.followers:
+                queue.put_nowait(None)
+        return record
+
+    def append_output(self, message: dict) -> Optional[TaskRecord]:
+        """Buffer a task_output chunk and pass it to current followers"""
+        record = self.get(message["task_id"])
+        if record is None or record.status != PENDING:
+            return None  # Unknown, or late output after the result
+        chunk = {"stream": message.get("stream", "stdout"), "data": message.get("data", "")}
+        record.output.append(chunk)
+        record.output_bytes += len(chunk["data"])
+        while record.output_bytes > self.max_output_bytes and len(record.output) > 1:
+            evicted = record.output.pop(0)
+            record.output_bytes -= len(evicted["data"])
+            record.dropped_bytes += len(evicted["data"])
+        for queue in record.followers:
+            queue.put_nowait(chunk)
+        return record
+
+    async def follow(self, task_id: str, idle_timeout: float = 15) -> AsyncIterator[Tuple[str, Optional[dict]]]:
+        """
+        Follow a task's output until it finishes.
+
+        Yields (event, data) pairs: ("truncated", {...}) if buffered output
+        was already evicted, ("output", chunk) for each chunk, ("idle", None)
+        after idle_timeout seconds without output, and finally ("result", ...).
+        """
+        record = self.get(task_id)
+        if record is None:
+            return
+        if record.dropped_bytes and record.status == PENDING:
+            yield "truncated", {"task_id": task_id, "dropped_bytes": record.dropped_bytes}
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in record.output:
+            queue.put_nowait(chunk)
+        if record.status != PENDING:
+            queue.put_nowait(None)
+        record.followers.add(queue)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    yield "idle", None
+                    continue
+                if chunk is None:
+                    break
+                yield "output", chunk
+        finally:
+            record.followers.discard(queue)
+        yield "result", record.to_dict()
+
+    async def wait(self, task_id: str, timeout: float) -> Optional[TaskRecord]:
+        """
+        Wait up to timeout seconds for a task to finish.
+
+        Returns:
+            TaskRecord: The record (still pending if the wait timed out),
+                        or None if the task is unknown
+        """
+        record = self.get(task_id)
+        if record is None:
+            return None
+        if record.status == PENDING and timeout > 0:
+            try:
+                await asyncio.wait_for(record.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return record
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._records:
+            task_id, record = next(iter(self._records.items()))
+            if record.created >= cutoff:
+                break
+            self._records.popitem(last=False)
+        while self._batches:
+            created, _ = next(iter(self._batches.values()))
+            if created >= cutoff:
+                break
+            self._batches.popitem(last=False)
+
+    def __len__(self):
+        return len(self._records)
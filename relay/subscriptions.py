@@ -0,0 +1,176 @@
+"""
+Subscription Routing
+
+Clients can narrow what the relay sends them with a subscribe message:
+
+    {
+        "type": "subscribe",
+        "events": ["push", "pull_request"],          # GitHub event types
+        "payload_types": ["task_command"],           # Custom payload "type" values
+        "repositories": ["owner/repo"]               # Repository full names
+    }
+
+Matching rules:
+- Kind: a message matches if its GitHub event is in `events` or its payload
+  type is in `payload_types`. A client that lists neither gets every kind.
+- Repository: a message that names a repository must be in `repositories`.
+  Messages that are not repository-scoped (e.g. task commands) always pass.
+
+Clients that never subscribe receive everything, as before. Lookups go
+through inverted indexes, so routing cost depends on the number of matching
+subscribers rather than the number of connected clients.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+def _event_key(event: str) -> str:
+    return f"event:{event}"
+
+
+def _type_key(payload_type: str) -> str:
+    return f"type:{payload_type}"
+
+
+def routing_keys(event_type: Optional[str], payload: Any) -> dict:
+    """
+    Extract routing attributes from an incoming webhook.
+
+    Args:
+        event_type: X-GitHub-Event header value (None for custom webhooks)
+        payload: Parsed request body
+
+    Returns:
+        dict: {event, payload_type, repository}
+    """
+    payload_type = None
+    repository = None
+    if isinstance(payload, dict):
+        if isinstance(payload.get("type"), str):
+            payload_type = payload["type"]
+        repo = payload.get("repository")
+        if isinstance(repo, dict):
+            repository = repo.get("full_name")
+        elif isinstance(repo, str):
+            repository = repo
+
+    return {
+        "event": event_type,
+        "payload_type": payload_type,
+        "repository": repository,
+    }
+
+
+class SubscriptionIndex:
+    """Inverted index from routing attributes to subscribed connections"""
+
+    def __init__(self):
+        self._kinds: Dict[str, Set[Any]] = defaultdict(set)
+        self._repos: Dict[str, Set[Any]] = defaultdict(set)
+        self._any_kind: Set[Any] = set()
+        self._any_repo: Set[Any] = set()
+        self._subscriptions: Dict[Any, dict] = {}
+
+    def subscribe(self, connection, events: Iterable[str] = None,
+                  payload_types: Iterable[str] = None,
+                  repositories: Iterable[str] = None) -> dict:
+        """
+        Set (or replace) a connection's subscription.
+
+        Calling with no filters subscribes the connection to everything.
+
+        Returns:
+            dict: The normalized subscription
+        """
+        self.unsubscribe(connection)
+
+        subscription = {
+            "events": sorted(set(events or [])),
+            "payload_types": sorted(set(payload_types or [])),
+            "repositories": sorted(set(repositories or [])),
+        }
+        self._subscriptions[connection] = subscription
+
+        kind_keys = ([_event_key(e) for e in subscription["events"]] +
+                     [_type_key(t) for t in subscription["payload_types"]])
+        if kind_keys:
+            for key in kind_keys:
+                self._kinds[key].add(connection)
+        else:
+            self._any_kind.add(connection)
+
+        if subscription["repositories"]:
+            for repo in subscription["repositories"]:
+                self._repos[repo].add(connection)
+        else:
+            self._any_repo.add(connection)
+
+        return subscription
+
+    def unsubscribe(self, connection):
+        """Remove a connection from the index"""
+        subscription = self._subscriptions.pop(connection, None)
+        if subscription is None:
+            return
+
+        for key in ([_event_key(e) for e in subscription["events"]] +
+                    [_type_key(t) for t in subscription["payload_types"]]):
+            self._discard(self._kinds, key, connection)
+        for repo in subscription["repositories"]:
+            self._discard(self._repos, repo, connection)
+        self._any_kind.discard(connection)
+        self._any_repo.discard(connection)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[Any]], key: str, connection):
+        members = index.get(key)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del index[key]
+
+    def get(self, connection) -> Optional[dict]:
+        """Return a connection's subscription, or None if not indexed"""
+        return self._subscriptions.get(connection)
+
+    def match(self, event: str = None, payload_type: str = None,
+              repository: str = None) -> Set[Any]:
+        """
+        Find connections that should receive a message.
+
+        Args:
+            event: GitHub event type, if any
+            payload_type: Custom payload type, if any
+            repository: Repository full name, if the message is repo-scoped
+
+        Returns:
+            set: Matching connections
+        """
+        by_kind = set(self._any_kind)
+        if event:
+            by_kind |= self._kinds.get(_event_key(event), set())
+        if payload_type:
+            by_kind |= self._kinds.get(_type_key(payload_type), set())
+
+        if not repository or not by_kind:
+            return by_kind
+
+        repo_members = self._repos.get(repository, set())
+        return {c for c in by_kind if c in self._any_repo or c in repo_members}
+
+    def accepts(self, connection, event: str = None, payload_type: str = None,
+                repository: str = None) -> bool:
+        """Check a single connection against a message (used for replays)"""
+        subscription = self._subscriptions.get(connection)
+        if subscription is None:
+            return False
+        if subscription["events"] or subscription["payload_types"]:
+            if event not in subscription["events"] and payload_type not in subscription["payload_types"]:
+                return False
+        if repository and subscription["repositories"]:
+            return repository in subscription["repositories"]
+        return True
+
+    def __len__(self):
+        return len(self._subscriptions)
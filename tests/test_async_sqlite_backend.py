@@ -0,0 +1,83 @@
+"""
+Test script for the async SQLite backend.
+
+Verifies that AsyncSQLiteBackend runs storage calls off the event loop,
+batches concurrent writes into shared commits and passes errors back to
+the awaiting coroutine.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.storage.async_sqlite_backend import AsyncSQLiteBackend
+
+
+def test_async_sqlite_backend():
+    """Run all async SQLite backend tests"""
+
+    print("🧪 Testing Async SQLite Backend\n")
+
+    test_db = tempfile.mktemp(suffix='.db')
+    store = AsyncSQLiteBackend(db_path=test_db)
+
+    async def run():
+        # Test 1: CRUD as coroutines, on the storage thread
+        print("Test 1: CRUD...")
+        threads = []
+        await store.create_task("async_001", "git", '{"params": {}}')
+        await store.update_task("async_001", "completed", output_data='{"stdout": "ok"}')
+        task = await store.get_task("async_001")
+        assert task[2] == "completed" and task[4] == '{"stdout": "ok"}', task
+        assert len(await store.get_recent_tasks(limit=5)) == 1
+        assert await store.get_task_output(task[0]) == '{"stdout": "ok"}'
+        await store.run(lambda: threads.append(threading.current_thread().name))
+        assert threads == ["sqlite-store"], threads
+        print("✅ create, update and get ran on the storage thread")
+
+        # Test 2: Concurrent writes share commits
+        print("\nTest 2: Batched commits...")
+        before = store.stats()
+        await asyncio.gather(*(store.create_task(f"batch_{n}", "shell", "{}") for n in range(200)))
+        after = store.stats()
+        assert after["requests"] - before["requests"] == 200
+        assert after["batches"] - before["batches"] < 20, after
+        reader = sqlite3.connect(test_db)
+        assert reader.execute("SELECT COUNT(*) FROM tasks WHERE id LIKE 'batch_%'").fetchone()[0] == 200
+        reader.close()
+        print(f"✅ 200 writes in {after['batches'] - before['batches']} commits, visible to other connections")
+
+        # Test 3: Errors reach the caller; the batch's other writes are kept
+        print("\nTest 3: Errors...")
+        results = await asyncio.gather(
+            store.create_task("async_001", "git", "{}"),
+            store.create_task("async_002", "git", "{}"),
+            return_exceptions=True
+        )
+        assert isinstance(results[0], sqlite3.IntegrityError), results
+        assert (await store.get_task("async_002")) is not None
+        print("✅ Duplicate task_id raised IntegrityError to its caller only")
+
+    try:
+        asyncio.run(run())
+    finally:
+        store.close()
+        store.backend.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(test_db + suffix):
+                os.remove(test_db + suffix)
+
+    print("\n" + "="*60)
+    print("✅ ALL ASYNC SQLITE BACKEND TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_async_sqlite_backend()
@@ -0,0 +1,147 @@
+"""
+Test script for the asyncio task executor.
+
+Verifies that AsyncTaskExecutor returns the same results as TaskExecutor,
+streams output, kills the whole process group on timeout or cancellation,
+and runs many tasks at once without a thread per task.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.async_task_executor import AsyncTaskExecutor
+from client.task_executor import TaskExecutor
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+async def _wait_dead(pid: int, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while _alive(pid):
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+def test_async_task_executor():
+    """Run all async task executor tests"""
+
+    print("🧪 Testing Async Task Executor\n")
+
+    test_db = tempfile.mktemp(suffix='.db')
+    sync_db = tempfile.mktemp(suffix='.db')
+    executor = AsyncTaskExecutor(test_db)
+    reference = TaskExecutor(sync_db)
+    workdir = tempfile.mkdtemp()
+
+    async def run():
+        # Test 1: Same result shape as the thread-based executor
+        print("Test 1: Results match TaskExecutor...")
+        for n, task in enumerate([
+            {"action_type": "git", "params": {"command": ["git", "--version"]}},
+            {"action_type": "shell", "params": {"command": "echo out; echo err >&2; exit 3"}},
+            {"action_type": "shell", "params": {"command": ["echo", "list", "form"]}},
+            {"action_type": "git", "params": {"command": ["ls"]}},
+            {"action_type": "shell", "params": {"command": "pwd", "working_dir": "/nonexistent"}},
+            {"action_type": "unknown", "params": {}},
+        ]):
+            expected = reference.handle_task({"task_id": f"ref_{n}", **task})
+            actual = await executor.handle_task({"task_id": f"ref_{n}", **task})
+            assert actual == expected, f"{task}: {actual} != {expected}"
+        print("✅ Identical results for success, failure and validation errors")
+
+        # Test 2: Output is streamed as it is produced
+        print("\nTest 2: Streaming output...")
+        chunks = []
+        result = await executor.handle_task({
+            "task_id": "stream_1",
+            "action_type": "shell",
+            "params": {"command": "echo first; sleep 0.2; echo second"}
+        }, on_output=lambda stream, text: chunks.append((stream, time.monotonic(), text)))
+        assert result["result"]["stdout"] == "first\nsecond\n"
+        assert chunks[0][2] == "first\n" and chunks[-1][1] - chunks[0][1] >= 0.15
+        print(f"✅ {len(chunks)} chunks streamed before completion")
+
+        # Test 3: Timeouts kill the whole process group
+        print("\nTest 3: Timeout kills the process group...")
+        pid_file = os.path.join(workdir, "child.pid")
+        result = await executor.handle_task({
+            "task_id": "timeout_1",
+            "action_type": "shell",
+            "params": {"command": f"sleep 30 & echo $! > {pid_file}; wait", "timeout": 0.5}
+        })
+        assert result["status"] == "failed"
+        assert result["error"] == "Command timed out after 0.5 seconds"
+        assert await _wait_dead(int(open(pid_file).read())), "Background child survived the timeout"
+        print("✅ Timed out and the background child was killed")
+
+        # Test 4: Cancellation kills the command and records the task as failed
+        print("\nTest 4: Cancellation...")
+        os.remove(pid_file)
+        task = asyncio.create_task(executor.handle_task({
+            "task_id": "cancel_1",
+            "action_type": "shell",
+            "params": {"command": f"sleep 30 & echo $! > {pid_file}; wait"}
+        }))
+        while not os.path.exists(pid_file) or not open(pid_file).read().strip():
+            await asyncio.sleep(0.02)
+        task.cancel()
+        try:
+            await task
+            assert False, "Cancellation should propagate"
+        except asyncio.CancelledError:
+            pass
+        assert await _wait_dead(int(open(pid_file).read())), "Child survived cancellation"
+        row = executor.db.get_task("cancel_1")
+        assert row[2] == "failed" and row[5] == "Task cancelled"
+        print("✅ Cancelled, killed and recorded as failed")
+
+        # Test 5: Many concurrent tasks without a thread each
+        print("\nTest 5: 100 concurrent tasks...")
+        threads_before = threading.active_count()
+        start = time.monotonic()
+        results = await asyncio.gather(*[
+            executor.handle_task({
+                "task_id": f"many_{n}",
+                "action_type": "shell",
+                "params": {"command": ["sleep", "0.5"]}
+            })
+            for n in range(100)
+        ])
+        elapsed = time.monotonic() - start
+        assert all(r["status"] == "success" for r in results)
+        assert elapsed < 5, f"100 x 0.5s tasks took {elapsed:.2f}s"
+        assert threading.active_count() <= threads_before + 1
+        print(f"✅ 100 tasks in {elapsed:.2f}s with no extra threads")
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.close()
+        reference.close()
+        for path in (test_db, sync_db):
+            if os.path.exists(path):
+                os.remove(path)
+
+    print("\n" + "="*60)
+    print("✅ ALL ASYNC TASK EXECUTOR TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_async_task_executor()
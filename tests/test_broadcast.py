@@ -0,0 +1,139 @@
+"""
+Test script for the relay broadcast engine and client connections.
+
+Verifies encode-once fan-out, per-client send queues, overflow policies
+and writer timeouts using in-memory fake WebSocket clients.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relay.broadcast import broadcast
+from relay.connections import ClientConnection
+from relay.encoding import encode_message
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a FastAPI WebSocket"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed = False
+
+    async def send_text(self, frame):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("connection reset")
+        self.received.append(json.loads(frame))
+
+    async def close(self):
+        self.closed = True
+
+
+def test_broadcast():
+    """Run all broadcast tests"""
+
+    print("🧪 Testing Broadcast Engine\n")
+
+    async def run():
+        # Test 1: Broadcast only enqueues; writers deliver concurrently
+        print("Test 1: Queued delivery...")
+        sockets = [FakeWebSocket(delay=0.2) for _ in range(10)]
+        connections = [ClientConnection(ws) for ws in sockets]
+        for connection in connections:
+            connection.start()
+        result = broadcast(connections, {"type": "webhook"})
+        assert len(result.queued) == 10, f"Expected 10 queued, got {len(result.queued)}"
+        assert all(ws.received == [] for ws in sockets), "broadcast() must not wait for sends"
+        await asyncio.wait_for(asyncio.gather(*(c.queue.join() for c in connections)), timeout=1.0)
+        assert all(ws.received == [{"type": "webhook"}] for ws in sockets)
+        assert all(c.stats()["last_latency_ms"] is not None for c in connections)
+        print("✅ 10 slow clients served concurrently by their writers")
+
+        # Test 2: Pre-encoded frame shared by all clients
+        print("\nTest 2: Encode once...")
+        message = {"type": "webhook", "payload": {"ref": "refs/heads/main", "emoji": "🚀"}}
+        frame = encode_message(message)
+        assert json.loads(frame) == message
+        broadcast(connections, frame)
+        await asyncio.gather(*(c.queue.join() for c in connections))
+        assert all(ws.received[-1] == message for ws in sockets)
+        for connection in connections:
+            connection.close()
+        print("✅ Pre-encoded frame delivered to all clients")
+
+        # Test 3: drop_oldest keeps the newest frames
+        print("\nTest 3: drop_oldest policy...")
+        ws = FakeWebSocket()
+        connection = ClientConnection(ws, max_queue=2, overflow_policy="drop_oldest")
+        for i in range(4):
+            assert connection.enqueue(encode_message({"n": i}))
+        assert connection.stats()["queue_depth"] == 2 and connection.dropped == 2
+        connection.start()
+        await connection.queue.join()
+        assert ws.received == [{"n": 2}, {"n": 3}], ws.received
+        connection.close()
+        print("✅ Oldest frames dropped")
+
+        # Test 4: drop_newest keeps the oldest frames
+        print("\nTest 4: drop_newest policy...")
+        ws = FakeWebSocket()
+        connection = ClientConnection(ws, max_queue=2, overflow_policy="drop_newest")
+        results = [connection.enqueue(encode_message({"n": i})) for i in range(4)]
+        assert results == [True, True, False, False]
+        connection.start()
+        await connection.queue.join()
+        assert ws.received == [{"n": 0}, {"n": 1}]
+        connection.close()
+        print("✅ Newest frames dropped")
+
+        # Test 5: disconnect closes the overflowing client
+        print("\nTest 5: disconnect policy...")
+        ws = FakeWebSocket()
+        connection = ClientConnection(ws, max_queue=1, overflow_policy="disconnect")
+        result = broadcast([connection], {"n": 0})
+        result = broadcast([connection], {"n": 1})
+        assert result.dropped == [connection] and connection.closed
+        await asyncio.sleep(0.01)
+        assert ws.closed, "Socket should be closed"
+        print(f"✅ Client disconnected: {connection.close_reason}")
+
+        # Test 6: Stuck and broken sockets are closed by their writer
+        print("\nTest 6: Send timeouts and errors...")
+        stuck = ClientConnection(FakeWebSocket(delay=5.0), send_timeout=0.1)
+        broken = ClientConnection(FakeWebSocket(fail=True))
+        for connection in (stuck, broken):
+            connection.start()
+        broadcast([stuck, broken], {"type": "webhook"})
+        await asyncio.sleep(0.3)
+        assert stuck.closed and "timed out" in stuck.close_reason
+        assert broken.closed and "connection reset" in broken.close_reason
+        print("✅ Stuck and broken clients closed")
+
+        # Test 7: A replay waiting for room gives up when the client is evicted
+        print("\nTest 7: Replay put on an evicted client...")
+        stuck = ClientConnection(FakeWebSocket(delay=5.0), max_queue=1, send_timeout=0.1)
+        stuck.start()
+        assert await stuck.put(encode_message({"n": 0}))  # Taken by the writer
+        assert await stuck.put(encode_message({"n": 1}))  # Fills the queue
+        put_result = await asyncio.wait_for(stuck.put(encode_message({"n": 2})), timeout=1.0)
+        assert put_result is False and stuck.closed and "timed out" in stuck.close_reason
+        assert await stuck.put(encode_message({"n": 3})) is False
+        print("✅ Blocked put returns False once the client closes")
+
+    asyncio.run(run())
+
+    print("\n" + "="*60)
+    print("✅ ALL BROADCAST TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_broadcast()
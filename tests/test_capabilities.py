@@ -0,0 +1,129 @@
+"""
+Test script for tool capability detection.
+
+Verifies that tools are probed once and cached, re-probed when the binary
+changes, appears or fails, and that the executor and worker registration
+use the cached report.
+"""
+
+import os
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.capabilities import ToolCapabilities
+from client.task_executor import TaskExecutor
+
+
+def _write_tool(directory: str, name: str, version: str, log: str) -> str:
+    """A fake CLI that logs each invocation and prints its version"""
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(f"#!/bin/sh\necho \"$@\" >> {log}\necho '{name} {version}'\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+def _calls(log: str) -> int:
+    return len(open(log).read().splitlines()) if os.path.exists(log) else 0
+
+
+def test_capabilities():
+    """Run all capability detection tests"""
+
+    print("🧪 Testing Tool Capabilities\n")
+
+    bin_dir = tempfile.mkdtemp()
+    log = os.path.join(bin_dir, "calls.log")
+    original_path = os.environ["PATH"]
+    # Hide any real claude install so only the fake one is found
+    system_dirs = [d for d in original_path.split(os.pathsep)
+                   if d and not os.path.exists(os.path.join(d, "claude"))]
+    os.environ["PATH"] = os.pathsep.join([bin_dir] + system_dirs)
+    test_db = tempfile.mktemp(suffix=".db")
+
+    try:
+        # Test 1: Probed once, then served from cache
+        print("Test 1: Probe and cache...")
+        _write_tool(bin_dir, "faketool", "1.0", log)
+        caps = ToolCapabilities(tools=["faketool", "missingtool"], ttl=60)
+        caps.probe_all()
+        for _ in range(5):
+            assert caps.get("faketool").version == "faketool 1.0"
+        assert _calls(log) == 1, "Version probed more than once"
+        assert not caps.available("missingtool")
+        assert caps.report()["missingtool"] == {
+            "available": False, "path": None, "version": None, "error": "not found on PATH"
+        }
+        print("✅ One probe for five lookups; missing tool reported")
+
+        # Test 2: Changes on disk trigger a re-probe
+        print("\nTest 2: Filesystem changes...")
+        path = _write_tool(bin_dir, "faketool", "2.0", log)
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        assert caps.get("faketool").version == "faketool 2.0"
+        _write_tool(bin_dir, "missingtool", "0.1", log)
+        assert caps.available("missingtool"), "Newly installed tool not noticed"
+        os.remove(path)
+        assert not caps.available("faketool"), "Removed tool still reported"
+        print("✅ Upgrade, install and removal detected")
+
+        # Test 3: invalidate() and TTL force a re-probe
+        print("\nTest 3: Invalidation and TTL...")
+        before = _calls(log)
+        caps.invalidate("missingtool")
+        caps.get("missingtool")
+        assert _calls(log) == before + 1
+        short = ToolCapabilities(tools=["missingtool"], ttl=0)
+        short.get("missingtool")
+        short.get("missingtool")
+        assert _calls(log) == before + 3
+        print("✅ Re-probed after invalidate() and TTL expiry")
+
+        # Test 4: The executor checks the CLI from the cache
+        print("\nTest 4: Executor uses cached capabilities...")
+        _write_tool(bin_dir, "claude", "9.9", log)
+        executor = TaskExecutor(test_db)
+        before = _calls(log)
+        for n in range(3):
+            result = executor.handle_task({
+                "task_id": f"claude_{n}",
+                "action_type": "claude_code",
+                "params": {"prompt": "hello"}
+            })
+            assert result["status"] == "success", result
+        assert _calls(log) == before + 3, "Expected only the three real runs, no probes"
+        assert "claude_code" in executor.capabilities.action_types()
+        print("✅ Three runs, zero extra probes")
+
+        # Test 5: A missing CLI is reported without spawning anything
+        print("\nTest 5: Missing CLI...")
+        os.remove(os.path.join(bin_dir, "claude"))
+        result = executor.handle_task({
+            "task_id": "claude_missing",
+            "action_type": "claude_code",
+            "params": {"prompt": "hello"}
+        })
+        assert result["status"] == "failed" and "not found" in result["error"]
+        assert "claude_code" not in executor.capabilities.action_types()
+        assert {"git", "shell"} <= set(executor.capabilities.action_types())
+        executor.close()
+        print("✅ Reported as not found; claude_code no longer advertised")
+
+    finally:
+        os.environ["PATH"] = original_path
+        if os.path.exists(test_db):
+            os.remove(test_db)
+
+    print("\n" + "="*60)
+    print("✅ ALL CAPABILITY TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_capabilities()
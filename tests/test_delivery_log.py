@@ -0,0 +1,99 @@
+"""
+Test script for the relay delivery log and the client's relay cursor.
+
+Verifies sequencing, bounded retention, replay planning, the shared SQLite
+log, and client-side cursor tracking.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relay.delivery_log import DeliveryLog, SQLiteDeliveryLog
+from client.relay_cursor import RelayCursor
+
+ROUTING = {"event": "push", "payload_type": None, "repository": "owner/a"}
+
+
+def test_delivery_log():
+    """Run all delivery log tests"""
+
+    print("🧪 Testing Delivery Log\n")
+
+    # Test 1: Sequence numbers are assigned and embedded in the frame
+    print("Test 1: Sequencing...")
+    log = DeliveryLog(max_entries=3)
+    frames = [log.append({"type": "webhook", "n": n}, ROUTING) for n in range(5)]
+    assert [json.loads(f)["seq"] for f in frames] == [1, 2, 3, 4, 5]
+    assert log.latest_seq == 5 and log.oldest_seq == 3, "Only the last 3 are retained"
+    print("✅ Frames sequenced, oldest evicted")
+
+    # Test 2: Replay plans
+    print("\nTest 2: Replay plans...")
+    status, entries = log.replay_plan(log.epoch, 3)
+    assert status == "ok" and [e[0] for e in entries] == [4, 5]
+    status, entries = log.replay_plan(log.epoch, 1)
+    assert status == "partial" and [e[0] for e in entries] == [3, 4, 5]
+    status, entries = log.replay_plan(log.epoch, 5)
+    assert status == "ok" and entries == []
+    status, entries = log.replay_plan("other-epoch", 4)
+    assert status == "reset" and [e[0] for e in entries] == [3, 4, 5]
+    print("✅ ok / partial / reset plans correct")
+
+    # Test 3: SQLite log shares one sequence between processes on a host
+    print("\nTest 3: Shared SQLite log...")
+    path = tempfile.mktemp(suffix=".db")
+    try:
+        first = SQLiteDeliveryLog(path, max_entries=3)
+        second = SQLiteDeliveryLog(path, max_entries=3)
+        assert first.epoch == second.epoch, "Processes sharing a log share its epoch"
+        first.append({"n": 1}, ROUTING)
+        frame = second.append({"n": 2}, ROUTING)
+        assert json.loads(frame)["seq"] == 2
+        for n in range(3, 6):
+            first.append({"n": n}, ROUTING)
+        assert second.latest_seq == 5 and second.oldest_seq == 3
+        status, entries = second.replay_plan(first.epoch, 3)
+        assert status == "ok" and [json.loads(e[1])["n"] for e in entries] == [4, 5]
+        assert entries[0][2] == ROUTING
+        first.close()
+        second.close()
+        print("✅ Shared sequence and retention across instances")
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    # Test 4: Client cursor
+    print("\nTest 4: Relay cursor...")
+    cursor_path = tempfile.mktemp(suffix=".json")
+    try:
+        cursor = RelayCursor(cursor_path)
+        assert cursor.resume_message("epoch1", latest_seq=10) is None, "First run starts from now"
+        cursor.ack(11)
+        cursor.ack(12)
+        assert cursor.seen(12) and not cursor.seen(13)
+
+        restarted = RelayCursor(cursor_path)
+        assert restarted.resume_message("epoch1", latest_seq=20) == {
+            "type": "resume", "epoch": "epoch1", "last_seq": 12
+        }
+        restarted.on_replay("reset", "epoch2")
+        assert restarted.epoch == "epoch2" and restarted.last_seq == 0
+        print("✅ Cursor persisted, resumed and reset")
+    finally:
+        if os.path.exists(cursor_path):
+            os.remove(cursor_path)
+
+    print("\n" + "="*60)
+    print("✅ ALL DELIVERY LOG TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_delivery_log()
@@ -0,0 +1,96 @@
+"""
+Test script for relay task dispatch.
+
+Verifies that task commands are assigned to a single eligible worker.
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relay.dispatch import TaskDispatcher
+
+
+class FakeConnection:
+    """Stand-in for a ClientConnection"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def __repr__(self):
+        return self.name
+
+
+def test_dispatch():
+    """Run all dispatch tests"""
+
+    print("🧪 Testing Task Dispatch\n")
+
+    # Test 1: No registered workers
+    print("Test 1: No workers...")
+    dispatcher = TaskDispatcher()
+    assert dispatcher.select("git") is None
+    print("✅ No worker selected")
+
+    # Test 2: Least loaded respects capacity
+    print("\nTest 2: Least loaded...")
+    big, small = FakeConnection("big"), FakeConnection("small")
+    dispatcher.register(big, capacity=4)
+    dispatcher.register(small, capacity=1)
+    chosen = []
+    for i in range(5):
+        worker = dispatcher.select("git")
+        dispatcher.assign(f"task_{i}", worker)
+        chosen.append(worker)
+    assert chosen.count(big) == 4 and chosen.count(small) == 1, chosen
+    print(f"✅ Assignments: {chosen}")
+
+    # Test 3: Completing a task frees its slot
+    print("\nTest 3: Complete frees slot...")
+    small_task = f"task_{chosen.index(small)}"
+    dispatcher.complete(small_task)
+    assert dispatcher.get(small).to_dict()["in_flight"] == 0
+    assert dispatcher.select("git") is small
+    print("✅ Slot released")
+
+    # Test 4: Action types and candidates restrict eligibility
+    print("\nTest 4: Eligibility...")
+    claude = FakeConnection("claude")
+    dispatcher.register(claude, capacity=1, action_types=["claude_code"])
+    dispatcher.register(big, capacity=4, action_types=["git", "shell"])
+    dispatcher.register(small, capacity=1, action_types=["git", "shell"])
+    assert dispatcher.select("claude_code", candidates={big, small, claude}) is claude
+    assert dispatcher.select("claude_code", candidates={big, small}) is None
+    assert dispatcher.select("git", candidates={big, small, claude}) in (big, small)
+    claude.closed = True
+    assert dispatcher.select("claude_code") is None
+    print("✅ Only capable, subscribed, open workers are chosen")
+
+    # Test 5: Round robin rotates
+    print("\nTest 5: Round robin...")
+    dispatcher = TaskDispatcher("round_robin")
+    workers = [FakeConnection(f"w{i}") for i in range(3)]
+    for worker in workers:
+        dispatcher.register(worker, capacity=10)
+    picks = [dispatcher.select("shell") for _ in range(6)]
+    assert all(picks.count(worker) == 2 for worker in workers), picks
+    print(f"✅ Rotation: {picks}")
+
+    # Test 6: Unregister reports orphaned tasks
+    print("\nTest 6: Unregister...")
+    dispatcher.assign("orphan_1", workers[0])
+    assert dispatcher.unregister(workers[0]) == ["orphan_1"]
+    dispatcher.complete("orphan_1")  # Late result is harmless
+    assert workers[0] not in {dispatcher.select("shell") for _ in range(4)}
+    print("✅ Orphaned tasks reported")
+
+    print("\n" + "="*60)
+    print("✅ ALL DISPATCH TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_dispatch()
@@ -0,0 +1,279 @@
+"""
+Test script for the relay event bus.
+
+Verifies in-process and Unix socket backends, hub failover, and runs the
+relay as two uvicorn workers to check that broadcasts, task dispatch and
+sync results work across worker processes, including result polling.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import relay.bus
+from relay.bus import EventBus, InProcessEventBus, LocalSocketEventBus, create_event_bus
+
+
+class Recorder:
+    """Collects messages delivered to a bus handler"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def __call__(self, message):
+        self.messages.append(message)
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
+
+
+def test_event_bus():
+    """Run all event bus tests"""
+
+    print("🧪 Testing Event Bus\n")
+
+    async def run():
+        # Test 1: In-process nodes see each other's messages, not their own
+        print("Test 1: In-process bus...")
+        hub = []
+        a, b = InProcessEventBus("a", hub), InProcessEventBus("b", hub)
+        seen_a, seen_b = Recorder(), Recorder()
+        a.subscribe("deliver", seen_a)
+        b.subscribe("deliver", seen_b)
+        await a.publish("deliver", {"n": 1})
+        assert seen_a.messages == [] and seen_b.messages == [{"n": 1}]
+        print("✅ Published to other nodes only")
+
+        # Test 2: Unix socket hub and peers
+        print("\nTest 2: Unix socket bus...")
+        path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+        nodes = [LocalSocketEventBus(path, f"node{i}") for i in range(3)]
+        recorders = [Recorder() for _ in nodes]
+        for node, recorder in zip(nodes, recorders):
+            node.subscribe("deliver", recorder)
+            await node.start()
+        assert [node.is_hub for node in nodes] == [True, False, False]
+        await wait_for(lambda: len(nodes[0]._peers) == 2)
+
+        big = {"payload": "x" * 200_000}  # Larger than a default stream line
+        await nodes[1].publish("deliver", big)
+        await nodes[0].publish("deliver", {"n": 2})
+        await wait_for(lambda: len(recorders[2].messages) == 2)
+        await wait_for(lambda: len(recorders[0].messages) == 1)
+        assert recorders[0].messages == [big]
+        assert recorders[1].messages == [{"n": 2}]
+        assert big in recorders[2].messages and {"n": 2} in recorders[2].messages
+        print("✅ Hub relays frames between peers")
+
+        # Test 3: A peer that stops reading doesn't stall the hub
+        print("\nTest 3: Stuck peer...")
+        stuck_path = os.path.join(tempfile.mkdtemp(), "stuck.sock")
+        hub, peer = LocalSocketEventBus(stuck_path, "hub"), LocalSocketEventBus(stuck_path, "peer")
+        seen = Recorder()
+        hub.subscribe("deliver", seen)
+        queue_frames, relay.bus.PEER_QUEUE_FRAMES = relay.bus.PEER_QUEUE_FRAMES, 4
+        try:
+            await hub.start()
+            await peer.start()
+            stuck = socket.socket(socket.AF_UNIX)
+            stuck.connect(stuck_path)  # Never reads
+            await wait_for(lambda: len(hub._peers) == 2)
+            for n in range(8):
+                await asyncio.wait_for(peer.publish("deliver", {"n": n, "pad": "x" * 1_000_000}), timeout=5)
+            await wait_for(lambda: len(seen.messages) == 8)
+            await wait_for(lambda: len(hub._peers) == 1)
+        finally:
+            relay.bus.PEER_QUEUE_FRAMES = queue_frames
+        stuck.close()
+        await peer.stop()
+        await hub.stop()
+        print("✅ Hub keeps reading while a peer's socket is full; the stuck peer is dropped")
+
+        # Test 4: A peer takes over when the hub stops
+        print("\nTest 4: Hub failover...")
+        await nodes[0].stop()
+        await wait_for(lambda: nodes[1].is_hub or nodes[2].is_hub)
+        survivor_hub = nodes[1] if nodes[1].is_hub else nodes[2]
+        survivor_peer = nodes[2] if survivor_hub is nodes[1] else nodes[1]
+        await wait_for(lambda: survivor_peer._connected.is_set() and survivor_hub._peers)
+        before = len(recorders[nodes.index(survivor_hub)].messages)
+        await survivor_peer.publish("deliver", {"n": 3})
+        await wait_for(lambda: len(recorders[nodes.index(survivor_hub)].messages) == before + 1)
+        for node in nodes[1:]:
+            await node.stop()
+        print("✅ New hub elected")
+
+        # Test 5: URL selection
+        print("\nTest 5: create_event_bus...")
+        assert isinstance(create_event_bus(None), InProcessEventBus)
+        assert isinstance(create_event_bus("unix:///tmp/relay.sock"), LocalSocketEventBus)
+        print("✅ Backends selected from URL")
+
+        # Test 6: Incomplete backends fail when constructed
+        print("\nTest 6: Abstract base...")
+
+        class NoPublish(EventBus):
+            async def start(self):
+                pass
+
+            async def stop(self):
+                pass
+
+        try:
+            NoPublish()
+            raise AssertionError("Backend without publish() was constructed")
+        except TypeError:
+            pass
+        print("✅ Missing backend methods rejected at construction")
+
+    asyncio.run(run())
+
+    print("\n" + "="*60)
+    print("✅ ALL EVENT BUS TESTS PASSED")
+    print("="*60)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _http(method: str, url: str, body: dict = None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=20) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_multi_worker_relay():
+    """Run the relay as two uvicorn workers sharing a Unix socket bus"""
+
+    print("🧪 Testing Multi-Worker Relay\n")
+
+    try:
+        import uvicorn  # noqa: F401
+        import websockets
+    except ImportError:
+        print("⏭️  uvicorn/websockets not installed - skipping")
+        return
+
+    root = Path(__file__).parent.parent
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ,
+               RELAY_BUS_URL=f"unix://{tempfile.mkdtemp()}/bus.sock",
+               RELAY_PRESENCE_INTERVAL="0.5",
+               API_KEY="", GITHUB_WEBHOOK_SECRET="")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--workers", "2",
+         "--host", "127.0.0.1", "--port", str(port)],
+        cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    async def client(name, received, stop):
+        """A worker client that answers task commands"""
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws") as ws:
+            await ws.send(json.dumps({"type": "register", "capacity": 1}))
+            while not stop.is_set():
+                try:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), 0.1))
+                except asyncio.TimeoutError:
+                    continue
+                if message.get("type") != "webhook":
+                    continue
+                payload = message["payload"]
+                received.append((name, payload.get("type"), payload.get("n")))
+                if payload.get("type") == "task_command":
+                    task_id = payload["data"]["task_id"]
+                    await ws.send(json.dumps({
+                        "type": "task_result", "task_id": task_id,
+                        "status": "completed", "output": {"stdout": name}
+                    }))
+
+    async def run():
+        # Wait for both workers to serve and to find each other
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                status, health = await asyncio.to_thread(_http, "GET", base_url + "/")
+                if health.get("relay_nodes") == 2:
+                    break
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, "Relay workers did not start"
+            await asyncio.sleep(0.2)
+
+        received, stop = [], asyncio.Event()
+        clients = [asyncio.create_task(client(f"c{i}", received, stop)) for i in range(4)]
+        await asyncio.sleep(2)  # Registrations propagate via presence
+
+        # Test 1: Broadcasts reach every client whichever worker takes the POST
+        print("Test 1: Broadcast across workers...")
+        for n in range(4):
+            await asyncio.to_thread(_http, "POST", base_url + "/webhook",
+                                    {"type": "note", "n": n})
+        await asyncio.sleep(1)
+        notes = [r for r in received if r[1] == "note"]
+        assert len(notes) == 16, f"Expected 16 deliveries, got {len(notes)}"
+        print("✅ 4 broadcasts delivered to all 4 clients")
+
+        # Test 2: Sync tasks run once and the result finds its way back
+        print("\nTest 2: Sync tasks across workers...")
+        for n in range(8):
+            status, body = await asyncio.to_thread(_http, "POST", base_url + "/webhook", {
+                "type": "task_command", "sync": True, "n": n,
+                "data": {"task_id": f"mw_{n}", "action_type": "shell", "params": {}}
+            })
+            assert status == 200 and body["status"] == "completed", body
+        tasks = [r for r in received if r[1] == "task_command"]
+        assert len(tasks) == 8, f"Expected 8 task deliveries, got {len(tasks)}"
+        print(f"✅ 8 sync tasks each ran once, on {len({r[0] for r in tasks})} distinct clients")
+
+        # Test 3: Results can be polled from whichever worker takes the GET
+        print("\nTest 3: Polling results across workers...")
+        for n in range(4):
+            status, body = await asyncio.to_thread(_http, "POST", base_url + "/webhook", {
+                "type": "task_command", "sync": True, "wait": 0,
+                "data": {"task_id": f"poll_{n}", "action_type": "shell", "params": {}}
+            })
+            assert status in (200, 202), body
+            for _ in range(4):  # Several GETs land on both workers
+                status, body = await asyncio.to_thread(
+                    _http, "GET", base_url + f"/tasks/poll_{n}/result?wait=5")
+                assert status == 200 and body["status"] == "completed", body
+        print("✅ Every poll found the result")
+
+        stop.set()
+        await asyncio.gather(*clients)
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print("\n" + "="*60)
+    print("✅ ALL MULTI-WORKER RELAY TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_event_bus()
+    test_multi_worker_relay()
@@ -0,0 +1,146 @@
+"""
+Test script for the warm git engine.
+
+Verifies that read-only git commands answered by GitEngine match real git
+byte for byte, that anything else falls back to running git, and that the
+executor uses the engine when one is configured.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.git_engine import GitEngine
+from client.task_executor import TaskExecutor
+
+
+def _git(repo: str, *args, date: str = None):
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test User", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test User", GIT_COMMITTER_EMAIL="test@example.com")
+    if date:
+        env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = date
+    subprocess.run(["git", *args], cwd=repo, env=env, check=True, capture_output=True)
+
+
+def _make_repo() -> str:
+    """Linear history with equal timestamps, a merge, tags and packed refs"""
+    repo = tempfile.mkdtemp()
+    _git(repo, "init", "-q", "-b", "main")
+    for n in range(3):
+        Path(repo, f"file{n}").write_text(f"{n}\n")
+        _git(repo, "add", f"file{n}")
+        _git(repo, "commit", "-q", "-m", f"commit {n}\n  continued  \n\nbody", date="1700000000 +0000")
+    _git(repo, "checkout", "-q", "-b", "side", "HEAD~2")
+    Path(repo, "side.txt").write_text("side\n")
+    _git(repo, "add", "side.txt")
+    _git(repo, "commit", "-q", "-m", "side")
+    _git(repo, "checkout", "-q", "main")
+    _git(repo, "merge", "-q", "--no-edit", "side")
+    _git(repo, "tag", "v1")
+    _git(repo, "tag", "-a", "v2", "-m", "annotated")
+    _git(repo, "pack-refs", "--all")
+    Path(repo, "file0").write_text("changed\n")
+    _git(repo, "commit", "-q", "-am", "after pack")
+    return repo
+
+
+def test_git_engine():
+    """Run all git engine tests"""
+
+    print("🧪 Testing Git Engine\n")
+
+    repo = _make_repo()
+    subdir = os.path.join(repo, "nested")
+    os.mkdir(subdir)
+    engine = GitEngine()
+
+    # Test 1: Supported commands match real git exactly
+    print("Test 1: Output matches git...")
+    commands = [
+        ["git", "rev-parse", "HEAD"],
+        ["git", "rev-parse", "--verify", "v1"],
+        ["git", "rev-parse", "v2"],
+        ["git", "rev-parse", "side"],
+        ["git", "rev-parse", "--abbrev-ref", "HEAD"],
+        ["git", "rev-parse", "--show-toplevel"],
+        ["git", "branch", "--show-current"],
+        ["git", "log", "-n", "10", "--format=%H %P|%an <%ae> %at|%s|%%|%T"],
+        ["git", "log", "-3", "--pretty=format:%s%n%cn %ce %ct"],
+        ["git", "log", "--max-count=4", "--format=%H", "v2"],
+        ["git", "log", "-n2", "--pretty=tformat:%H", "side"],
+        ["git", "cat-file", "-p", "HEAD"],
+        ["git", "cat-file", "-t", "v2"],
+        ["git", "cat-file", "-s", "HEAD:file1"],
+        ["git", "show", "HEAD:file2"],
+    ]
+    for cwd in (repo, subdir):
+        for command in commands:
+            expected = subprocess.run(command, cwd=cwd, capture_output=True, text=True).stdout
+            assert engine.run(command, cwd) == expected, f"{command} in {cwd}"
+    print(f"✅ {len(commands)} commands identical from the top level and a subdirectory")
+
+    # Test 2: Everything else falls back to git
+    print("\nTest 2: Fallback...")
+    for command in (
+        ["git", "status"],
+        ["git", "log", "-n", "1"],
+        ["git", "log", "-n", "1", "--format=%h"],
+        ["git", "show", "HEAD:missing"],
+        ["git", "rev-parse", "missing"],
+        ["git", "cat-file", "-p", "HEAD^{tree}"],
+        ["git", "log", "-n", "1", "--format=%H", "file1"],  # Path, not a revision
+        ["git", "log", "--max-count=abc", "--format=%h"],  # git reports the bad count
+        ["git", "log", "-n", "-1x", "--format=%h"],
+    ):
+        assert engine.run(command, repo) is None, command
+    assert engine.run(["git", "rev-parse", "HEAD"], tempfile.mkdtemp()) is None
+    print("✅ Unsupported commands, errors and non-repositories return None")
+
+    # Test 3: New commits and branches are seen by the warm process
+    print("\nTest 3: Repository changes...")
+    Path(repo, "file3").write_text("3\n")
+    _git(repo, "add", "file3")
+    _git(repo, "commit", "-q", "-m", "new commit")
+    _git(repo, "checkout", "-q", "-b", "feature")
+    for command in (["git", "log", "-n", "2", "--format=%H %s"], ["git", "branch", "--show-current"]):
+        expected = subprocess.run(command, cwd=repo, capture_output=True, text=True).stdout
+        assert engine.run(command, repo) == expected
+    print("✅ Fresh refs and objects without restarting")
+
+    # Test 4: The executor answers git tasks through the engine
+    print("\nTest 4: Executor integration...")
+    test_db = tempfile.mktemp(suffix=".db")
+    executor = TaskExecutor(test_db, git_engine=engine)
+    hits = engine.stats()["hits"]
+    chunks = []
+    result = executor.handle_task({
+        "task_id": "engine_1",
+        "action_type": "git",
+        "params": {"command": ["git", "rev-parse", "HEAD"], "working_dir": repo}
+    }, on_output=lambda stream, text: chunks.append(text))
+    head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True).stdout
+    assert result["result"] == {"success": True, "stdout": head, "stderr": "", "returncode": 0}
+    assert chunks == [head] and engine.stats()["hits"] == hits + 1
+    result = executor.handle_task({
+        "task_id": "engine_2",
+        "action_type": "git",
+        "params": {"command": ["git", "status", "--short"], "working_dir": repo}
+    })
+    assert result["status"] == "success" and result["result"]["returncode"] == 0
+    executor.close()
+    os.remove(test_db)
+    assert engine.stats()["repositories"] == 0
+    print("✅ Engine hit for rev-parse, git subprocess for status")
+
+    print("\n" + "="*60)
+    print("✅ ALL GIT ENGINE TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_git_engine()
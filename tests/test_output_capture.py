@@ -0,0 +1,162 @@
+"""
+Test script for bounded task output capture.
+
+Verifies that output under the limit is kept as-is, that large output keeps
+only a head/tail preview in memory, the database and the task result, and
+that the full output is spilled to a gzip file referenced from the task row.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.async_task_executor import AsyncTaskExecutor
+from client.output_capture import OutputCapture, prune_spill_files
+from client.task_executor import TaskExecutor
+
+
+def test_output_capture():
+    """Run all output capture tests"""
+
+    print("🧪 Testing Output Capture\n")
+
+    workdir = tempfile.mkdtemp()
+    test_db = os.path.join(workdir, "tasks.db")
+
+    # Test 1: Under the limit nothing changes
+    print("Test 1: Small output kept as-is...")
+    capture = OutputCapture(limit=100, spill_path=os.path.join(workdir, "small.gz"))
+    capture.write("hello\n")
+    capture.write("world\n")
+    capture.close()
+    assert capture.text() == "hello\nworld\n"
+    assert not capture.truncated and capture.ref is None
+    assert not os.path.exists(os.path.join(workdir, "small.gz"))
+    print("✅ No truncation, no spill file")
+
+    # Test 2: Over the limit: head + tail in memory, everything on disk
+    print("\nTest 2: Head/tail retention and spill...")
+    spill = os.path.join(workdir, "big.gz")
+    capture = OutputCapture(limit=20, spill_path=spill)
+    data = "".join(f"{n:04d}\n" for n in range(1000))
+    for start in range(0, len(data), 37):
+        capture.write(data[start:start + 37])
+    capture.close()
+    preview = capture.text()
+    assert capture.truncated and capture.ref == spill
+    assert capture.total_bytes == len(data)
+    assert preview.startswith(data[:10]) and preview.endswith(data[-10:])
+    assert f"{len(data) - 20} bytes truncated" in preview
+    assert gzip.open(spill, "rt").read() == data
+    print(f"✅ {len(preview)}-char preview of {len(data)} bytes, full copy spilled")
+
+    # Test 3: The executor stores a preview and references the full output
+    print("\nTest 3: Executor with large output...")
+    executor = TaskExecutor(test_db, output_limit=1024)
+    chunks = []
+    result = executor.handle_task({
+        "task_id": "big/output",
+        "action_type": "shell",
+        "params": {"command": "seq 1 100000; echo done >&2"}
+    }, on_output=lambda stream, text: chunks.append((stream, text)))
+    expected = "".join(f"{n}\n" for n in range(1, 100001))
+    output = result["result"]
+    assert result["status"] == "success"
+    assert output["output_truncated"] is True
+    assert output["output_bytes"] == {"stdout": len(expected), "stderr": 5}
+    assert len(output["stdout"]) < 2048 and output["stdout"].endswith("100000\n")
+    assert output["stderr"] == "done\n" and set(output["output_ref"]) == {"stdout"}
+    ref = output["output_ref"]["stdout"]
+    assert ref.startswith(os.path.join(workdir, "task_output")) and "big_output" in ref
+    assert gzip.open(ref, "rt").read() == expected
+
+    row = executor.db.get_task("big/output")
+    assert len(row[4]) < 4096, "Full output stored in output_data"
+    assert json.loads(row[9]) == {"stdout": ref}
+    streamed = "".join(text for stream, text in chunks if stream == "stdout")
+    assert len(streamed) < 4096 and "no longer streamed" in streamed
+    assert streamed.startswith(expected[:1024] + "\n... [stdout over 1024 bytes"), "Output under the limit not streamed"
+    forwarded = []
+    capture = OutputCapture(limit=10)
+    TaskExecutor._forward(capture, "stdout", "12345678é€x", lambda stream, text: forwarded.append(text))
+    assert forwarded[0].startswith("12345678é\n... ["), forwarded  # € would cross the limit
+    print(f"✅ {len(row[4])}-byte row for {len(expected)} bytes of output")
+
+    # Test 4: Small results keep their shape; the async executor matches
+    print("\nTest 4: Small output and async executor...")
+    result = executor.handle_task({
+        "task_id": "small_1",
+        "action_type": "shell",
+        "params": {"command": "echo hi"}
+    })
+    assert result["result"] == {"success": True, "stdout": "hi\n", "stderr": "", "returncode": 0}
+    assert executor.db.get_task("small_1")[9] is None
+
+    async_executor = AsyncTaskExecutor(test_db, output_limit=1024,
+                                       output_dir=os.path.join(workdir, "async"))
+    result = asyncio.run(async_executor.handle_task({
+        "task_id": "big_async",
+        "action_type": "shell",
+        "params": {"command": "seq 1 100000"}
+    }))
+    ref = result["result"]["output_ref"]["stdout"]
+    assert os.path.dirname(ref) == os.path.join(workdir, "async")
+    assert os.path.basename(ref).startswith("big_async.") and ref.endswith(".stdout.gz")
+    assert gzip.open(ref, "rt").read() == expected
+    print("✅ Small results unchanged; async executor spills the same way")
+
+    # Test 5: The results viewer serves the full output
+    print("\nTest 5: Results viewer output endpoint...")
+    os.environ["SQLITE_PATH"] = test_db
+    try:
+        from client.results_server import app
+        client = app.test_client()
+        response = client.get("/api/task/big_async/output/stdout")
+        assert response.status_code == 200 and response.get_data(as_text=True) == expected
+        response = client.get("/api/task/small_1/output/stdout")
+        assert response.get_data(as_text=True) == "hi\n"
+        assert client.get("/api/task/small_1/output/other").status_code == 404
+        print("✅ Spilled and inline output served")
+
+        # Test 6: Reruns spill to new files; old files are pruned
+        print("\nTest 6: Spill names and retention...")
+        rerun = async_executor._captures("big_async")["stdout"]
+        rerun.write("y" * 2048)
+        rerun.close()
+        assert rerun.ref != ref and os.path.dirname(rerun.ref) == os.path.dirname(ref)
+        assert gzip.open(ref, "rt").read() == expected, "Rerun overwrote the earlier output"
+
+        prune_dir = os.path.join(workdir, "prune")
+        os.makedirs(prune_dir)
+        now = time.time()
+        for name, age, size in (("old.gz", 3600, 10), ("mid.gz", 600, 100), ("new.gz", 300, 100),
+                                ("running.gz", 1, 1000), ("notes.txt", 3600, 10)):
+            path = os.path.join(prune_dir, name)
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+            os.utime(path, (now - age, now - age))
+        assert prune_spill_files(prune_dir, max_age=1800) == 1
+        assert prune_spill_files(prune_dir, max_bytes=1150) == 1  # Oldest first; running.gz kept
+        assert sorted(os.listdir(prune_dir)) == ["new.gz", "notes.txt", "running.gz"]
+        assert prune_spill_files(os.path.join(workdir, "missing")) == 0
+        print("✅ Each run gets its own file; old and excess files deleted, recent ones kept")
+    finally:
+        os.environ.pop("SQLITE_PATH", None)
+        executor.close()
+        async_executor.close()
+
+    print("\n" + "="*60)
+    print("✅ ALL OUTPUT CAPTURE TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_output_capture()
@@ -0,0 +1,133 @@
+"""
+Test script for the task result cache.
+
+Verifies that repeated read-only git tasks are served from the cache, that
+repository changes, TTL, LRU and the byte budget invalidate entries, and
+that only read-only or explicitly opted-in tasks are cached.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.result_cache import ResultCache
+from client.task_executor import TaskExecutor
+
+
+def _git(repo: str, *args):
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test User", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test User", GIT_COMMITTER_EMAIL="test@example.com")
+    subprocess.run(["git", *args], cwd=repo, env=env, check=True, capture_output=True)
+
+
+def _task(task_id: str, command, working_dir: str, action_type: str = "git", **params):
+    return {
+        "task_id": task_id,
+        "action_type": action_type,
+        "params": {"command": command, "working_dir": working_dir, **params}
+    }
+
+
+def test_result_cache():
+    """Run all result cache tests"""
+
+    print("🧪 Testing Result Cache\n")
+
+    repo = tempfile.mkdtemp()
+    _git(repo, "init", "-q", "-b", "main")
+    Path(repo, "a.txt").write_text("a\n")
+    _git(repo, "add", "a.txt")
+    _git(repo, "commit", "-q", "-m", "first")
+
+    test_db = tempfile.mktemp(suffix=".db")
+    cache = ResultCache(ttl=60)
+    executor = TaskExecutor(test_db, result_cache=cache)
+
+    try:
+        # Test 1: Repeated read-only tasks hit the cache
+        print("Test 1: Cache hits...")
+        first = executor.handle_task(_task("log_1", ["git", "log", "--oneline"], repo))
+        assert "cached" not in first["result"]
+        start = time.perf_counter()
+        second = executor.handle_task(_task("log_2", "git  log --oneline", repo))
+        elapsed = time.perf_counter() - start
+        assert second["result"]["cached"] is True
+        assert second["result"]["stdout"] == first["result"]["stdout"]
+        assert executor.db.get_task("log_2")[2] == "completed", "Hit not recorded"
+        assert cache.stats()["hits"] == 1
+        print(f"✅ Second run served from cache in {elapsed * 1000:.2f}ms")
+
+        # Test 2: Commits, staging and new files miss the cache
+        print("\nTest 2: Invalidation on repository changes...")
+        executor.handle_task(_task("status_1", ["git", "status", "--short"], repo))
+        assert executor.handle_task(_task("status_2", ["git", "status", "--short"], repo))["result"].get("cached")
+        Path(repo, "b.txt").write_text("b\n")
+        status = executor.handle_task(_task("status_3", ["git", "status", "--short"], repo))
+        assert not status["result"].get("cached") and "?? b.txt" in status["result"]["stdout"]
+        _git(repo, "add", "b.txt")
+        status = executor.handle_task(_task("status_4", ["git", "status", "--short"], repo))
+        assert not status["result"].get("cached") and "A  b.txt" in status["result"]["stdout"]
+        _git(repo, "commit", "-q", "-m", "second")
+        log = executor.handle_task(_task("log_3", ["git", "log", "--oneline"], repo))
+        assert not log["result"].get("cached") and "second" in log["result"]["stdout"]
+        print("✅ Untracked file, staging and commit each missed")
+
+        # Test 3: Only read-only or opted-in tasks are cached
+        print("\nTest 3: Cacheability...")
+        assert ResultCache.cacheable("git", ["git", "branch"])
+        assert not ResultCache.cacheable("git", ["git", "branch", "new-branch"])
+        assert not ResultCache.cacheable("git", ["git", "commit", "-m", "x"])
+        assert not ResultCache.cacheable("git", ["git", "diff", "--output=out.patch"])
+        assert not ResultCache.cacheable("git", ["git", "status"], requested=False)
+        assert not ResultCache.cacheable("shell", "date")
+        assert ResultCache.cacheable("shell", "date", requested=True)
+        assert not ResultCache.cacheable("claude_code", ["claude"], requested=True)
+        shell = [executor.handle_task(_task(f"date_{n}", "date +%N", repo, action_type="shell"))
+                 for n in range(2)]
+        assert shell[0]["result"]["stdout"] != shell[1]["result"]["stdout"]
+        opted = [executor.handle_task(_task(f"opt_{n}", "date +%N", repo, action_type="shell", cache=True))
+                 for n in range(2)]
+        assert opted[1]["result"]["cached"] and opted[0]["result"]["stdout"] == opted[1]["result"]["stdout"]
+        print("✅ Writes and plain shell commands run every time; opt-in shell cached")
+
+        # Test 4: TTL, LRU and byte budget
+        print("\nTest 4: TTL, LRU and byte budget...")
+        small = ResultCache(ttl=0.05, max_entries=2, max_bytes=10)
+        ok = lambda out: {"success": True, "stdout": out, "stderr": "", "returncode": 0}
+        small.put("a", ok("1"))
+        time.sleep(0.1)
+        assert small.get("a") is None, "Expired entry served"
+        small.ttl = 60
+        for key in ("a", "b", "c"):
+            small.put(key, ok(key))
+        assert small.get("a") is None and small.get("c") is not None
+        small.put("big", ok("x" * 9))
+        assert small.stats()["bytes"] <= 10 and small.get("big") is not None
+        small.put("huge", ok("x" * 11))
+        assert small.get("huge") is None
+        small.put("failed", {"success": True, "stdout": "", "stderr": "", "returncode": 1})
+        assert small.get("failed") is None
+        print(f"✅ {small.stats()}")
+
+        print("\nTest 5: Metrics...")
+        metrics = executor.metrics()["result_cache"]
+        assert metrics["hits"] == 3 and metrics["entries"] > 0
+        print(f"✅ {metrics}")
+    finally:
+        executor.close()
+        if os.path.exists(test_db):
+            os.remove(test_db)
+
+    print("\n" + "="*60)
+    print("✅ ALL RESULT CACHE TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_result_cache()
@@ -84,5 +84,42 @@ def create_sample_data():
         executor.close()
 
 
+def test_tasks_api():
+    """Page through /api/tasks with filters"""
+    print("🧪 Testing /api/tasks pagination\n")
+
+    test_db = tempfile.mktemp(suffix='.db')
+    os.environ['SQLITE_PATH'] = test_db
+    from client import results_server
+
+    db = results_server.db
+    try:
+        for i in range(5):
+            db.create_task(f"api_{i}", ("git", "shell")[i % 2], "{}")
+            db.update_task(f"api_{i}", "completed" if i else "failed")
+
+        client = results_server.app.test_client()
+        response = client.get('/api/tasks?limit=2&command=git')
+        assert [t['id'] for t in response.get_json()] == ['api_4', 'api_2'], response.get_json()
+        cursor = response.headers['X-Next-Cursor']
+        assert f'cursor={cursor}' in response.headers['Link'] and 'command=git' in response.headers['Link']
+        response = client.get(f'/api/tasks?limit=2&command=git&cursor={cursor}')
+        assert [t['id'] for t in response.get_json()] == ['api_0']
+        assert 'X-Next-Cursor' not in response.headers
+        assert [t['id'] for t in client.get('/api/tasks?status=failed').get_json()] == ['api_0']
+        assert client.get('/api/tasks?since=soon').status_code == 400
+        db.update_task("api_3", "completed", output_data=json.dumps({"stdout": "ok " * 1000, "stderr": ""}))
+        page = client.get('/').get_data(as_text=True)
+        assert 'data-task-id="api_3"' in page and 'ok ok' not in page, "Index should not inline output"
+        assert client.get('/api/task/api_3/output/stdout').get_data(as_text=True) == "ok " * 1000
+        print("✅ Pages follow X-Next-Cursor; filters and bad input handled; output loads separately")
+    finally:
+        db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(test_db + suffix):
+                os.remove(test_db + suffix)
+
+
 if __name__ == "__main__":
     create_sample_data()
+    test_tasks_api()
@@ -0,0 +1,179 @@
+"""
+Test script for single-flight task coalescing.
+
+Verifies that identical tasks arriving while one is running share its
+execution and output, that each still gets its own task row, and that only
+the configured tasks are coalesced.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.async_task_executor import AsyncTaskExecutor
+from client.single_flight import SingleFlight
+from client.task_executor import TaskExecutor
+
+
+def _counting_task(task_id: str, counter: str, delay: float = 0.3, **params):
+    """A shell task that records each real run in counter"""
+    return {
+        "task_id": task_id,
+        "action_type": "shell",
+        "params": {"command": f"echo run >> {counter}; echo start; sleep {delay}; echo $$", **params}
+    }
+
+
+def _runs(counter: str) -> int:
+    return len(open(counter).read().splitlines()) if os.path.exists(counter) else 0
+
+
+def test_single_flight():
+    """Run all single-flight tests"""
+
+    print("🧪 Testing Single-Flight Coalescing\n")
+
+    workdir = tempfile.mkdtemp()
+    test_db = os.path.join(workdir, "tasks.db")
+
+    # Test 1: Concurrent identical tasks run once
+    print("Test 1: Identical concurrent tasks...")
+    executor = TaskExecutor(test_db, coalesce="all")
+    counter = os.path.join(workdir, "runs_1")
+    results, outputs = {}, {n: [] for n in range(5)}
+
+    def submit(n):
+        results[n] = executor.handle_task(
+            _counting_task(f"burst_{n}", counter),
+            on_output=lambda stream, text: outputs[n].append(text)
+        )
+
+    threads = [threading.Thread(target=submit, args=(n,)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _runs(counter) == 1, f"Ran {_runs(counter)} times"
+    stdouts = {r["result"]["stdout"] for r in results.values()}
+    assert len(stdouts) == 1 and all(r["status"] == "success" for r in results.values())
+    leaders = [n for n, r in results.items() if "coalesced_with" not in r["result"]]
+    assert len(leaders) == 1
+    assert all(r["result"].get("coalesced_with") in (None, f"burst_{leaders[0]}") for r in results.values())
+    assert all("".join(chunks) == stdouts.copy().pop() for chunks in outputs.values()), "Output not shared"
+    for n in range(5):
+        row = executor.db.get_task(f"burst_{n}")
+        assert row[2] == "completed", f"burst_{n} not recorded"
+    assert executor.metrics()["single_flight"] == {"executions": 1, "coalesced": 4, "in_flight": 0}
+    print("✅ One process, five results, five rows, output streamed to all")
+
+    # Test 2: Sequential and different tasks are not coalesced
+    print("\nTest 2: Only identical in-flight tasks...")
+    executor.handle_task(_counting_task("seq_1", counter, delay=0))
+    executor.handle_task(_counting_task("seq_2", counter, delay=0))
+    executor.handle_task(_counting_task("seq_3", counter, delay=0, timeout=10))
+    assert _runs(counter) == 4
+    executor.close()
+    print("✅ Finished tasks and different parameters run again")
+
+    # Test 3: read_only mode coalesces git reads, shell only on request
+    print("\nTest 3: read_only mode and per-task override...")
+    executor = TaskExecutor(test_db, coalesce="read_only")
+    counter = os.path.join(workdir, "runs_3")
+    for override in (None, True):
+        extra = {} if override is None else {"coalesce": override}
+        threads = [
+            threading.Thread(target=executor.handle_task,
+                             args=(_counting_task(f"ro_{override}_{n}", counter, **extra),))
+            for n in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert _runs(counter) == 3 + 1, "Shell coalesced without opting in"
+    git_key = executor._flight_key("git", {"command": ["git", "status"], "cwd": workdir,
+                                           "shell": False, "timeout": 30}, {})
+    assert git_key is not None
+    executor.close()
+    try:
+        TaskExecutor(test_db, coalesce="sometimes")
+        assert False, "Invalid mode accepted"
+    except ValueError:
+        pass
+    print("✅ Shell ran 3 times by default, once with coalesce=true")
+
+    # Test 4: Async executor, with cancellation
+    print("\nTest 4: Async executor...")
+    executor = AsyncTaskExecutor(test_db, coalesce="all")
+    counter = os.path.join(workdir, "runs_4")
+
+    async def run():
+        results = await asyncio.gather(*[
+            executor.handle_task(_counting_task(f"async_{n}", counter)) for n in range(5)
+        ])
+        assert _runs(counter) == 1
+        assert sum("coalesced_with" in r["result"] for r in results) == 4
+
+        # Cancelling the task that started the run leaves it running for the others
+        leader = asyncio.create_task(executor.handle_task(_counting_task("cancel_0", counter)))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(executor.handle_task(_counting_task("cancel_1", counter)))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        result = await follower
+        assert result["status"] == "success" and result["result"]["coalesced_with"] == "cancel_0"
+        try:
+            await leader
+            assert False, "Cancellation should propagate"
+        except asyncio.CancelledError:
+            pass
+        assert executor.db.get_task("cancel_0")[2] == "failed"
+        assert _runs(counter) == 2
+
+    asyncio.run(run())
+    executor.close()
+    print("✅ Coalesced on the loop; cancelling one caller spares the others")
+
+    # Test 5: The leader gets its own copy of the shared result
+    print("\nTest 5: Leader result is not shared...")
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    shared = {"stdout": "ok"}
+    results = {}
+
+    def execute(on_output):
+        started.set()
+        release.wait(5)
+        return shared
+
+    leader = threading.Thread(target=lambda: results.update(
+        leader=flights.run("key", execute, "lead")))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.update(
+        follower=flights.run("key", execute, "follow")))
+    follower.start()
+    while flights.stats()["coalesced"] == 0:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+    results["leader"]["duration_ms"] = 5  # What a DAG step adds to its result
+    assert results["leader"] is not shared and "duration_ms" not in shared
+    assert results["follower"] == {"stdout": "ok", "coalesced_with": "lead"}, results["follower"]
+    print("✅ Leader and followers each get their own result dict")
+
+    print("\n" + "="*60)
+    print("✅ ALL SINGLE-FLIGHT TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_single_flight()
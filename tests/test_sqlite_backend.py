@@ -6,7 +6,10 @@ Verifies that all CRUD operations work correctly.
 
 import os
 import json
+import sqlite3
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Add parent directory to path for imports
@@ -92,6 +95,163 @@ def test_sqlite_backend():
         assert len(failed) == 1, "Should have 1 failed task"
         print(f"✅ Filtered by status: {len(completed)} completed, {len(failed)} failed")
 
+        # Test 8: Queue stats, and columns added to an existing database
+        print("\nTest 8: Queue stats and schema migration...")
+        db.create_task("queued_001", "git", "{}", queue_wait_ms=1500, queue_depth=3)
+        task = db.get_task("queued_001")
+        assert task[10:12] == (1500, 3), f"Queue stats not stored: {task[10:12]}"
+        old_db = tempfile.mktemp(suffix='.db')
+        conn = sqlite3.connect(old_db)
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, command TEXT NOT NULL, "
+                     "status TEXT DEFAULT 'pending', input_data TEXT, output_data TEXT, "
+                     "error_message TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, "
+                     "started_at TIMESTAMP, completed_at TIMESTAMP)")
+        conn.execute("INSERT INTO tasks (id, command) VALUES ('old_001', 'git')")
+        conn.execute("INSERT INTO tasks (id, command, output_data) VALUES ('old_002', 'git', '{\"stdout\": \"é\"}')")
+        conn.commit()
+        conn.close()
+        migrated = SimpleSQLiteBackend(old_db)
+        migrated.update_task("old_001", "completed", output_ref='{"stdout": "x.gz"}')
+        assert migrated.get_task("old_001")[9] == '{"stdout": "x.gz"}'
+        assert migrated.get_task("old_002")[4] == '{"stdout": "é"}' and migrated.get_task("old_002")[12] == 16
+        migrated.close()
+        os.remove(old_db)
+        print("✅ Queue stats stored; old databases gain the new columns")
+
+        # Test 9: WAL journaling, and group commit
+        print("\nTest 9: WAL and group commit...")
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        grouped_db = tempfile.mktemp(suffix='.db')
+        grouped = SimpleSQLiteBackend(grouped_db, group_commit_ms=60000)  # Only explicit flushes
+        reader = sqlite3.connect(grouped_db)
+        grouped.create_task("grouped_001", "git", "{}")
+        grouped.update_task("grouped_001", "running")
+        assert grouped.get_task("grouped_001")[2] == "running", "Own writes are visible at once"
+        assert reader.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0, "Not committed yet"
+        grouped.flush()
+        assert reader.execute("SELECT status FROM tasks").fetchone()[0] == "running"
+        grouped.update_task("grouped_001", "completed", output_data="{}")
+        grouped.close()  # Commits what is left
+        assert reader.execute("SELECT status FROM tasks").fetchone()[0] == "completed"
+        assert grouped.group_commits == 2
+        reader.close()
+        fast = SimpleSQLiteBackend(tempfile.mktemp(suffix='.db'), group_commit_ms=5)
+        fast.create_task("grouped_002", "git", "{}")
+        time.sleep(0.2)
+        assert fast.group_commits == 1 and not fast._dirty, "The commit thread commits on its own"
+        fast.close()
+        for path in (grouped_db, fast.db_path):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        try:
+            SimpleSQLiteBackend(tempfile.mktemp(suffix='.db'), synchronous="sometimes")
+            raise AssertionError("Invalid synchronous setting accepted")
+        except ValueError:
+            pass
+        print("✅ WAL + synchronous=NORMAL; grouped writes commit together")
+
+        # Test 10: Pooled read-only readers alongside the writer
+        print("\nTest 10: Reader pool...")
+        pooled_db = tempfile.mktemp(suffix='.db')
+        pooled = SimpleSQLiteBackend(pooled_db, readers=3)
+        errors = []
+
+        def read_while_writing(n):
+            try:
+                for i in range(50):
+                    task_id = f"pool_{n}_{i}"
+                    pooled.create_task(task_id, "shell", "{}")
+                    assert pooled.get_task(task_id) is not None, "Committed write not visible"
+                    pooled.update_task(task_id, "completed", output_data="{}")
+                    assert pooled.get_task(task_id)[2] == "completed", "Stale read"
+                    pooled.get_recent_tasks(limit=5)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read_while_writing, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        assert len(pooled.get_tasks_by_status("completed", limit=1000)) == 400
+        assert 1 <= pooled._reader_count <= 3, pooled._reader_count
+        with pooled._reading() as reader:
+            try:
+                reader.execute("DELETE FROM tasks")
+                raise AssertionError("Reader connection accepted a write")
+            except sqlite3.OperationalError:
+                pass
+        pooled.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(pooled_db + suffix):
+                os.remove(pooled_db + suffix)
+        print("✅ 8 threads read their own writes through at most 3 read-only connections")
+
+        # Test 11: Keyset pagination and filters
+        print("\nTest 11: Task history pages...")
+        paged_db = tempfile.mktemp(suffix='.db')
+        paged = SimpleSQLiteBackend(paged_db)
+        with paged._lock:
+            paged.conn.executemany(
+                "INSERT INTO tasks (id, command, status, input_data, created_at) VALUES (?, ?, ?, '{}', ?)",
+                [(f"page_{i:03d}", ("git", "shell")[i % 2], ("completed", "failed")[i % 5 == 0],
+                  f"2025-01-01 00:00:{i // 4:02d}") for i in range(100)]  # 4 tasks per second
+            )
+            paged.conn.commit()
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = paged.get_tasks_page(limit=7, cursor=cursor)
+            seen += [row[0] for row in rows]
+            pages += 1
+            if cursor is None:
+                break
+        assert seen == [f"page_{i:03d}" for i in reversed(range(100))], "Pages skipped or repeated tasks"
+        assert pages == 15
+        rows, cursor = paged.get_tasks_page(limit=100, status="failed", command="git")
+        assert [row[0] for row in rows] == [f"page_{i:03d}" for i in reversed(range(0, 100, 10))]
+        assert cursor is None
+        rows, _ = paged.get_tasks_page(limit=100, since="2025-01-01T00:00:10Z", until="2025-01-01T00:00:12")
+        assert len(rows) == 8 and {row[6] for row in rows} == {"2025-01-01 00:00:10", "2025-01-01 00:00:11"}
+        rows, _ = paged.get_tasks_page(limit=100, since="2025-01-01T01:00:10+01:00", until="2025-01-01T00:00:11Z")
+        assert len(rows) == 4, "Offsets are converted to UTC"
+        for bad in ({"cursor": "not-a-cursor"}, {"since": "yesterday"}):
+            try:
+                paged.get_tasks_page(**bad)
+                raise AssertionError(f"Accepted {bad}")
+            except ValueError:
+                pass
+        plan = paged.conn.execute("EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE (created_at, id) < (?, ?) "
+                                  "ORDER BY created_at DESC, id DESC LIMIT 8", ("2025", "x")).fetchall()
+        assert "idx_tasks_created_id" in plan[0][-1], plan
+        paged.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(paged_db + suffix):
+                os.remove(paged_db + suffix)
+        print("✅ 100 tasks in 15 pages across timestamp ties; status, command and time filters")
+
+        # Test 12: Compressed output, left out of history rows
+        print("\nTest 12: Output compression and summary rows...")
+        big_output = json.dumps({"stdout": "line of build output\n" * 5000, "stderr": "", "returncode": 0})
+        db.create_task("big_001", "shell", "{}")
+        db.update_task("big_001", "completed", output_data=big_output)
+        stored, size = db.conn.execute(
+            "SELECT output_data, output_size FROM tasks WHERE id = 'big_001'").fetchone()
+        assert isinstance(stored, bytes) and len(stored) < size // 20, "Output should be compressed"
+        assert size == len(big_output)
+        task = db.get_task("big_001")
+        assert task[4] == big_output and task[12] == size
+        assert db.get_task_output("big_001") == big_output
+        assert db.conn.execute("SELECT output_data FROM tasks WHERE id = 'test_001'").fetchone()[0] == output_data, \
+            "Small output stays plain text"
+        for row in db.get_recent_tasks(limit=100) + db.get_tasks_page(limit=100)[0]:
+            assert row[4] is None, "History rows should not load output"
+        assert {row[0]: row[12] for row in db.get_tasks_by_status("completed", limit=100)}["big_001"] == size
+        assert db.get_task_output("missing") is None
+        print(f"✅ {size} bytes of output stored in {len(stored)}; history rows carry only output_size")
+
         print("\n" + "="*60)
         print("✅ ALL SQLITE BACKEND TESTS PASSED")
         print("="*60)
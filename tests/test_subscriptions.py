@@ -0,0 +1,78 @@
+"""
+Test script for relay subscription routing.
+
+Verifies that webhooks are routed only to subscribed clients.
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relay.subscriptions import SubscriptionIndex, routing_keys
+
+
+def test_subscriptions():
+    """Run all subscription routing tests"""
+
+    print("🧪 Testing Subscription Routing\n")
+
+    index = SubscriptionIndex()
+    everything, pushes, tasks, repo_a = "everything", "pushes", "tasks", "repo_a"
+
+    index.subscribe(everything)
+    index.subscribe(pushes, events=["push"])
+    index.subscribe(tasks, payload_types=["task_command"])
+    index.subscribe(repo_a, events=["push"], payload_types=["task_command"],
+                    repositories=["owner/a"])
+
+    # Test 1: Routing keys
+    print("Test 1: Extract routing keys...")
+    keys = routing_keys("push", {"ref": "refs/heads/main", "repository": {"full_name": "owner/a"}})
+    assert keys == {"event": "push", "payload_type": None, "repository": "owner/a"}, keys
+    keys = routing_keys(None, {"type": "task_command", "data": {}})
+    assert keys == {"event": None, "payload_type": "task_command", "repository": None}, keys
+    print("✅ Routing keys extracted")
+
+    # Test 2: GitHub push to repo A
+    print("\nTest 2: Push to owner/a...")
+    matched = index.match(event="push", repository="owner/a")
+    assert matched == {everything, pushes, repo_a}, matched
+    print(f"✅ Matched {sorted(matched)}")
+
+    # Test 3: GitHub push to another repo skips the repo-scoped client
+    print("\nTest 3: Push to owner/b...")
+    matched = index.match(event="push", repository="owner/b")
+    assert matched == {everything, pushes}, matched
+    print(f"✅ Matched {sorted(matched)}")
+
+    # Test 4: Task commands are not repo-scoped
+    print("\nTest 4: Task command...")
+    matched = index.match(payload_type="task_command")
+    assert matched == {everything, tasks, repo_a}, matched
+    print(f"✅ Matched {sorted(matched)}")
+
+    # Test 5: Unsubscribed kinds only reach catch-all clients
+    print("\nTest 5: Issue event...")
+    matched = index.match(event="issues", repository="owner/a")
+    assert matched == {everything}, matched
+    print(f"✅ Matched {sorted(matched)}")
+
+    # Test 6: Resubscribe replaces, unsubscribe removes
+    print("\nTest 6: Resubscribe and unsubscribe...")
+    index.subscribe(pushes, events=["issues"])
+    assert pushes not in index.match(event="push")
+    assert pushes in index.match(event="issues")
+    index.unsubscribe(everything)
+    assert index.match(event="issues") == {pushes}
+    assert index.get(everything) is None and len(index) == 3
+    print("✅ Subscription updates applied")
+
+    print("\n" + "="*60)
+    print("✅ ALL SUBSCRIPTION TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_subscriptions()
@@ -0,0 +1,207 @@
+"""
+Test script for task batches.
+
+Verifies batch validation and dependency ordering (relay/batch.py), the
+client's dependency tracking (client/task_batch.py), and POST /tasks/batch
+with GET /tasks/batch/{batch_id}.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.task_batch import TaskBatch
+from relay.batch import batch_status, order_batch
+
+
+def task(task_id, *depends_on, action_type="shell"):
+    return {"task_id": task_id, "action_type": action_type, "params": {}, "depends_on": list(depends_on)}
+
+
+def test_order_batch():
+    """Run all batch validation tests"""
+
+    print("🧪 Testing Batch Validation\n")
+
+    # Test 1: Dependencies come first, otherwise submission order is kept
+    print("Test 1: Dependency order...")
+    ordered = order_batch([task("test", "build"), task("lint"), task("build", "fetch"), task("fetch")])
+    assert [t["task_id"] for t in ordered] == ["lint", "fetch", "build", "test"], ordered
+    assert order_batch([{"task_id": "a", "action_type": "git", "depends_on": "b"},
+                        task("b")])[1]["depends_on"] == ["b"]
+    print("✅ Ordered: lint, fetch, build, test")
+
+    # Test 2: Malformed batches are rejected
+    print("\nTest 2: Rejections...")
+    bad = {
+        "empty": [],
+        "not a list": {"task_id": "a"},
+        "no task_id": [{"action_type": "git"}],
+        "no action_type": [{"task_id": "a"}],
+        "duplicate": [task("a"), task("a")],
+        "unknown dependency": [task("a", "zzz")],
+        "cycle": [task("a", "c"), task("b", "a"), task("c", "b"), task("d")],
+    }
+    for name, tasks in bad.items():
+        try:
+            order_batch(tasks)
+        except ValueError as e:
+            print(f"   {name}: {e}")
+        else:
+            raise AssertionError(f"{name} was accepted")
+    try:
+        order_batch([task(f"t{i}") for i in range(5)], max_size=4)
+        raise AssertionError("Oversized batch was accepted")
+    except ValueError:
+        pass
+    print("✅ All rejected")
+
+    # Test 3: Overall status
+    print("\nTest 3: Batch status...")
+    assert batch_status(["completed", "pending"]) == ("pending", {"completed": 1, "pending": 1})
+    assert batch_status(["completed", "failed"])[0] == "failed"
+    assert batch_status(["completed", "completed"])[0] == "completed"
+    print("✅ pending, failed, completed")
+
+    print("\n" + "="*60)
+    print("✅ ALL BATCH VALIDATION TESTS PASSED")
+    print("="*60)
+
+
+def test_task_batch():
+    """Run all client dependency tracking tests"""
+
+    print("🧪 Testing Client Batch Scheduling\n")
+
+    # Test 1: Independent tasks start together, dependents after their dependencies
+    print("Test 1: Ready tasks...")
+    batch = TaskBatch("b1", [task("fetch"), task("lint"), task("build", "fetch"),
+                             task("test", "build", "lint")])
+    assert [t["task_id"] for t in batch.ready()] == ["fetch", "lint"]
+    assert batch.ready() == [], "Tasks are handed out once"
+    assert [t["task_id"] for t in batch.finish("fetch", True)[0]] == ["build"]
+    assert batch.finish("lint", True) == ([], [])
+    assert [t["task_id"] for t in batch.finish("build", True)[0]] == ["test"]
+    batch.finish("test", True)
+    assert batch.done and all(batch.finished.values())
+    print("✅ fetch+lint, then build, then test")
+
+    # Test 2: A failure skips everything downstream, nothing else
+    print("\nTest 2: Failure skips dependents...")
+    batch = TaskBatch("b2", [task("fetch"), task("build", "fetch"), task("test", "build"),
+                             task("docs"), task("publish", "docs", "test")])
+    batch.ready()
+    ready, skipped = batch.finish("fetch", False)
+    assert ready == [] and skipped == ["build", "test", "publish"], skipped
+    assert not batch.done
+    assert batch.finish("docs", True) == ([], [])
+    assert batch.done and batch.finished == {"fetch": False, "build": False, "test": False,
+                                             "docs": True, "publish": False}
+    print("✅ build, test and publish skipped; docs ran")
+
+    print("\n" + "="*60)
+    print("✅ ALL CLIENT BATCH TESTS PASSED")
+    print("="*60)
+
+
+def test_batch_api():
+    """Exercise POST /tasks/batch and GET /tasks/batch/{batch_id}"""
+
+    print("🧪 Testing Batch API\n")
+
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("⏭️  fastapi not installed - skipping")
+        return
+
+    os.environ["API_KEY"] = ""
+    import app as relay
+
+    client = TestClient(relay.app)
+
+    with client, client.websocket_connect("/ws") as ws:
+        ws.receive_json()  # Welcome
+        ws.send_json({"type": "register", "capacity": 4, "action_types": ["git", "shell"]})
+        ws.send_json({"type": "ping"})
+        while ws.receive_json()["type"] != "pong":
+            pass  # Registered
+
+        # Test 1: One frame to one worker, in dependency order
+        print("Test 1: Async batch...")
+        response = client.post("/tasks/batch", json={
+            "batch_id": "api_batch_1",
+            "session_id": "s1",
+            "tasks": [task("bt_test", "bt_fetch"), task("bt_fetch", action_type="git")]
+        })
+        body = response.json()
+        assert response.status_code == 200 and body["status"] == "received", body
+        assert body["status_url"] == "/tasks/batch/api_batch_1" and body["dispatched_to"] is not None
+        frame = ws.receive_json()["payload"]
+        assert frame["type"] == "task_batch" and frame["data"]["batch_id"] == "api_batch_1"
+        assert [t["task_id"] for t in frame["data"]["tasks"]] == ["bt_fetch", "bt_test"]
+        assert frame["data"]["tasks"][0]["session_id"] == "s1"
+        print("✅ Dispatched as one task_batch frame")
+
+        # Test 2: Batch status aggregates task results
+        print("\nTest 2: Polling the batch...")
+        ws.send_json({"type": "task_result", "task_id": "bt_fetch", "status": "completed",
+                      "output": {"stdout": "fetched"}})
+        response = client.get("/tasks/batch/api_batch_1?wait=0.1")
+        assert response.status_code == 202 and response.json()["counts"] == {"completed": 1, "pending": 1}
+        ws.send_json({"type": "task_result", "task_id": "bt_test", "status": "failed", "error": "1 failed"})
+        body = client.get("/tasks/batch/api_batch_1?wait=5").json()
+        assert body["status"] == "failed" and [t["status"] for t in body["tasks"]] == ["completed", "failed"]
+        assert client.get("/tasks/bt_fetch/result").json()["output"] == {"stdout": "fetched"}
+        assert client.get("/tasks/batch/missing").status_code == 404
+        print("✅ 202 while running, then every result")
+
+        # Test 3: Sync batches wait for all results
+        print("\nTest 3: Sync batch...")
+        response = client.post("/tasks/batch", json={
+            "sync": True, "wait": 0.2, "tasks": [task("bt_a"), task("bt_b")]
+        })
+        body = response.json()
+        assert response.status_code == 202 and body["batch_id"].startswith("batch_"), body
+        ws.receive_json()
+        ws.send_json({"type": "task_result", "task_id": "bt_a", "status": "completed"})
+        ws.send_json({"type": "task_result", "task_id": "bt_b", "status": "completed"})
+        body = client.get(f"/tasks/batch/{body['batch_id']}?wait=5").json()
+        assert body["status"] == "completed" and body["counts"] == {"completed": 2}
+        print("✅ Timed out to 202, then completed")
+
+        # Test 4: Invalid batches and unsupported action types
+        print("\nTest 4: Rejections...")
+        assert client.post("/tasks/batch", json={"tasks": [task("x", "x")]}).status_code == 400
+        assert client.post("/tasks/batch", json={"tasks": []}).status_code == 400
+        body = client.post("/tasks/batch", json={
+            "tasks": [task("bt_c", action_type="claude_code"), task("bt_d")]
+        }).json()
+        assert body["dispatched_to"] is None, "No registered worker runs claude_code"
+        assert body["clients_notified"] == 0, "Fallback broadcast reached a registered worker"
+        print("✅ Bad batches rejected; no worker is picked without every action type")
+
+        # Test 5: The fallback broadcast only reaches unregistered clients
+        print("\nTest 5: Fallback to unregistered clients...")
+        with client.websocket_connect("/ws") as legacy:
+            legacy.receive_json()  # Welcome
+            body = client.post("/webhook", json={
+                "type": "task_command",
+                "data": {"task_id": "bt_legacy", "action_type": "claude_code", "params": {}}
+            }).json()
+            assert body["dispatched_to"] is None and body["clients_notified"] == 1, body
+            assert legacy.receive_json()["payload"]["data"]["task_id"] == "bt_legacy"
+        print("✅ Registered workers without the action type are skipped")
+
+    print("\n" + "="*60)
+    print("✅ ALL BATCH API TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_order_batch()
+    test_task_batch()
+    test_batch_api()
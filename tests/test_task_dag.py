@@ -0,0 +1,137 @@
+"""
+Test script for DAG tasks.
+
+Verifies step validation, that independent steps run concurrently, that
+outputs pass between steps, that a failure skips only the steps depending
+on it, and that per-step timings are stored - on both executors.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.async_task_executor import AsyncTaskExecutor
+from client.task_dag import parse_steps
+from client.task_executor import TaskExecutor
+
+
+def dag(task_id, *steps, **params):
+    return {"task_id": task_id, "action_type": "dag", "params": {"steps": list(steps), **params}}
+
+
+def step(step_id, command, *depends_on):
+    return {"id": step_id, "action_type": "shell", "params": {"command": command},
+            "depends_on": list(depends_on)}
+
+
+def test_parse_steps():
+    """Run all step validation tests"""
+
+    print("🧪 Testing DAG Step Validation\n")
+
+    steps, error = parse_steps({"steps": [step("a", "true"), step("b", "echo {{steps.a.stdout}}", "a")]})
+    assert error is None and [s["task_id"] for s in steps] == ["a", "b"], error
+
+    bad = {
+        "no steps": {},
+        "bad id": {"steps": [step("a b", "true")]},
+        "duplicate": {"steps": [step("a", "true"), step("a", "true")]},
+        "nested dag": {"steps": [{"id": "a", "action_type": "dag"}]},
+        "unknown dependency": {"steps": [step("a", "true", "zzz")]},
+        "undeclared output": {"steps": [step("a", "true"), step("b", "echo {{steps.a.stdout}}")]},
+        "cycle": {"steps": [step("a", "true", "b"), step("b", "true", "a")]},
+    }
+    for name, params in bad.items():
+        steps, error = parse_steps(params)
+        assert steps is None and error, f"{name} was accepted"
+        print(f"   {name}: {error}")
+    print("✅ Invalid DAGs rejected")
+
+
+def test_dag_execution():
+    """Run all DAG execution tests on both executors"""
+
+    print("🧪 Testing DAG Execution\n")
+
+    test_db = tempfile.mktemp(suffix='.db')
+    async_db = tempfile.mktemp(suffix='.db')
+    executor = TaskExecutor(test_db)
+    async_executor = AsyncTaskExecutor(async_db)
+
+    def run(executor, task, **kwargs):
+        if isinstance(executor, AsyncTaskExecutor):
+            return asyncio.run(executor.handle_task(task, **kwargs))
+        return executor.handle_task(task, **kwargs)
+
+    try:
+        for name, ex in (("TaskExecutor", executor), ("AsyncTaskExecutor", async_executor)):
+            # Test 1: Independent steps run at the same time
+            print(f"Test 1 ({name}): Parallel steps...")
+            start = time.monotonic()
+            result = run(ex, dag("dag_parallel",
+                                 step("a", "sleep 0.5"), step("b", "sleep 0.5"),
+                                 step("c", "echo done", "a", "b")))
+            elapsed = time.monotonic() - start
+            assert result["status"] == "success", result
+            assert elapsed < 0.95, f"Independent steps ran one after the other ({elapsed:.2f}s)"
+            assert result["result"]["steps"]["c"]["stdout"] == "done\n"
+            print(f"✅ Two 0.5s steps then a third in {elapsed:.2f}s")
+
+            # Test 2: Outputs pass between steps
+            print(f"\nTest 2 ({name}): Step outputs...")
+            chunks = []
+            result = run(ex, dag("dag_outputs",
+                                 step("name", "echo world"),
+                                 step("greet", "echo hello {{steps.name.stdout}}", "name")),
+                         on_output=lambda stream, text: chunks.append(text))
+            assert result["result"]["steps"]["greet"]["stdout"] == "hello world\n", result
+            assert "[greet] hello world\n" in chunks, chunks
+            print("✅ {{steps.name.stdout}} substituted; output streamed with step ids")
+
+            # Test 3: A failure skips its dependents only
+            print(f"\nTest 3 ({name}): Failure short-circuits dependents...")
+            result = run(ex, dag("dag_failure",
+                                 step("fetch", "exit 3"), step("build", "echo built", "fetch"),
+                                 step("test", "echo tested", "build"), step("docs", "echo docs")))
+            assert result["status"] == "failed" and "fetch" in result["error"], result
+            steps = {row[0]: row for row in ex.db.get_task_steps("dag_failure")}
+            assert steps["fetch"][2:4] == ("failed", 3), steps["fetch"]
+            assert steps["build"][2] == steps["test"][2] == "skipped"
+            assert steps["docs"][2] == "completed"
+            print("✅ build and test skipped, docs ran")
+
+            # Test 4: Per-step timings are stored
+            print(f"\nTest 4 ({name}): Step timings...")
+            steps = {row[0]: row for row in ex.db.get_task_steps("dag_parallel")}
+            assert set(steps) == {"a", "b", "c"}
+            assert all(row[2] == "completed" and row[5] and row[6] for row in steps.values())
+            assert steps["a"][7] >= 450 and steps["c"][7] < 450, steps
+            print(f"✅ durations: { {k: v[7] for k, v in steps.items()} }\n")
+
+        # Test 5: Invalid DAGs fail before anything runs
+        print("Test 5: Invalid DAG...")
+        result = executor.handle_task(dag("dag_cycle", step("a", "true", "b"), step("b", "true", "a")))
+        assert result["status"] == "failed" and "cycle" in result["error"], result
+        assert executor.db.get_task_steps("dag_cycle") == []
+        print("✅ Rejected without running steps")
+    finally:
+        executor.close()
+        async_executor.close()
+        for path in (test_db, async_db):
+            if os.path.exists(path):
+                os.remove(path)
+
+    print("\n" + "="*60)
+    print("✅ ALL DAG TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_parse_steps()
+    test_dag_execution()
@@ -105,6 +105,24 @@ def test_task_executor():
         assert len(failed_tasks) == 1, f"Should have 1 failed task, got {len(failed_tasks)}"
         print("✅ All tasks stored correctly in database")
 
+        # Test 7: Stream output while the command runs
+        print("\nTest 7: Stream output chunks...")
+        chunks = []
+        result = executor.handle_task({
+            "task_id": "test_stream_001",
+            "action_type": "shell",
+            "params": {
+                "command": "echo first; sleep 0.2; echo oops >&2; echo second"
+            }
+        }, on_output=lambda stream, text: chunks.append((stream, text)))
+        assert result.get("status") == "success", f"Streamed command failed: {result.get('error')}"
+        stdout = "".join(text for stream, text in chunks if stream == "stdout")
+        stderr = "".join(text for stream, text in chunks if stream == "stderr")
+        assert stdout == result["result"]["stdout"] == "first\nsecond\n"
+        assert stderr == result["result"]["stderr"] == "oops\n"
+        assert chunks[0] == ("stdout", "first\n"), "First line arrives before the command ends"
+        print(f"✅ Output streamed in {len(chunks)} chunks and still returned in full")
+
         print("\n" + "="*60)
         print("✅ ALL TASK EXECUTOR TESTS PASSED")
         print("="*60)
@@ -0,0 +1,207 @@
+"""
+Test script for task results and the asynchronous sync-mode API.
+
+Verifies the result store (waiters, expiry, reused task IDs, streamed
+output), that /webhook answers 202 with a status URL instead of timing out
+while GET /tasks/{task_id}/result long-polls for the result, and that
+GET /tasks/{task_id}/stream relays task_output as Server-Sent Events.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from relay.results import PENDING, TaskResultStore
+
+
+def test_result_store():
+    """Run all result store tests"""
+
+    print("🧪 Testing Task Result Store\n")
+
+    async def run():
+        # Test 1: Waiters wake when the result arrives
+        print("Test 1: Waiting for a result...")
+        store = TaskResultStore()
+        store.create("t1")
+        waiter = asyncio.create_task(store.wait("t1", 5))
+        await asyncio.sleep(0.01)
+        store.set_result({"task_id": "t1", "status": "completed", "output": {"stdout": "ok"}})
+        record = await waiter
+        assert record.status == "completed" and record.to_dict()["output"] == {"stdout": "ok"}
+        assert record.execution_time_ms is not None
+        print("✅ Waiter received the result")
+
+        # Test 2: A wait that times out returns the pending record
+        print("\nTest 2: Wait timeout...")
+        store.create("t2")
+        start = time.monotonic()
+        record = await store.wait("t2", 0.05)
+        assert record.status == PENDING and time.monotonic() - start < 1
+        assert await store.wait("unknown", 0.05) is None
+        print("✅ Pending record returned, unknown task is None")
+
+        # Test 3: Duplicate results are ignored, reused task IDs start over
+        print("\nTest 3: Duplicates and reuse...")
+        store.set_result({"task_id": "t1", "status": "failed", "error": "late"})
+        assert store.get("t1").status == "completed"
+        store.create("t1")
+        assert store.get("t1").status == PENDING
+        print("✅ First result wins; re-submitting a task resets it")
+
+        # Test 4: Results for tasks created elsewhere are kept
+        print("\nTest 4: Results from other relay nodes...")
+        store.set_result({"task_id": "remote", "status": "completed"})
+        assert store.get("remote").status == "completed"
+        print("✅ Stored without a local create()")
+
+        # Test 5: Expiry and bounds
+        print("\nTest 5: Expiry...")
+        store = TaskResultStore(ttl=0.05, max_entries=2)
+        for n in range(3):
+            store.create(f"b{n}")
+        assert len(store) == 2 and store.get("b0") is None
+        await asyncio.sleep(0.1)
+        assert store.get("b2") is None and len(store) == 0
+        print("✅ Oldest evicted and expired records dropped")
+
+        # Test 6: Followers get buffered and live output, then the result
+        print("\nTest 6: Following output...")
+        store = TaskResultStore(max_output_bytes=10)
+        store.create("s1")
+        store.append_output({"task_id": "s1", "stream": "stdout", "data": "early\n"})
+        events = []
+
+        async def follow():
+            async for event in store.follow("s1", idle_timeout=0.05):
+                events.append(event)
+
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0.1)  # Long enough for one idle event
+        store.append_output({"task_id": "s1", "stream": "stderr", "data": "late\n"})
+        store.set_result({"task_id": "s1", "status": "completed", "output": {"stdout": "early\n"}})
+        await asyncio.wait_for(follower, 1)
+        outputs = [data for event, data in events if event == "output"]
+        assert outputs == [{"stream": "stdout", "data": "early\n"}, {"stream": "stderr", "data": "late\n"}]
+        assert ("idle", None) in events and events[-1][0] == "result"
+        assert store.append_output({"task_id": "s1", "data": "after"}) is None
+        print("✅ Buffered + live chunks, keepalive, then result")
+
+        # Test 7: The buffer is bounded; late followers learn what was dropped
+        print("\nTest 7: Output buffer bound...")
+        store.create("s2")
+        for n in range(4):
+            store.append_output({"task_id": "s2", "data": f"line{n}"})
+        follower = store.follow("s2", idle_timeout=0.05)
+        assert await follower.__anext__() == ("truncated", {"task_id": "s2", "dropped_bytes": 10})
+        assert (await follower.__anext__())[1]["data"] == "line2"
+        await follower.aclose()
+        assert not store.get("s2").followers, "Closed followers are detached"
+        print("✅ Oldest output evicted and reported")
+
+    asyncio.run(run())
+
+    print("\n" + "="*60)
+    print("✅ ALL TASK RESULT STORE TESTS PASSED")
+    print("="*60)
+
+
+def test_sync_api():
+    """Exercise /webhook sync mode and the result endpoint"""
+
+    print("🧪 Testing Sync API\n")
+
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("⏭️  fastapi not installed - skipping")
+        return
+
+    os.environ["API_KEY"] = ""
+    import app as relay
+
+    client = TestClient(relay.app)
+    task = lambda task_id, **extra: {
+        "type": "task_command", "sync": True,
+        "data": {"task_id": task_id, "action_type": "shell", "params": {}}, **extra
+    }
+
+    with client, client.websocket_connect("/ws") as ws:
+        ws.receive_json()  # Welcome
+        ws.send_json({"type": "register", "capacity": 4})
+
+        # Test 1: wait=0 returns 202 with a status URL straight away
+        print("Test 1: Immediate 202...")
+        response = client.post("/webhook", json=task("api_1", wait=0))
+        body = response.json()
+        assert response.status_code == 202 and body["status"] == "pending", body
+        assert body["status_url"] == "/tasks/api_1/result"
+        assert ws.receive_json()["payload"]["data"]["task_id"] == "api_1"
+        print("✅ 202 pending with status_url")
+
+        # Test 2: Polling before and after the worker answers
+        print("\nTest 2: Polling the result...")
+        response = client.get("/tasks/api_1/result?wait=0.05")
+        assert response.status_code == 202 and response.json()["status"] == "pending"
+        ws.send_json({"type": "task_result", "task_id": "api_1",
+                      "status": "completed", "output": {"stdout": "done"}})
+        response = client.get("/tasks/api_1/result?wait=5")
+        assert response.status_code == 200, response.json()
+        assert response.json()["output"] == {"stdout": "done"}
+        assert client.get("/tasks/missing/result").status_code == 404
+        print("✅ 202 while running, 200 with output once done, 404 when unknown")
+
+        # Test 3: A short per-request wait times out to 202, not 504
+        print("\nTest 3: Per-request wait...")
+        start = time.monotonic()
+        response = client.post("/webhook", json=task("api_2", wait=0.2))
+        assert response.status_code == 202 and 0.2 <= time.monotonic() - start < 5
+        assert client.post("/webhook", json=task("api_3", wait="soon")).status_code == 400
+        print("✅ Timed out to 202 after the requested wait; bad wait rejected")
+
+        # Test 4: Async task commands are pollable too
+        print("\nTest 4: Async task commands...")
+        body = client.post("/webhook", json={**task("api_4"), "sync": False}).json()
+        assert body["status"] == "received" and body["status_url"] == "/tasks/api_4/result"
+        print("✅ status_url included")
+
+        # Test 5: Streamed output arrives as Server-Sent Events
+        print("\nTest 5: Streaming endpoint...")
+        body = client.post("/webhook", json=task("api_5", wait=0)).json()
+        assert body["stream_url"] == "/tasks/api_5/stream"
+        ws.send_json({"type": "task_output", "task_id": "api_5", "stream": "stdout", "data": "step 1\n"})
+        ws.send_json({"type": "ping"})
+        while ws.receive_json()["type"] != "pong":
+            pass  # The relay has now handled the first chunk
+
+        streamed = []
+        reader = threading.Thread(
+            target=lambda: streamed.append(client.get("/tasks/api_5/stream")))
+        reader.start()
+        time.sleep(0.3)  # Let the stream attach before the rest arrives
+        ws.send_json({"type": "task_output", "task_id": "api_5", "stream": "stderr", "data": "warning\n"})
+        ws.send_json({"type": "task_result", "task_id": "api_5",
+                      "status": "completed", "output": {"stdout": "step 1\n"}})
+        reader.join(timeout=10)
+        response = streamed[0]
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        assert [lines[0] for lines in events] == ["event: output", "event: output", "event: result"], events
+        assert '"data":"warning\\n"' in events[1][1] and '"status":"completed"' in events[2][1]
+        assert client.get("/tasks/missing/stream").status_code == 404
+        print("✅ Buffered and live output relayed, then the result")
+
+    print("\n" + "="*60)
+    print("✅ ALL SYNC API TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_result_store()
+    test_sync_api()
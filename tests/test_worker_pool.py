@@ -0,0 +1,178 @@
+"""
+Test script for the client task worker pool.
+
+Verifies that tasks run concurrently off the event loop, that per
+action_type limits hold, and that results come back as each task finishes.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path (tests/ -> root)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.worker_pool import TaskWorkerPool, parse_limits
+
+
+def test_worker_pool():
+    """Run all worker pool tests"""
+
+    print("🧪 Testing Task Worker Pool\n")
+
+    # Test 1: Limit parsing
+    print("Test 1: Parsing TASK_CONCURRENCY...")
+    assert parse_limits("claude_code=1, shell=4") == {"claude_code": 1, "shell": 4}
+    assert parse_limits("") == {}
+    for bad in ("shell", "shell=0", "=2"):
+        try:
+            parse_limits(bad)
+            assert False, f"{bad!r} should be rejected"
+        except ValueError:
+            pass
+    print("✅ Limits parsed, malformed entries rejected")
+
+    async def run():
+        # Test 2: Tasks run in parallel and the loop keeps ticking
+        print("\nTest 2: Concurrent execution...")
+        pool = TaskWorkerPool(max_workers=4)
+        done, ticks = [], []
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+
+        ticking = asyncio.create_task(ticker())
+        start = time.monotonic()
+        for n in range(4):
+            pool.submit("shell", time.sleep, 0.3, on_done=lambda result, n=n: done.append(n))
+        await pool.drain()
+        elapsed = time.monotonic() - start
+        ticking.cancel()
+        assert sorted(done) == [0, 1, 2, 3]
+        assert elapsed < 0.9, f"4 x 0.3s tasks took {elapsed:.2f}s"
+        assert len(ticks) >= 10, "Event loop was blocked while tasks ran"
+        print(f"✅ 4 blocking tasks finished in {elapsed:.2f}s; loop ticked {len(ticks)} times")
+
+        # Test 3: Per-action_type limits
+        print("\nTest 3: Per-action_type limits...")
+        pool = TaskWorkerPool(max_workers=4, limits={"claude_code": 1})
+        active, peak = {"claude_code": 0, "git": 0}, {"claude_code": 0, "git": 0}
+        lock = threading.Lock()
+
+        def work(action_type):
+            with lock:
+                active[action_type] += 1
+                peak[action_type] = max(peak[action_type], active[action_type])
+            time.sleep(0.1)
+            with lock:
+                active[action_type] -= 1
+
+        for action_type in ["claude_code"] * 3 + ["git"] * 3:
+            pool.submit(action_type, work, action_type)
+        await asyncio.sleep(0.05)
+        assert pool.stats()["waiting"] == {"claude_code": 2}
+        await pool.drain()
+        assert peak == {"claude_code": 1, "git": 3}, peak
+        print(f"✅ Peak concurrency {peak}")
+
+        # Test 4: Results are delivered in completion order; errors are passed through
+        print("\nTest 4: Completion order and errors...")
+        pool = TaskWorkerPool(max_workers=3)
+        results = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        pool.submit("shell", lambda: time.sleep(0.2) or "slow", on_done=results.append)
+        pool.submit("shell", lambda: "fast", on_done=results.append)
+        pool.submit("shell", fail, on_done=results.append)
+        await pool.drain()
+        assert results[-1] == "slow" and "fast" in results
+        assert any(isinstance(r, RuntimeError) for r in results)
+        pool.shutdown()
+        print("✅ Fast results first, exceptions reported to on_done")
+
+        # Test 5: Coroutine functions run on the loop under the same limits
+        print("\nTest 5: Coroutine tasks...")
+        pool = TaskWorkerPool(max_workers=2)
+        running, peak, results = [0], [0], []
+
+        async def coro(n):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.05)
+            running[0] -= 1
+            return n
+
+        for n in range(5):
+            pool.submit("shell", coro, n, on_done=results.append)
+        await pool.drain()
+        assert sorted(results) == [0, 1, 2, 3, 4] and peak[0] == 2
+        print("✅ Awaited on the loop, max_workers respected")
+
+        # Test 6: Priorities, fair sharing between callers and queue stats
+        print("\nTest 6: Priority and fair scheduling...")
+        pool = TaskWorkerPool(max_workers=1)
+        order, stats = [], {}
+        gate = asyncio.Event()
+
+        async def job(name):
+            if name == "blocker":
+                await gate.wait()
+            order.append(name)
+
+        pool.submit("shell", job, "blocker")
+        for name, priority, caller in [("a1", 0, "a"), ("a2", 0, "a"), ("a3", 0, "a"),
+                                       ("b1", 0, "b"), ("urgent", 5, "c"), ("low", -1, "b")]:
+            pool.submit("shell", job, name, priority=priority, caller=caller,
+                        on_start=lambda info, name=name: stats.__setitem__(name, info))
+        gate.set()
+        await pool.drain()
+        assert order == ["blocker", "urgent", "a1", "b1", "a2", "a3", "low"], order
+        assert stats["low"]["queue_depth"] == 5 and stats["low"]["queue_wait_ms"] >= 0
+        print(f"✅ Ran {order[1:]}: priority first, then callers in turn")
+
+        # Test 7: Aging lets waiting low-priority work overtake newer tasks
+        print("\nTest 7: Aging...")
+        pool = TaskWorkerPool(max_workers=1, aging=0.05)
+        order, gate = [], asyncio.Event()
+        pool.submit("shell", job, "blocker")
+        pool.submit("shell", job, "old-low", priority=-1)
+        await asyncio.sleep(0.2)
+        pool.submit("shell", job, "new-high", priority=1)
+        gate.set()
+        await pool.drain()
+        assert order == ["blocker", "old-low", "new-high"], order
+        print("✅ A low-priority task that waited long enough ran first")
+
+        # Test 8: A saturated action_type doesn't block other types
+        print("\nTest 8: No head-of-line blocking...")
+        pool = TaskWorkerPool(max_workers=2, limits={"claude_code": 1})
+        order = []
+
+        async def timed(name, delay):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        pool.submit("claude_code", timed, "claude-1", 0.3)
+        pool.submit("claude_code", timed, "claude-2", 0.3, priority=10)
+        pool.submit("git", timed, "git-1", 0.01)
+        pool.submit("git", timed, "git-2", 0.01)
+        await asyncio.sleep(0.1)
+        assert order == ["git-1", "git-2"], "git waited behind claude_code"
+        await pool.drain()
+        print("✅ git tasks ran while claude_code was at its limit")
+
+    asyncio.run(run())
+
+    print("\n" + "="*60)
+    print("✅ ALL WORKER POOL TESTS PASSED")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_worker_pool()